@@ -8,6 +8,63 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7
 DB_PATH = "systems_kb.db"
 JIRA_DB_NAME = "jira_data.db"
 
+# Максимум кодов систем в одном POST /systems/topics:batch
+TOPICS_BATCH_MAX_CODES = int(os.getenv("TOPICS_BATCH_MAX_CODES", "500"))
+# Максимальная глубина обхода графа зависимостей в /systems/{code}/impact
+IMPACT_MAX_DEPTH = int(os.getenv("IMPACT_MAX_DEPTH", "10"))
+# Сколько секунд браузер/прокси может отдавать ответ без ревалидации по ETag
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))
+
+# Синхронизация с Confluence: параллельность, лимит запросов в секунду на хост, размер пачки записи в БД
+CONFLUENCE_SYNC_WORKERS = int(os.getenv("CONFLUENCE_SYNC_WORKERS", "8"))
+CONFLUENCE_RATE_LIMIT = float(os.getenv("CONFLUENCE_RATE_LIMIT", "10"))
+CONFLUENCE_SYNC_BATCH = int(os.getenv("CONFLUENCE_SYNC_BATCH", "50"))
+# Сколько дней доверять разрешенной ссылке wiki_url -> id страницы (домашнюю страницу пространства
+# могут сменить, и старая страница при этом не удаляется); 0 - разрешать заново при каждой синхронизации
+WIKI_URL_CACHE_TTL_DAYS = float(os.getenv("WIKI_URL_CACHE_TTL_DAYS", "7"))
+CONFLUENCE_URL = os.getenv("CONFLUENCE_URL")
+CONFLUENCE_USER = os.getenv("CONFLUENCE_USER")
+CONFLUENCE_TOKEN = os.getenv("CONFLUENCE_TOKEN")
+
+# AI-обогащение через Ollama: одновременных запросов, таймаут ответа (с), повторы,
+# размер пачки записи в БД и сколько раз пробовать систему с той же документацией
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://ollama:11434/api/generate")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "gpt-oss:120b")
+ENRICH_WORKERS = int(os.getenv("ENRICH_WORKERS", "2"))
+ENRICH_TIMEOUT = float(os.getenv("ENRICH_TIMEOUT", "300"))
+ENRICH_RETRIES = int(os.getenv("ENRICH_RETRIES", "2"))
+ENRICH_BATCH = int(os.getenv("ENRICH_BATCH", "10"))
+ENRICH_MAX_ATTEMPTS = int(os.getenv("ENRICH_MAX_ATTEMPTS", "3"))
+# Бюджет входа одного вызова LLM (в токенах, ~3 символа кириллицы на токен) и максимум
+# частей на страницу: длинные страницы режутся на части, ключевые слова по частям объединяются
+ENRICH_CHUNK_TOKENS = int(os.getenv("ENRICH_CHUNK_TOKENS", "3000"))
+ENRICH_MAX_CHUNKS = int(os.getenv("ENRICH_MAX_CHUNKS", "8"))
+# Бюджет одной генерации: токенов ответа, секунд от начала до конца, ключевых слов в списке
+ENRICH_MAX_OUTPUT_TOKENS = int(os.getenv("ENRICH_MAX_OUTPUT_TOKENS", "512"))
+ENRICH_CALL_BUDGET = float(os.getenv("ENRICH_CALL_BUDGET", "180"))
+ENRICH_MAX_KEYWORDS = int(os.getenv("ENRICH_MAX_KEYWORDS", "60"))
+
+# Фоновые задачи в API: период автозапуска в секундах (0 - только вручную), сколько завершенных хранить
+JOBS_CONFLUENCE_SYNC_INTERVAL = int(os.getenv("JOBS_CONFLUENCE_SYNC_INTERVAL", "0"))
+JOBS_ENRICH_INTERVAL = int(os.getenv("JOBS_ENRICH_INTERVAL", "0"))
+JOBS_HISTORY = int(os.getenv("JOBS_HISTORY", "100"))
+# Каталог выгрузок для задачи csv_import: пути в параметрах задачи - только внутри него
+IMPORT_DIR = os.getenv("IMPORT_DIR", "imports")
+
+# Стратегия поиска по умолчанию: exhaustive (полный перебор), indexed, hybrid - см. app/services/search_engine.py
+SEARCH_MODE = os.getenv("SEARCH_MODE", "exhaustive")
+# Процессов для лемматизации при полной сборке индекса (1 - в процессе сервиса); по умолчанию - по числу ядер
+SEARCH_BUILD_WORKERS = int(os.getenv("SEARCH_BUILD_WORKERS", str(os.cpu_count() or 1)))
+
+# Допуск запросов (app/services/admission.py): одновременных запросов на класс эндпоинтов,
+# длина очереди ожидания на класс, ожидающих запросов одного пользователя, крайний срок ответа в секундах
+ADMISSION_SEARCH_CONCURRENCY = int(os.getenv("ADMISSION_SEARCH_CONCURRENCY", "2"))
+ADMISSION_TOPICS_CONCURRENCY = int(os.getenv("ADMISSION_TOPICS_CONCURRENCY", "16"))
+ADMISSION_AUTH_CONCURRENCY = int(os.getenv("ADMISSION_AUTH_CONCURRENCY", "4"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_PER_USER_QUEUE = int(os.getenv("ADMISSION_PER_USER_QUEUE", "8"))
+ADMISSION_DEADLINE = float(os.getenv("ADMISSION_DEADLINE", "10"))
+
 # Логирование
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("SearchAPI")
\ No newline at end of file
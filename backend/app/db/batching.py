@@ -0,0 +1,9 @@
+# Лимит переменных SQLite (SQLITE_MAX_VARIABLE_NUMBER) в старых сборках - 999, поэтому IN (...) режем на части
+IN_CHUNK_SIZE = 500
+
+
+def chunked(values, size=IN_CHUNK_SIZE):
+    """Списки по size элементов - для запросов с IN (...)."""
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
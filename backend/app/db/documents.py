@@ -0,0 +1,122 @@
+import zlib
+from app.db.batching import chunked
+from app.db.schema import content_hash
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Виды документов системы в system_documents.kind
+WIKI = "wiki"
+AI_KEYWORDS = "ai_keywords"
+
+
+DEFAULT_CODEC = "zstd" if zstandard is not None else "zlib"
+
+
+def compress(data, codec=DEFAULT_CODEC):
+    """Возвращает (codec, blob). Короткие тексты, которые не сжимаются, хранятся как есть."""
+    if codec == "zstd":
+        blob = zstandard.ZstdCompressor(level=9).compress(data)
+    else:
+        blob = zlib.compress(data, 6)
+    if len(blob) >= len(data):
+        return "raw", data
+    return codec, blob
+
+
+def decompress(blob, codec):
+    if codec == "raw":
+        return bytes(blob).decode("utf-8")
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Document is zstd-compressed, but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(blob).decode("utf-8")
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def create_table(cursor):
+    # Тексты хранятся отдельно от systems, чтобы сканы каталога не читали мегабайты вики
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS system_documents (
+            system_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            codec TEXT NOT NULL,
+            body BLOB NOT NULL,
+            content_hash TEXT NOT NULL,
+            raw_size INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (system_id, kind)
+        )
+    ''')
+
+
+def put_document(cursor, system_id, kind, text, stored_hash=None):
+    """
+    Сохраняет текст, только если его хэш изменился. Возвращает True при записи.
+    stored_hash можно передать, если он уже известен вызывающему (экономит SELECT).
+    """
+    new_hash = content_hash(text)
+    if stored_hash is None:
+        stored_hash = get_document_hashes(cursor, [system_id], kind).get(system_id)
+    if new_hash == stored_hash:
+        return False
+    data = text.encode("utf-8")
+    codec, blob = compress(data)
+    cursor.execute('''
+        INSERT INTO system_documents (system_id, kind, codec, body, content_hash, raw_size, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(system_id, kind) DO UPDATE SET
+            codec=excluded.codec, body=excluded.body, content_hash=excluded.content_hash,
+            raw_size=excluded.raw_size, updated_at=CURRENT_TIMESTAMP
+    ''', (system_id, kind, codec, blob, new_hash, len(data)))
+    return True
+
+
+def get_documents(cursor, system_ids, kind):
+    """{system_id: текст} для систем, у которых есть документ этого вида."""
+    docs = {}
+    for chunk in chunked(system_ids):
+        cursor.execute(
+            f"SELECT system_id, codec, body FROM system_documents "
+            f"WHERE kind = ? AND system_id IN ({','.join('?' * len(chunk))})",
+            [kind, *chunk],
+        )
+        docs.update((sys_id, decompress(body, codec)) for sys_id, codec, body in cursor.fetchall())
+    return docs
+
+
+def get_document(cursor, system_id, kind):
+    return get_documents(cursor, [system_id], kind).get(system_id)
+
+
+def get_document_hashes(cursor, system_ids, kind):
+    hashes = {}
+    for chunk in chunked(system_ids):
+        cursor.execute(
+            f"SELECT system_id, content_hash FROM system_documents "
+            f"WHERE kind = ? AND system_id IN ({','.join('?' * len(chunk))})",
+            [kind, *chunk],
+        )
+        hashes.update(cursor.fetchall())
+    return hashes
+
+
+def move_inline_documents(conn):
+    """
+    Переносит wiki_content / ai_keywords из строк systems в system_documents
+    и обнуляет исходные колонки. Возвращает число перенесенных документов.
+    """
+    cursor = conn.cursor()
+    moved = 0
+    for column, kind in (("wiki_content", WIKI), ("ai_keywords", AI_KEYWORDS)):
+        cursor.execute(f"SELECT id, {column} FROM systems WHERE {column} IS NOT NULL")
+        rows = cursor.fetchall()
+        for sys_id, text in rows:
+            if text:
+                put_document(cursor, sys_id, kind, text)
+                moved += 1
+        cursor.execute(f"UPDATE systems SET {column} = NULL WHERE {column} IS NOT NULL")
+    conn.commit()
+    return moved
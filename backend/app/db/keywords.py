@@ -0,0 +1,71 @@
+import re
+from app.config import logger
+from app.utils.text import preprocess_text
+from app.db.batching import chunked
+from app.db.documents import AI_KEYWORDS, get_documents
+
+# Вес ключевого слова, полученного раскрытием синонимов (прямое упоминание - 1.0)
+SYNONYM_WEIGHT = 0.7
+
+
+def normalize_keywords(raw):
+    """
+    Ответ LLM "слово, фраза, ..." -> [(keyword, lemma, weight)] без повторов по лемме.
+    Для фраз с синонимами добавляется вторая запись с раскрытыми синонимами и меньшим весом.
+    """
+    entries = {}
+
+    def add(keyword, lemma, weight):
+        if lemma and (lemma not in entries or entries[lemma][2] < weight):
+            entries[lemma] = (keyword, lemma, weight)
+
+    for keyword in re.split(r'[,;\n]', raw or ""):
+        keyword = keyword.strip(' .-•*\t')
+        if not keyword:
+            continue
+        lemma = preprocess_text(keyword, expand_synonyms=False)
+        add(keyword, lemma, 1.0)
+        expanded = preprocess_text(keyword, expand_synonyms=True)
+        if expanded != lemma:
+            add(keyword, expanded, SYNONYM_WEIGHT)
+    return list(entries.values())
+
+
+def replace_keywords(cursor, system_id, raw):
+    """Перезаписывает ключевые слова системы по ответу LLM (без коммита)."""
+    cursor.execute("DELETE FROM system_keywords WHERE system_id = ?", (system_id,))
+    cursor.executemany(
+        "INSERT INTO system_keywords (system_id, keyword, lemma, weight) VALUES (?, ?, ?, ?)",
+        [(system_id, keyword, lemma, weight) for keyword, lemma, weight in normalize_keywords(raw)],
+    )
+
+
+def get_keywords(cursor, system_ids):
+    """{system_id: [(lemma, weight), ...]}"""
+    keywords = {}
+    for chunk in chunked(system_ids):
+        cursor.execute(
+            f"SELECT system_id, lemma, weight FROM system_keywords "
+            f"WHERE system_id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        )
+        for sys_id, lemma, weight in cursor.fetchall():
+            keywords.setdefault(sys_id, []).append((lemma, weight))
+    return keywords
+
+
+def backfill_keywords(conn):
+    """Заполняет system_keywords для систем, обогащенных до появления таблицы."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT d.system_id FROM system_documents d
+        WHERE d.kind = ? AND NOT EXISTS (SELECT 1 FROM system_keywords k WHERE k.system_id = d.system_id)
+    ''', (AI_KEYWORDS,))
+    missing = [row[0] for row in cursor.fetchall()]
+    if not missing:
+        return 0
+    for sys_id, raw in get_documents(cursor, missing, AI_KEYWORDS).items():
+        replace_keywords(cursor, sys_id, raw)
+    conn.commit()
+    logger.info(f"Keywords backfilled for {len(missing)} systems")
+    return len(missing)
@@ -1,11 +1,30 @@
+import os
 import sqlite3
-import pandas as pd
-from app.config import DB_PATH, logger
-from app.utils.text import fix_encoding
+from app.config import DB_PATH, JIRA_DB_NAME, logger
+from app.utils.http import file_version
+from app.db.batching import chunked
+from app.db.schema import CHANGE_WIKI, log_changes, migrate
+from app.db.documents import AI_KEYWORDS, WIKI, get_document, get_documents, put_document
+from app.db.keywords import backfill_keywords, get_keywords
+
+# Поля системы, которые отдаются наружу (служебные хэши и тексты документов сюда не входят)
+SYSTEM_FIELDS = (
+    'id', 'product_name', 'product_code', 'status', 'owner_name', 'owner_email', 'owner_telegram',
+    'description', 'wiki_url', 'jira_url', 'repo_url', 'last_updated',
+)
+
+# Сам текст вики в выдачу не попадает - только признак, что он есть
+SYSTEMS_SELECT = f'''
+    SELECT {', '.join(SYSTEM_FIELDS)},
+        EXISTS(SELECT 1 FROM system_documents d WHERE d.system_id = systems.id AND d.kind = '{WIKI}')
+            AS has_wiki_content
+    FROM systems
+'''
 
 class SystemRepository:
-    def __init__(self, db_path=DB_PATH):
+    def __init__(self, db_path=DB_PATH, jira_db_path=JIRA_DB_NAME):
         self.db_path = db_path
+        self.jira_db_path = jira_db_path
         self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         self._init_db()
 
@@ -48,6 +67,8 @@ class SystemRepository:
             pass
 
         self.conn.commit()
+        migrate(self.conn)
+        backfill_keywords(self.conn)
         
     def get_user(self, username):
         cursor = self.conn.cursor()
@@ -56,11 +77,121 @@ class SystemRepository:
 
     def get_all_systems_df(self):
         """Возвращает DataFrame для поиска"""
+        import pandas as pd
         return pd.read_sql("SELECT * FROM systems", self.conn)
 
+    def _fetch_dicts(self, query, params=()):
+        cursor = self.conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute(query, params)
+        rows = [dict(row) for row in cursor.fetchall()]
+        for row in rows:
+            if 'has_wiki_content' in row:
+                row['has_wiki_content'] = bool(row['has_wiki_content'])
+        return rows
+
+    def get_all_systems(self):
+        """Все системы списком словарей (None вместо NaN, в отличие от DataFrame)."""
+        return self._fetch_dicts(SYSTEMS_SELECT)
+
+    def get_systems_by_ids(self, system_ids):
+        rows = []
+        for chunk in chunked(system_ids):
+            rows.extend(self._fetch_dicts(
+                f"{SYSTEMS_SELECT} WHERE id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ))
+        return rows
+
+    def get_system(self, sys_id):
+        """Карточка системы целиком, вместе с текстами вики и ai_keywords."""
+        rows = self.get_systems_by_ids([sys_id])
+        if not rows:
+            return None
+        system = rows[0]
+        cursor = self.conn.cursor()
+        system['wiki_content'] = get_document(cursor, sys_id, WIKI)
+        system['ai_keywords'] = get_document(cursor, sys_id, AI_KEYWORDS)
+        return system
+
+    def get_documents(self, system_ids, kind):
+        """Распакованные тексты документов {id системы: текст}."""
+        return get_documents(self.conn.cursor(), system_ids, kind)
+
+    def get_keywords(self, system_ids):
+        """Нормализованные ключевые слова {id системы: [(лемма, вес), ...]}."""
+        return get_keywords(self.conn.cursor(), system_ids)
+
+    def get_last_change_id(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM system_changes")
+        return cursor.fetchone()[0]
+
+    def get_changed_system_ids(self, after_id, up_to_id):
+        """id систем из журнала изменений в полуинтервале (after_id, up_to_id]."""
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT DISTINCT system_id FROM system_changes WHERE id > ? AND id <= ?",
+            (after_id, up_to_id),
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+    def data_version(self, with_topics=False):
+        """Версия systems_kb.db (и jira_data.db при with_topics) по stat() файлов."""
+        version = file_version(self.db_path)
+        if with_topics:
+            version += "|" + file_version(self.jira_db_path)
+        return version
+
+    def _attach_jira_db(self):
+        """
+        Подключает jira_data.db к соединению поиска как схему `jira`.
+        Возвращает False, если файла с топиками еще нет (ATTACH создал бы пустую БД).
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("PRAGMA database_list")
+        if any(row[1] == 'jira' for row in cursor.fetchall()):
+            return True
+        if not os.path.exists(self.jira_db_path):
+            return False
+        cursor.execute("ATTACH DATABASE ? AS jira", (self.jira_db_path,))
+        return True
+
+    def get_topic_counts(self, system_codes):
+        """
+        Количество producer/consumer связей по кодам систем одним запросом.
+        Возвращает {system_code: {"producers": n, "consumers": m, "total": k}}.
+        """
+        codes = list(dict.fromkeys(c for c in system_codes if c))
+        if not codes or not self._attach_jira_db():
+            return {}
+
+        counts = {}
+        cursor = self.conn.cursor()
+        for chunk in chunked(codes):
+            placeholders = ",".join("?" * len(chunk))
+            try:
+                cursor.execute(f'''
+                    SELECT
+                        system_code,
+                        SUM(CASE WHEN UPPER(role) = 'PRODUCER' THEN 1 ELSE 0 END),
+                        SUM(CASE WHEN UPPER(role) = 'CONSUMER' THEN 1 ELSE 0 END),
+                        COUNT(*)
+                    FROM jira.system_dependencies
+                    WHERE system_code IN ({placeholders})
+                    GROUP BY system_code
+                ''', chunk)
+            except sqlite3.OperationalError as e:
+                logger.error(f"Database error (Jira DB): {e}")
+                return {}
+            for code, producers, consumers, total in cursor.fetchall():
+                counts[code] = {"producers": producers, "consumers": consumers, "total": total}
+        return counts
+
     def update_wiki_content(self, sys_id, content):
         cursor = self.conn.cursor()
-        cursor.execute("UPDATE systems SET wiki_content = ? WHERE id = ?", (content, sys_id))
+        if put_document(cursor, sys_id, WIKI, content):
+            log_changes(cursor, [sys_id], CHANGE_WIKI)
         self.conn.commit()
 
     def create_user(self, username, hashed_password):
@@ -72,3 +203,10 @@ class SystemRepository:
         except sqlite3.IntegrityError:
             return False
 
+    def delete_users(self, usernames):
+        """Удаляет пользователей (служебные учетки нагрузочного теста). Возвращает число удаленных."""
+        cursor = self.conn.cursor()
+        cursor.executemany("DELETE FROM users WHERE username = ?", [(name,) for name in usernames])
+        self.conn.commit()
+        return cursor.rowcount
+
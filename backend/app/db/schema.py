@@ -0,0 +1,183 @@
+import hashlib
+import sqlite3
+from app.config import logger
+
+# Что изменилось у системы (поле field в system_changes)
+CHANGE_SYSTEM = "system"
+CHANGE_WIKI = "wiki"
+CHANGE_AI_KEYWORDS = "ai_keywords"
+CHANGE_DELETED = "deleted"
+
+
+def ensure_product_name_index(cursor):
+    """
+    Уникальный индекс по product_name нужен для ON CONFLICT в bulk upsert (knowledge_base.py).
+    Старый построчный импорт всегда обновлял первую найденную запись,
+    поэтому более поздние дубли никогда не обновлялись - их удаляем перед созданием индекса.
+    Неуникальный индекс с тем же именем (был в одной из версий migrate) пересоздается.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'systems'")
+    if not cursor.fetchone():
+        return
+    indexes = {row[1]: row[2] for row in cursor.execute("PRAGMA index_list(systems)").fetchall()}
+    if indexes.get('idx_systems_product_name'):
+        return
+    if 'idx_systems_product_name' in indexes:
+        cursor.execute("DROP INDEX idx_systems_product_name")
+
+    cursor.execute('''
+        SELECT id FROM systems
+        WHERE product_name IS NOT NULL
+          AND id NOT IN (SELECT MIN(id) FROM systems GROUP BY product_name)
+    ''')
+    duplicate_ids = [row[0] for row in cursor.fetchall()]
+    if duplicate_ids:
+        delete_systems(cursor, duplicate_ids)
+        logger.warning(f"Removed {len(duplicate_ids)} duplicate systems by product_name")
+    cursor.execute("CREATE UNIQUE INDEX idx_systems_product_name ON systems (product_name)")
+
+
+def migrate(conn):
+    """
+    Общие миграции systems_kb.db для API и скриптов (knowledge_base.py, enrich_with_ai.py).
+    Идемпотентны: добавляют только то, чего еще нет.
+    """
+    cursor = conn.cursor()
+    # WAL: чтение API не блокируется записью фоновых задач и скриптов
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # ai_source_hash - хэш вики-текста, по которому были получены ai_keywords.
+    # wiki_hash / ai_keywords_hash остались от хранения текстов в systems - теперь хэш лежит в system_documents
+    for column in ("content_hash TEXT", "wiki_hash TEXT", "ai_keywords_hash TEXT", "ai_source_hash TEXT"):
+        try:
+            cursor.execute(f"ALTER TABLE systems ADD COLUMN {column}")
+        except sqlite3.OperationalError:
+            pass
+
+    # Какая страница Confluence и какой ее версии сейчас сохранена как вики-текст системы
+    for column in ("wiki_page_id TEXT", "wiki_version INTEGER"):
+        try:
+            cursor.execute(f"ALTER TABLE systems ADD COLUMN {column}")
+        except sqlite3.OperationalError:
+            pass
+
+    # Разрешенные ссылки wiki_url -> id страницы (в т.ч. домашние страницы пространств)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS wiki_url_cache (
+            url TEXT PRIMARY KEY,
+            page_id TEXT NOT NULL,
+            resolved_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Тексты вики и ai_keywords хранятся сжатыми в system_documents;
+    # все, что еще лежит в старых колонках systems, переносится при первом запуске
+    from app.db.documents import create_table, move_inline_documents
+    create_table(cursor)
+    conn.commit()
+    moved = move_inline_documents(conn)
+    if moved:
+        logger.info(f"Moved {moved} inline documents from systems to system_documents")
+
+    # Чекпоинт AI-обогащения: неудачные попытки по системам. Успешные видны по ai_source_hash,
+    # поэтому прерванный прогон продолжает с необработанных систем
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS enrichment_failures (
+            system_id INTEGER PRIMARY KEY,
+            source_hash TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Нормализованные ключевые слова из ответа LLM: лемма фразы и вес, индекс по лемме для поиска
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS system_keywords (
+            system_id INTEGER NOT NULL,
+            keyword TEXT NOT NULL,
+            lemma TEXT NOT NULL,
+            weight REAL NOT NULL DEFAULT 1.0,
+            PRIMARY KEY (system_id, lemma)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_system_keywords_lemma ON system_keywords (lemma)")
+
+    # Выборка систем по коду - без полного прохода по таблице; по названию - уникальный индекс
+    # (в конце: удаление дублей пишется в system_changes)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_systems_product_code ON systems (product_code)")
+
+    # Ответы LLM по ключу hash(модель, шаблон промпта, вход) - одинаковый текст не генерируется дважды
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Метрики вызовов LLM: время до первого токена, скорость генерации, причина остановки
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_call_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            model TEXT NOT NULL,
+            started_at TIMESTAMP NOT NULL,
+            prompt_chars INTEGER,
+            prompt_tokens INTEGER,
+            output_tokens INTEGER,
+            ttft_ms REAL,
+            total_ms REAL,
+            tokens_per_s REAL,
+            stop_reason TEXT
+        )
+    ''')
+
+    # Журнал изменений: по нему индекс и кэши поиска обновляют только затронутые документы
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS system_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            system_id INTEGER NOT NULL,
+            field TEXT NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    ensure_product_name_index(cursor)
+    conn.commit()
+
+
+def content_hash(*values):
+    """Стабильный хэш набора значений (None и пустая строка считаются одинаковыми)."""
+    digest = hashlib.sha1()
+    for value in values:
+        digest.update(("" if value is None else str(value)).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+def delete_systems(cursor, system_ids):
+    """
+    Удаляет системы вместе с их документами, ключевыми словами и чекпоинтом обогащения,
+    а также ссылки wiki_url_cache, на которые больше никто не ссылается (без коммита).
+    """
+    params = [(sys_id,) for sys_id in system_ids]
+    urls = set()
+    for sys_id, in params:
+        row = cursor.execute("SELECT wiki_url FROM systems WHERE id = ?", (sys_id,)).fetchone()
+        if row and row[0]:
+            urls.add(row[0])
+    for table in ("system_documents", "system_keywords", "enrichment_failures"):
+        cursor.executemany(f"DELETE FROM {table} WHERE system_id = ?", params)
+    cursor.executemany("DELETE FROM systems WHERE id = ?", params)
+    cursor.executemany(
+        "DELETE FROM wiki_url_cache WHERE url = ? AND NOT EXISTS (SELECT 1 FROM systems WHERE wiki_url = ?)",
+        [(url, url) for url in urls],
+    )
+    log_changes(cursor, system_ids, CHANGE_DELETED)
+
+
+def log_changes(cursor, system_ids, field):
+    """Записывает затронутые системы в system_changes (без коммита)."""
+    cursor.executemany(
+        "INSERT INTO system_changes (system_id, field) VALUES (?, ?)",
+        [(sys_id, field) for sys_id in system_ids],
+    )
@@ -1,20 +1,62 @@
-from fastapi import Depends, HTTPException, status
+import threading
+from fastapi import Depends, HTTPException, Request, status
 from jose import JWTError, jwt
 from app.security import oauth2_scheme
-from app.config import SECRET_KEY, ALGORITHM
+from app.config import (
+    SECRET_KEY, ALGORITHM, JOBS_HISTORY,
+    ADMISSION_AUTH_CONCURRENCY, ADMISSION_DEADLINE, ADMISSION_PER_USER_QUEUE, ADMISSION_QUEUE_SIZE,
+    ADMISSION_SEARCH_CONCURRENCY, ADMISSION_TOPICS_CONCURRENCY,
+)
 from app.db.repository import SystemRepository
 from app.services.search import SearchService
+from app.services.topic_graph import TopicGraphProvider
+from app.services.jobs import JobManager
+from app.services.job_handlers import register_handlers
+from app.services.admission import AdmissionClass, AdmissionController, Rejected
 
-# Singleton для репозитория (чтобы не пересоздавать подключение)
-_repo = SystemRepository()
-_search_service = SearchService(_repo)
+# Singleton'ы создаются при первом обращении (обычно - на прогреве при старте),
+# а не при импорте: импорт модуля не открывает БД
+_repo = None
+_search_service = None
+_init_lock = threading.Lock()
+_topic_graph = TopicGraphProvider()
+# После каждой фоновой задачи индекс поиска догоняет данные сразу, а не на первом запросе
+_jobs = JobManager(on_finish=lambda job: get_search_service().refresh(), history=JOBS_HISTORY)
+register_handlers(_jobs)
+# Свои бюджеты у тяжелого поиска, легких топиков и логина (bcrypt): всплеск поиска
+# не должен выстраивать в очередь за собой /token и /systems/.../topics
+_admission = AdmissionController([
+    AdmissionClass("search", ADMISSION_SEARCH_CONCURRENCY, ADMISSION_QUEUE_SIZE, ADMISSION_DEADLINE, ADMISSION_PER_USER_QUEUE),
+    AdmissionClass("topics", ADMISSION_TOPICS_CONCURRENCY, ADMISSION_QUEUE_SIZE, ADMISSION_DEADLINE, ADMISSION_PER_USER_QUEUE),
+    AdmissionClass("auth", ADMISSION_AUTH_CONCURRENCY, ADMISSION_QUEUE_SIZE, ADMISSION_DEADLINE, ADMISSION_PER_USER_QUEUE),
+])
 
 def get_repository():
+    global _repo
+    if _repo is None:
+        with _init_lock:
+            if _repo is None:
+                _repo = SystemRepository()
     return _repo
 
 def get_search_service():
+    global _search_service
+    if _search_service is None:
+        repo = get_repository()
+        with _init_lock:
+            if _search_service is None:
+                _search_service = SearchService(repo)
     return _search_service
 
+def get_topic_graph():
+    return _topic_graph.get()
+
+def get_job_manager():
+    return _jobs
+
+def get_admission():
+    return _admission
+
 async def get_current_user(token: str = Depends(oauth2_scheme), repo: SystemRepository = Depends(get_repository)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -32,4 +74,39 @@ async def get_current_user(token: str = Depends(oauth2_scheme), repo: SystemRepo
     user = repo.get_user(username)
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return user
+
+
+async def _acquire(admission_class, key):
+    try:
+        return await admission_class.acquire(key)
+    except Rejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Service is overloaded ({e.reason}), retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+def admit_user(kind):
+    """Зависимость: слот класса kind на время запроса; очередь ожидания - по пользователю из токена."""
+    admission_class = _admission.get(kind)
+
+    async def dependency(current_user: tuple = Depends(get_current_user)):
+        started = await _acquire(admission_class, current_user[0])
+        try:
+            yield
+        finally:
+            admission_class.release(started)
+    return dependency
+
+def admit_client(kind):
+    """То же для эндпоинтов без авторизации: очередь - по адресу клиента."""
+    admission_class = _admission.get(kind)
+
+    async def dependency(request: Request):
+        started = await _acquire(admission_class, request.client.host if request.client else None)
+        try:
+            yield
+        finally:
+            admission_class.release(started)
+    return dependency
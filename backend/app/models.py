@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 class Token(BaseModel):
     access_token: str
@@ -9,4 +10,43 @@ class TopicInfo(BaseModel):
     topic_name: str
     role: str
     jira_key: str
-    consumer_group: Optional[str] = None
\ No newline at end of file
+    consumer_group: Optional[str] = None
+
+class TopicsBatchRequest(BaseModel):
+    system_codes: List[str]
+
+class TopicSystems(BaseModel):
+    topic_name: str
+    producers: List[str]
+    consumers: List[str]
+
+class ImpactNode(BaseModel):
+    system_code: str
+    depth: int
+    via_topic: str
+
+class ImpactResponse(BaseModel):
+    system_code: str
+    direction: str
+    max_depth: int
+    affected: List[ImpactNode]
+
+class JobRequest(BaseModel):
+    params: Dict[str, Any] = {}
+
+class JobInfo(BaseModel):
+    id: int
+    kind: str
+    status: str
+    source: str
+    params: Dict[str, Any]
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    done: int
+    total: Optional[int] = None
+    progress: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    message: Optional[str] = None
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, status
+from app.dependencies import get_admission, get_current_user, get_search_service
+from app.services.admission import AdmissionController
+from app.services.search import SearchService
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.get("/index")
+def index_status(
+    current_user: tuple = Depends(get_current_user),
+    search_service: SearchService = Depends(get_search_service)
+):
+    """Текущее поколение индекса поиска: id, время сборки, число документов, идет ли сборка."""
+    return search_service.status()
+
+
+@router.post("/reindex", status_code=status.HTTP_202_ACCEPTED)
+def reindex(
+    full: bool = True,
+    current_user: tuple = Depends(get_current_user),
+    search_service: SearchService = Depends(get_search_service)
+):
+    """
+    Пересборка индекса в фоне (full=false - только по журналу изменений).
+    Поиск продолжает отвечать по текущему поколению до публикации нового.
+    """
+    started = search_service.refresh_async(full=full)
+    return {"started": started, **search_service.status()}
+
+
+@router.get("/admission")
+def admission_metrics(
+    current_user: tuple = Depends(get_current_user),
+    admission: AdmissionController = Depends(get_admission)
+):
+    """Допуск запросов по классам: в работе, в очереди, принято, отклонено по причинам, среднее ожидание."""
+    return admission.metrics()
@@ -2,12 +2,12 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from app.models import Token
 from app.security import verify_password, create_access_token
-from app.dependencies import get_repository
+from app.dependencies import admit_client, get_repository
 from app.db.repository import SystemRepository
 
 router = APIRouter(tags=["Authentication"])
 
-@router.post("/token", response_model=Token)
+@router.post("/token", response_model=Token, dependencies=[Depends(admit_client("auth"))])
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     repo: SystemRepository = Depends(get_repository)
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+
+@router.get("/live")
+def live():
+    """Процесс жив и обрабатывает запросы (прогрев может еще идти)."""
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+def ready(request: Request):
+    """200, когда прогрев завершен и поиск отвечает без задержки на инициализацию, иначе 503."""
+    warmup = request.app.state.warmup
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if warmup.ready.is_set() else 503)
@@ -0,0 +1,60 @@
+from typing import List, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, status
+from app.models import JobInfo, JobRequest
+from app.dependencies import get_current_user, get_job_manager
+from app.services.jobs import JobManager
+
+router = APIRouter(tags=["Jobs"])
+
+
+@router.get("/jobs", response_model=List[JobInfo])
+def list_jobs(
+    current_user: tuple = Depends(get_current_user),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """Последние задачи, новые первыми."""
+    return [job.to_dict() for job in jobs.list()]
+
+
+@router.get("/jobs/{job_id}", response_model=JobInfo)
+def get_job(
+    job_id: int,
+    current_user: tuple = Depends(get_current_user),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """Статус, прогресс и оценка времени до завершения."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.post("/jobs/{kind}", response_model=JobInfo, status_code=status.HTTP_202_ACCEPTED)
+def submit_job(
+    kind: str,
+    request: Optional[JobRequest] = Body(None),
+    current_user: tuple = Depends(get_current_user),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """
+    Запуск задачи: confluence_sync, csv_import ({"params": {"systems_csv", "contacts_csv"}} - имена файлов в IMPORT_DIR),
+    enrichment ({"params": {"limit"}}), search_refresh.
+    """
+    if kind not in jobs.kinds:
+        raise HTTPException(status_code=404, detail=f"Unknown job kind. Available: {', '.join(jobs.kinds)}")
+    params = request.params if request else {}
+    return jobs.submit(kind, params, source=current_user[0]).to_dict()
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobInfo)
+def cancel_job(
+    job_id: int,
+    current_user: tuple = Depends(get_current_user),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.finished_at is not None:
+        raise HTTPException(status_code=409, detail=f"Job is already {job.status}")
+    return jobs.cancel(job_id).to_dict()
@@ -1,16 +1,142 @@
-from fastapi import APIRouter, Depends, Query
-from app.dependencies import get_current_user, get_search_service
+import time
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from app.dependencies import admit_user, get_current_user, get_repository, get_search_service
+from app.db.repository import SystemRepository
 from app.services.search import SearchService
-from app.config import logger
+from app.services.facets import SearchFilters
+from app.services.search_engine import STRATEGIES, SearchProfile
+from app.config import HTTP_CACHE_MAX_AGE, logger
+from app.utils.http import conditional_response, make_etag
 
 router = APIRouter()
 
-@router.get("/search")
+@router.get("/search", dependencies=[Depends(admit_user("search"))])
 def search_systems(
+    request: Request,
+    response: Response,
     q: str, 
     limit: int = 5, 
+    include: Optional[str] = Query(None, description="Дополнительные данные через запятую: topics_summary, wiki_snippet"),
+    mode: Optional[str] = Query(None, description="Стратегия поиска: exhaustive, indexed, hybrid (по умолчанию - SEARCH_MODE)"),
+    explain: bool = Query(False, description="Вернуть составляющие баллов, формы запроса, счетчики и время этапов"),
+    status: Optional[List[str]] = Query(None, description="Фильтр по статусу (можно несколько)"),
+    owner: Optional[List[str]] = Query(None, description="Фильтр по владельцу (можно несколько)"),
+    has_wiki: Optional[bool] = Query(None, description="Есть ссылка на вики (wiki_url)"),
+    has_jira: Optional[bool] = Query(None, description="Есть ссылка на Jira (jira_url)"),
+    has_repo: Optional[bool] = Query(None, description="Есть ссылка на репозиторий (repo_url)"),
+    has_wiki_content: Optional[bool] = Query(None, description="Текст вики-страницы скачан из Confluence"),
+    facets: bool = Query(False, description="Вернуть счетчики фасетов: {results, facets}"),
     current_user: tuple = Depends(get_current_user),
     search_service: SearchService = Depends(get_search_service)
 ):
+    includes = {part.strip() for part in include.split(",")} if include else set()
+    if mode is not None and mode not in STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Unknown search mode. Available: {', '.join(STRATEGIES)}")
+
+    filters = SearchFilters(status, owner, has_wiki, has_jira, has_repo, has_wiki_content)
+
+    # Весь запрос, включая ETag, работает с одним поколением индекса
+    generation = search_service.current()
+    if explain:
+        logger.info(f"User {current_user[0]} explaining search for: {q}")
+        return _explain_search(response, search_service, generation, q, limit, includes, mode, filters, facets)
+
+    etag = make_etag(search_service.data_version(with_topics="topics_summary" in includes, generation=generation),
+                     q, limit, ",".join(sorted(includes)), mode, filters.key(), facets)
+    not_modified = conditional_response(
+        request, response, etag,
+        cache_control=f"private, max-age={HTTP_CACHE_MAX_AGE}, must-revalidate",
+        vary="Authorization",
+    )
+    if not_modified:
+        return not_modified
+
     logger.info(f"User {current_user[0]} searching for: {q}")
-    return search_service.fuzzy_search(q, limit=limit)
\ No newline at end of file
+    facet_counts = {} if facets else None
+    results = search_service.fuzzy_search(q, limit=limit, generation=generation, mode=mode,
+                                          filters=filters, facets=facet_counts)
+    _attach_includes(search_service, results, q, includes)
+    if facets:
+        return {"results": results, "facets": facet_counts}
+    return results
+
+
+def _attach_includes(search_service, results, q, includes):
+    if "topics_summary" in includes:
+        search_service.attach_topics_summary(results)
+    if "wiki_snippet" in includes:
+        search_service.attach_wiki_snippets(results, q)
+
+
+def _explain_search(response, search_service, generation, q, limit, includes, mode, filters, facets):
+    """
+    Выдача в конверте: результаты с explain (составляющие балла), формы запроса,
+    кандидаты/отсеянные и время этапов. Тайминги у каждого запроса свои - не кэшируется.
+    """
+    started = time.perf_counter()
+    profile = SearchProfile()
+    facet_counts = {} if facets else None
+    results = search_service.fuzzy_search(q, limit=limit, generation=generation, mode=mode, profile=profile,
+                                          filters=filters, facets=facet_counts)
+    if includes:
+        with profile.stage("includes"):
+            _attach_includes(search_service, results, q, includes)
+    with profile.stage("serialization"):
+        results = jsonable_encoder(results)
+    profile.timings["total"] = (time.perf_counter() - started) * 1000
+
+    response.headers["Cache-Control"] = "no-store"
+    envelope = {"generation": generation.id, **profile.to_dict(), "results": results}
+    if facets:
+        envelope["facets"] = facet_counts
+    return envelope
+
+
+@router.get("/owners", dependencies=[Depends(admit_user("topics"))])
+def search_owners(
+    request: Request,
+    response: Response,
+    q: str = Query(..., description="Email, Telegram (@handle) или начало имени/фамилии"),
+    limit: int = 10,
+    current_user: tuple = Depends(get_current_user),
+    search_service: SearchService = Depends(get_search_service)
+):
+    """Владельцы систем со списком того, чем они владеют (индекс строится вместе с поисковым)."""
+    generation = search_service.current()
+    etag = make_etag(search_service.data_version(generation=generation), "owners", q, limit)
+    not_modified = conditional_response(
+        request, response, etag,
+        cache_control=f"private, max-age={HTTP_CACHE_MAX_AGE}, must-revalidate",
+        vary="Authorization",
+    )
+    if not_modified:
+        return not_modified
+
+    logger.info(f"User {current_user[0]} looking up owners: {q}")
+    return search_service.find_owners(q, limit=limit, generation=generation)
+
+
+@router.get("/systems/{system_id}", dependencies=[Depends(admit_user("topics"))])
+def get_system(
+    request: Request,
+    response: Response,
+    system_id: int,
+    current_user: tuple = Depends(get_current_user),
+    repo: SystemRepository = Depends(get_repository)
+):
+    """Карточка системы с полным текстом вики и ai_keywords (в выдаче поиска их нет)."""
+    etag = make_etag(repo.data_version(), system_id)
+    not_modified = conditional_response(
+        request, response, etag,
+        cache_control=f"private, max-age={HTTP_CACHE_MAX_AGE}, must-revalidate",
+        vary="Authorization",
+    )
+    if not_modified:
+        return not_modified
+
+    system = repo.get_system(system_id)
+    if system is None:
+        raise HTTPException(status_code=404, detail="System not found")
+    return system
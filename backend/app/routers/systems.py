@@ -1,55 +1,126 @@
 import sqlite3
 import logging
-from typing import List
-from fastapi import APIRouter, HTTPException
-from app.models import TopicInfo
-from app.config import JIRA_DB_NAME
+from typing import Dict, List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from app.models import TopicInfo, TopicsBatchRequest, TopicSystems, ImpactResponse
+from app.config import JIRA_DB_NAME, TOPICS_BATCH_MAX_CODES, IMPACT_MAX_DEPTH, HTTP_CACHE_MAX_AGE
+from app.db.batching import chunked
+from app.dependencies import admit_client, get_topic_graph
+from app.services.topic_graph import TopicGraph
+from app.utils.http import conditional_response, file_version, make_etag
 
-router = APIRouter(tags=["Systems & Topics"])
+router = APIRouter(tags=["Systems & Topics"], dependencies=[Depends(admit_client("topics"))])
 
-@router.get("/systems/{system_code}/topics", response_model=List[TopicInfo])
-def get_topics_by_system(system_code: str):
+TOPICS_QUERY = '''
+    SELECT 
+        d.system_code,
+        d.topic_name, 
+        d.role, 
+        d.jira_key,
+        t.consumer_group
+    FROM system_dependencies d
+    LEFT JOIN topics_info t 
+        ON d.topic_name = t.topic_name AND d.jira_key = t.jira_key
+    WHERE d.system_code IN ({placeholders})
+'''
+
+
+
+def _row_to_topic(row):
+    return {
+        "topic_name": row['topic_name'],
+        "role": row['role'],
+        "jira_key": row['jira_key'],
+        "consumer_group": row['consumer_group']
+    }
+
+
+def _fetch_topics(system_codes):
     """
-    Возвращает список топиков для указанной системы из jira_data.db.
-    system_code - код системы (например, SYS-001)
+    Загружает топики сразу для нескольких систем одним соединением.
+    Возвращает {system_code: [topic, ...]} только для систем, у которых есть связи.
     """
     conn = sqlite3.connect(JIRA_DB_NAME)
     conn.row_factory = sqlite3.Row 
     cursor = conn.cursor()
-    
-    query = '''
-        SELECT 
-            d.topic_name, 
-            d.role, 
-            d.jira_key,
-            t.consumer_group
-        FROM system_dependencies d
-        LEFT JOIN topics_info t 
-            ON d.topic_name = t.topic_name AND d.jira_key = t.jira_key
-        WHERE d.system_code = ?
-    '''
-    
+
+    grouped = {}
     try:
-        cursor.execute(query, (system_code,))
-        rows = cursor.fetchall()
+        for chunk in chunked(system_codes):
+            query = TOPICS_QUERY.format(placeholders=",".join("?" * len(chunk)))
+            cursor.execute(query, chunk)
+            for row in cursor.fetchall():
+                grouped.setdefault(row['system_code'], []).append(_row_to_topic(row))
     except sqlite3.OperationalError as e:
         logging.error(f"Database error (Jira DB): {e}")
+        # Возвращаем пустой результат или ошибку 500, в зависимости от требований
+        return {}
+    finally:
         conn.close()
-        # Возвращаем пустой список или ошибку 500, в зависимости от требований
-        return []
-        
-    conn.close()
-    
-    if not rows:
-        return [] 
-        
-    results = []
-    for row in rows:
-        results.append({
-            "topic_name": row['topic_name'],
-            "role": row['role'],
-            "jira_key": row['jira_key'],
-            "consumer_group": row['consumer_group']
-        })
-        
-    return results
\ No newline at end of file
+
+    return grouped
+
+
+@router.get("/systems/{system_code}/topics", response_model=List[TopicInfo])
+def get_topics_by_system(system_code: str, request: Request, response: Response):
+    """
+    Возвращает список топиков для указанной системы из jira_data.db.
+    system_code - код системы (например, SYS-001)
+    """
+    etag = make_etag(file_version(JIRA_DB_NAME), system_code)
+    not_modified = conditional_response(
+        request, response, etag,
+        cache_control=f"public, max-age={HTTP_CACHE_MAX_AGE}, must-revalidate",
+    )
+    if not_modified:
+        return not_modified
+
+    return _fetch_topics([system_code]).get(system_code, [])
+
+
+@router.post("/systems/topics:batch", response_model=Dict[str, List[TopicInfo]])
+def get_topics_batch(request: TopicsBatchRequest):
+    """
+    Возвращает топики для нескольких систем за один запрос (вместо N вызовов /systems/{code}/topics).
+    В ответе есть ключ для каждого запрошенного кода, даже если топиков нет.
+    """
+    codes = list(dict.fromkeys(code for code in request.system_codes if code))
+    if len(codes) > TOPICS_BATCH_MAX_CODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many system codes: {len(codes)} > {TOPICS_BATCH_MAX_CODES}",
+        )
+
+    grouped = _fetch_topics(codes) if codes else {}
+    return {code: grouped.get(code, []) for code in codes}
+
+
+@router.get("/topics/{topic_name}/systems", response_model=TopicSystems)
+def get_topic_systems(topic_name: str, graph: TopicGraph = Depends(get_topic_graph)):
+    """Обратный поиск: какие системы пишут в топик и какие его читают."""
+    result = graph.topic_systems(topic_name)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    return result
+
+
+@router.get("/systems/{system_code}/impact", response_model=ImpactResponse)
+def get_system_impact(
+    system_code: str,
+    direction: str = Query("downstream", pattern="^(downstream|upstream)$"),
+    depth: int = Query(3, ge=1, le=IMPACT_MAX_DEPTH),
+    graph: TopicGraph = Depends(get_topic_graph),
+):
+    """
+    Анализ влияния через топики Kafka.
+    downstream - какие системы затронет падение system_code,
+    upstream - от каких систем system_code зависит.
+    """
+    if not graph.has_system(system_code):
+        raise HTTPException(status_code=404, detail="System not found in dependencies")
+    return {
+        "system_code": system_code,
+        "direction": direction,
+        "max_depth": depth,
+        "affected": graph.impact(system_code, direction=direction, max_depth=depth),
+    }
\ No newline at end of file
@@ -20,3 +20,6 @@ def create_access_token(data: dict):
 
 def create_user(repo, username, hashed_password):
     return repo.create_user(username, hashed_password)
+
+def delete_users(repo, usernames):
+    return repo.delete_users(usernames)
@@ -0,0 +1,171 @@
+import asyncio
+import math
+import time
+from collections import Counter, OrderedDict, deque
+from app.config import logger
+
+# Сглаживание оценок времени обработки и ожидания (экспоненциальное среднее)
+EWMA_ALPHA = 0.2
+
+QUEUE_FULL = "queue_full"
+USER_LIMIT = "user_limit"
+DEADLINE = "deadline"
+TIMEOUT = "timeout"
+
+
+class Rejected(Exception):
+    """Запрос не принят: reason - причина, retry_after - через сколько секунд есть смысл повторить."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionClass:
+    """
+    Бюджет одного класса эндпоинтов: не больше concurrency запросов одновременно,
+    остальные ждут в очереди не длиннее queue_size. Очередь - своя у каждого пользователя,
+    освободившийся слот отдается пользователям по кругу, поэтому один клиент с пачкой
+    тяжелых запросов не отодвигает остальных. Запрос отклоняется сразу, если по оценке
+    (позиция в очереди * среднее время обработки) не успеет за deadline, и по истечении
+    deadline в очереди.
+
+    Работает в event loop (асинхронная зависимость FastAPI) - блокировки не нужны,
+    а ожидающий запрос не занимает поток из пула синхронных эндпоинтов.
+    """
+
+    def __init__(self, name, concurrency, queue_size, deadline, per_user):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.deadline = deadline
+        self.per_user = per_user
+        self.in_flight = 0
+        self.queued = 0
+        # пользователь -> очередь его ожидающих future; порядок ключей - очередь обхода
+        self._waiting = OrderedDict()
+        self.service_seconds = None
+        self.wait_seconds = None
+        self.admitted = 0
+        self.admitted_after_wait = 0
+        self.max_queued = 0
+        self.rejected = Counter()
+
+    @staticmethod
+    def _ewma(current, value):
+        return value if current is None else current + EWMA_ALPHA * (value - current)
+
+    def _estimate_wait(self, position):
+        """Оценка ожидания для запроса на позиции position (1 - следующий на слот)."""
+        return math.ceil(position / self.concurrency) * (self.service_seconds or 0)
+
+    def _reject(self, reason, wait):
+        self.rejected[reason] += 1
+        retry_after = max(1, math.ceil(wait + (self.service_seconds or 0)))
+        logger.warning(f"Admission [{self.name}]: rejected ({reason}), in flight {self.in_flight}, "
+                       f"queued {self.queued}, retry after {retry_after} s")
+        raise Rejected(reason, retry_after)
+
+    async def acquire(self, user):
+        """Ждет слот. Возвращает момент начала обработки (для release) или бросает Rejected."""
+        if self.in_flight < self.concurrency and not self.queued:
+            self.in_flight += 1
+            self.admitted += 1
+            return time.monotonic()
+
+        wait = self._estimate_wait(self.queued + 1)
+        if self.queued >= self.queue_size:
+            self._reject(QUEUE_FULL, wait)
+        user_queue = self._waiting.get(user)
+        if user_queue is not None and len(user_queue) >= self.per_user:
+            self._reject(USER_LIMIT, wait)
+        if wait + (self.service_seconds or 0) > self.deadline:
+            self._reject(DEADLINE, wait)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(user, deque()).append(future)
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        started = time.monotonic()
+        try:
+            await asyncio.wait({future}, timeout=max(0.0, self.deadline - (self.service_seconds or 0)))
+        except asyncio.CancelledError:
+            # Клиент ушел; если слот уже успели выдать - отдаем его следующему
+            if future.done() and not future.cancelled():
+                self._hand_over()
+            raise
+        finally:
+            if not future.done():
+                # Не дождался - убираем из очереди; слот не выдан
+                future.cancel()
+                self._remove(user, future)
+        if future.cancelled():
+            self._reject(TIMEOUT, self._estimate_wait(self.queued + 1))
+
+        self.wait_seconds = self._ewma(self.wait_seconds, time.monotonic() - started)
+        self.admitted += 1
+        self.admitted_after_wait += 1
+        return time.monotonic()
+
+    def _remove(self, user, future):
+        user_queue = self._waiting.get(user)
+        if user_queue is None:
+            return
+        try:
+            user_queue.remove(future)
+            self.queued -= 1
+        except ValueError:
+            pass
+        if not user_queue:
+            del self._waiting[user]
+
+    def release(self, started):
+        """Запрос обработан: слот переходит следующему ожидающему."""
+        self.service_seconds = self._ewma(self.service_seconds, time.monotonic() - started)
+        self._hand_over()
+
+    def _hand_over(self):
+        """Слот - первому ожидающему следующего по кругу пользователя, или освобождается."""
+        while self._waiting:
+            user, user_queue = next(iter(self._waiting.items()))
+            future = user_queue.popleft()
+            self.queued -= 1
+            if user_queue:
+                self._waiting.move_to_end(user)
+            else:
+                del self._waiting[user]
+            if not future.done():
+                # Слот передается без освобождения: in_flight не меняется
+                future.set_result(True)
+                return
+        self.in_flight -= 1
+
+    def metrics(self):
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "deadline_seconds": self.deadline,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "waiting_users": len(self._waiting),
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "admitted_after_wait": self.admitted_after_wait,
+            "rejected": dict(self.rejected),
+            "avg_wait_ms": round(self.wait_seconds * 1000, 1) if self.wait_seconds is not None else None,
+            "avg_service_ms": round(self.service_seconds * 1000, 1) if self.service_seconds is not None else None,
+        }
+
+
+class AdmissionController:
+    """Классы эндпоинтов со своими бюджетами: {имя: AdmissionClass}."""
+
+    def __init__(self, classes):
+        self.classes = {admission_class.name: admission_class for admission_class in classes}
+
+    def get(self, name):
+        return self.classes[name]
+
+    def metrics(self):
+        return {name: admission_class.metrics() for name, admission_class in self.classes.items()}
@@ -0,0 +1,252 @@
+import re
+import threading
+import time
+import urllib.parse
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from app.config import logger
+from app.utils.retry import RateLimiter, call_with_retry
+
+
+def first_page(data):
+    """
+    get_page_by_title в разных версиях atlassian-python-api возвращает
+    либо саму страницу, либо результат поиска {"results": [...]}.
+    """
+    if data and 'results' in data:
+        results = data['results']
+        return results[0] if results else None
+    return data
+
+
+def get_page_content(confluence, url):
+    """Получение страницы по разным типам ссылок Confluence."""
+    decoded_url = urllib.parse.unquote(url)
+
+    def get_homepage_by_space_key(key):
+        try:
+            space_info = confluence.get_space(key, expand='homepage')
+            if space_info and 'homepage' in space_info:
+                return confluence.get_page_by_id(space_info['homepage']['id'], expand='body.storage')
+        except Exception:
+            pass
+        return None
+
+    # Логика определения типа ссылки
+    match_id = re.search(r'pageId=(\d+)', url)
+    if match_id:
+        return confluence.get_page_by_id(match_id.group(1), expand='body.storage')
+
+    match_display_page = re.search(r'/display/([^/]+)/([^/?#]+)', decoded_url)
+    if match_display_page:
+        return first_page(confluence.get_page_by_title(
+            match_display_page.group(1), match_display_page.group(2).replace('+', ' '), expand='body.storage'
+        ))
+
+    match_overview = re.search(r'/spaces/([^/]+)/overview', decoded_url)
+    if match_overview:
+        return get_homepage_by_space_key(match_overview.group(1))
+
+    match_space_home = re.search(r'/display/([^/?#]+)/?$', decoded_url)
+    if match_space_home:
+        return get_homepage_by_space_key(match_space_home.group(1))
+
+    return None
+
+
+def clean_storage_html(raw_html):
+    """Очищаем HTML перед сохранением, чтобы не забивать поиск тегами."""
+    clean_text = re.sub(r'<[^>]+>', ' ', raw_html)
+    return re.sub(r'\s+', ' ', clean_text).strip()
+
+
+class ThrottledConfluence:
+    """
+    Обертка над клиентом atlassian: каждый вызов метода проходит через
+    лимитер хоста и повторяется на 429/5xx с backoff.
+    """
+
+    def __init__(self, client, limiter, retries=4, backoff=0.5):
+        self._client = client
+        self._limiter = limiter
+        self._retries = retries
+        self._backoff = backoff
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return call_with_retry(
+                attr, *args, retries=self._retries, backoff=self._backoff, limiter=self._limiter, **kwargs
+            )
+        return call
+
+
+def resolve_page_ref(confluence, url, space_homepage):
+    """
+    Легкое разрешение ссылки в (page_id, version) без загрузки тела страницы.
+    version = None, если его не вернул сам запрос разрешения.
+    space_homepage(key) - id домашней страницы пространства (кэшируется вызывающим).
+    """
+    decoded_url = urllib.parse.unquote(url)
+
+    match_id = re.search(r'pageId=(\d+)', url)
+    if match_id:
+        return match_id.group(1), None
+
+    match_display_page = re.search(r'/display/([^/]+)/([^/?#]+)', decoded_url)
+    if match_display_page:
+        page = first_page(confluence.get_page_by_title(
+            match_display_page.group(1), match_display_page.group(2).replace('+', ' '), expand='version'
+        ))
+        if not page:
+            return None, None
+        return str(page['id']), page.get('version', {}).get('number')
+
+    match_space = (re.search(r'/spaces/([^/]+)/overview', decoded_url)
+                   or re.search(r'/display/([^/?#]+)/?$', decoded_url))
+    if match_space:
+        return space_homepage(match_space.group(1)), None
+
+    return None, None
+
+
+class ConfluenceSyncer:
+    """
+    Параллельная загрузка страниц Confluence.
+    У каждого потока свой клиент (и свой requests.Session с keep-alive),
+    лимит запросов общий на хост. В БД потоки не пишут - результаты отдаются вызывающему.
+
+    Синхронизация инкрементальная: сначала ссылка разрешается в id страницы (или берется
+    из кэша wiki_url_cache, пока запись не старше WIKI_URL_CACHE_TTL_DAYS), затем запрашивается только номер версии, и тело скачивается,
+    лишь если версия отличается от сохраненной. Страницы и домашние страницы пространств,
+    на которые ссылаются несколько систем, запрашиваются один раз за прогон.
+    """
+
+    def __init__(self, client_factory, base_url, workers=8, rate_limit=10.0, burst=None, retries=4, backoff=0.5):
+        self.client_factory = client_factory
+        self.workers = max(1, workers)
+        self.retries = retries
+        self.backoff = backoff
+        self.limiter = RateLimiter(rate_limit, burst)
+        self.host = urllib.parse.urlparse(base_url).netloc
+        self._local = threading.local()
+        self._memo_lock = threading.Lock()
+        self._space_homepages = {}
+        self._page_versions = {}
+        self._page_bodies = {}
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = ThrottledConfluence(
+                self.client_factory(), self.limiter, retries=self.retries, backoff=self.backoff
+            )
+        return client
+
+    def _once(self, memo, key, fn):
+        """Один запрос на ключ за прогон, даже если его одновременно ждут несколько потоков."""
+        with self._memo_lock:
+            future = memo.get(key)
+            owner = future is None
+            if owner:
+                future = memo[key] = Future()
+        if owner:
+            try:
+                future.set_result(fn())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def _space_homepage(self, key):
+        def load():
+            space_info = self._client().get_space(key, expand='homepage')
+            if space_info and 'homepage' in space_info:
+                return str(space_info['homepage']['id'])
+            return None
+        return self._once(self._space_homepages, key, load)
+
+    def _page_version(self, page_id):
+        def load():
+            page = self._client().get_page_by_id(page_id, expand='version')
+            return page['version']['number']
+        return self._once(self._page_versions, page_id, load)
+
+    def _page_body(self, page_id):
+        def load():
+            page = self._client().get_page_by_id(page_id, expand='body.storage,version')
+            return page['version']['number'], clean_storage_html(page['body']['storage']['value'])
+        return self._once(self._page_bodies, page_id, load)
+
+    def sync_page(self, url, cached_page_id=None, stored_page_id=None, stored_version=None):
+        """
+        Возвращает {"page_id", "version", "text"} или None, если ссылка не разрешилась.
+        text = None означает, что сохраненная версия актуальна и тело не скачивалось.
+        """
+        def re_resolve():
+            # Страницу из кэша удалили или перенесли - разрешаем ссылку заново
+            if cached_page_id is None:
+                raise
+            return self.sync_page(url, None, stored_page_id, stored_version)
+
+        page_id, version = cached_page_id, None
+        if page_id is None:
+            page_id, version = resolve_page_ref(self._client(), url, self._space_homepage)
+            if page_id is None:
+                return None
+
+        # Для уже известной страницы сначала спрашиваем только номер версии
+        if page_id == stored_page_id and stored_version is not None:
+            if version is None:
+                try:
+                    version = self._page_version(page_id)
+                except Exception:
+                    return re_resolve()
+            if version == stored_version:
+                return {"page_id": page_id, "version": version, "text": None}
+
+        try:
+            version, text = self._page_body(page_id)
+        except Exception:
+            return re_resolve()
+        return {"page_id": page_id, "version": version, "text": text}
+
+    def run(self, items, on_result, progress=None):
+        """
+        items - кортежи (sys_id, url, cached_page_id, stored_page_id, stored_version).
+        on_result(sys_id, url, result, error) вызывается в вызывающем потоке по мере готовности.
+        progress(done, total) - после каждой страницы; исключение из него прерывает прогон.
+        """
+        items = list(items)
+        started = time.perf_counter()
+        failed = 0
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="confluence")
+        try:
+            futures = {pool.submit(self.sync_page, *item[1:]): item[:2] for item in items}
+            for done, future in enumerate(as_completed(futures), 1):
+                sys_id, url = futures[future]
+                try:
+                    result, error = future.result(), None
+                except Exception as e:
+                    result, error = None, e
+                    failed += 1
+                on_result(sys_id, url, result, error)
+
+                if done % 100 == 0 or done == len(items):
+                    elapsed = time.perf_counter() - started
+                    logger.info(
+                        f"Confluence ({self.host}): {done}/{len(items)} страниц, "
+                        f"{done / elapsed:.1f} стр/с, ошибок {failed}"
+                    )
+                if progress is not None:
+                    progress(done, len(items))
+        finally:
+            # При прерывании страницы из очереди уже не запрашиваем
+            pool.shutdown(wait=False, cancel_futures=True)
+        return {
+            "total": len(items),
+            "failed": failed,
+            "bodies": len(self._page_bodies),
+            "seconds": time.perf_counter() - started,
+        }
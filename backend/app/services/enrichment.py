@@ -0,0 +1,355 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import requests
+from requests.adapters import HTTPAdapter
+from app.config import logger
+from app.db.schema import content_hash
+from app.utils.retry import call_with_retry
+
+# Грубая оценка для бюджета: в токенайзерах современных моделей ~3 символа кириллицы на токен
+CHARS_PER_TOKEN = 3
+
+# Причины остановки, при которых ответ дописан до конца и его можно кэшировать:
+# модель закончила сама (done) или список уже пришел целиком (early_stop)
+COMPLETE_STOP_REASONS = ("done", "early_stop")
+
+PROMPT_TEMPLATE = """
+    Проанализируй текст документации к системе "{system_name}".
+    Твоя задача: составить список ключевых слов, синонимов и функций для поискового индекса.
+
+    1. Напиши синонимы названия системы (аббревиатуры, сленг).
+    2. Напиши основные функции (что система делает).
+    3. Напиши, кто пользователи (учителя, родители, бухгалтеры).
+
+    Ответ дай просто списком слов и фраз через запятую на русском языке. Без лишних слов.
+
+    Текст:
+    {text}
+    """
+
+
+def clean_html(raw_html):
+    if not raw_html: return ""
+    cleanr = re.compile('<.*?>')
+    text = re.sub(cleanr, '', raw_html)
+    return text
+
+
+class OllamaClient:
+    """
+    Клиент /api/generate. У каждого потока свой requests.Session (keep-alive к Ollama),
+    таймаут на соединение и ответ, повторы на 429/5xx и сетевых ошибках.
+
+    Ответ читается потоком NDJSON: генерация обрывается, когда список ключевых слов
+    уже пришел целиком (модель перешла к пояснениям), либо по бюджету токенов/времени.
+    По каждому вызову копятся метрики (TTFT, токены/с, причина остановки) - их
+    записывает в llm_call_metrics вызывающий поток через drain_metrics().
+    generate() возвращает (текст, причина остановки): обрезанный ответ (max_tokens, timeout,
+    поток закончился без done) годится для индекса, но не для кэша.
+    """
+
+    def __init__(self, url, model, timeout=300.0, connect_timeout=5.0, retries=2, backoff=1.0,
+                 max_output_tokens=512, call_budget=180.0, max_keywords=60):
+        self.url = url
+        self.model = model
+        self.timeout = (connect_timeout, timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_output_tokens = max_output_tokens
+        self.call_budget = call_budget
+        self.max_keywords = max_keywords
+        self._local = threading.local()
+        self._metrics = []
+        self._metrics_lock = threading.Lock()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        return session
+
+    def _list_complete(self, text):
+        """Список через запятую закончился: после него пустая строка, или набрано max_keywords слов."""
+        if text.count(",") + 1 >= self.max_keywords:
+            return True
+        head, sep, _ = text.lstrip().partition("\n\n")
+        return bool(sep) and "," in head
+
+    @staticmethod
+    def _trim(text, stop_reason):
+        """Отрезает пояснения после списка и недописанное последнее слово при обрыве по бюджету."""
+        if stop_reason == "early_stop":
+            text = text.lstrip().partition("\n\n")[0]
+        elif stop_reason in ("max_tokens", "timeout", "incomplete") and "," in text:
+            text = text[:text.rfind(",")]
+        return text
+
+    def _post(self, prompt):
+        started = time.perf_counter()
+        metric = {
+            "model": self.model,
+            "started_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "prompt_chars": len(prompt),
+            "prompt_tokens": None,
+            "output_tokens": 0,
+            "ttft_ms": None,
+            "total_ms": None,
+            "tokens_per_s": None,
+            "stop_reason": "error",
+        }
+        text = ""
+        try:
+            with self._session().post(
+                self.url,
+                json={"model": self.model, "prompt": prompt, "stream": True,
+                      "options": {"num_predict": self.max_output_tokens}},
+                timeout=self.timeout,
+                stream=True,
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(f"Ollama: {chunk['error']}")
+
+                    token = chunk.get("response", "")
+                    if token:
+                        if metric["ttft_ms"] is None:
+                            metric["ttft_ms"] = (time.perf_counter() - started) * 1000
+                        text += token
+                        metric["output_tokens"] += 1
+
+                    if chunk.get("done"):
+                        metric["prompt_tokens"] = chunk.get("prompt_eval_count")
+                        metric["output_tokens"] = chunk.get("eval_count", metric["output_tokens"])
+                        if chunk.get("eval_duration"):
+                            metric["tokens_per_s"] = metric["output_tokens"] / (chunk["eval_duration"] / 1e9)
+                        metric["stop_reason"] = "max_tokens" if chunk.get("done_reason") == "length" else "done"
+                        break
+                    # Выход из with закрывает соединение - Ollama прекращает генерацию
+                    if ("," in token or "\n" in token) and self._list_complete(text):
+                        metric["stop_reason"] = "early_stop"
+                        break
+                    if metric["output_tokens"] >= self.max_output_tokens:
+                        metric["stop_reason"] = "max_tokens"
+                        break
+                    if time.perf_counter() - started > self.call_budget:
+                        metric["stop_reason"] = "timeout"
+                        break
+                else:
+                    # Соединение закрылось без финального чанка с done
+                    metric["stop_reason"] = "incomplete"
+            return self._trim(text, metric["stop_reason"]), metric["stop_reason"]
+        finally:
+            elapsed = time.perf_counter() - started
+            metric["total_ms"] = elapsed * 1000
+            if metric["tokens_per_s"] is None and metric["ttft_ms"] is not None:
+                generation = elapsed - metric["ttft_ms"] / 1000
+                if generation > 0:
+                    metric["tokens_per_s"] = metric["output_tokens"] / generation
+            with self._metrics_lock:
+                self._metrics.append(metric)
+
+    def generate(self, prompt):
+        return call_with_retry(self._post, prompt, retries=self.retries, backoff=self.backoff)
+
+    def drain_metrics(self, cursor):
+        """Пишет накопленные метрики вызовов (без коммита). Возвращает их список."""
+        with self._metrics_lock:
+            metrics, self._metrics = self._metrics, []
+        cursor.executemany('''
+            INSERT INTO llm_call_metrics (model, started_at, prompt_chars, prompt_tokens, output_tokens,
+                                          ttft_ms, total_ms, tokens_per_s, stop_reason)
+            VALUES (:model, :started_at, :prompt_chars, :prompt_tokens, :output_tokens,
+                    :ttft_ms, :total_ms, :tokens_per_s, :stop_reason)
+        ''', metrics)
+        return metrics
+
+
+def chunk_text(text, max_tokens):
+    """
+    Режет текст на части не длиннее max_tokens (по оценке CHARS_PER_TOKEN),
+    стараясь резать по концу предложения или пробелу.
+    """
+    text = re.sub(r'\s+', ' ', text).strip()
+    limit = max(1, max_tokens * CHARS_PER_TOKEN)
+    chunks = []
+    while text:
+        if len(text) <= limit:
+            chunks.append(text)
+            break
+        cut = max(text.rfind('. ', 0, limit), text.rfind(' ', 0, limit))
+        if cut < limit // 2:
+            cut = limit
+        chunks.append(text[:cut + 1].strip())
+        text = text[cut + 1:].lstrip()
+    return chunks
+
+
+def merge_keywords(responses):
+    """Объединяет списки ключевых слов по частям страницы без повторов (порядок первого появления)."""
+    merged = {}
+    for response in responses:
+        for keyword in re.split(r'[,;\n]', response):
+            keyword = keyword.strip(' .-•*\t')
+            if keyword:
+                merged.setdefault(keyword.lower(), keyword)
+    return ", ".join(merged.values())
+
+
+class LLMCache:
+    """
+    Кэш ответов LLM в таблице llm_cache. Читать можно из любого потока (у каждого свое
+    соединение), новые ответы копятся в памяти и записываются вызывающим через drain().
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._new = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model, template, *inputs):
+        return content_hash(model, template, *inputs)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.db_path, timeout=30)
+        return conn
+
+    def get(self, key):
+        with self._lock:
+            entry = self._new.get(key)
+        if entry is None:
+            row = self._conn().execute("SELECT response FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            response = row[0] if row else None
+        else:
+            response = entry[1]
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return response
+
+    def put(self, key, model, response):
+        with self._lock:
+            self._new[key] = (model, response)
+
+    def drain(self, cursor):
+        """Пишет накопленные ответы (без коммита)."""
+        with self._lock:
+            new, self._new = self._new, {}
+        cursor.executemany(
+            "INSERT OR REPLACE INTO llm_cache (key, model, response) VALUES (?, ?, ?)",
+            [(key, model, response) for key, (model, response) in new.items()],
+        )
+
+
+class KeywordExtractor:
+    """
+    Ключевые слова по тексту страницы. Текст режется на части по бюджету токенов (map),
+    ответы по частям объединяются без повторов (reduce). Каждый вызов LLM кэшируется
+    по hash(модель, шаблон, название, часть), так что при правке страницы заново
+    генерируются только измененные части.
+    """
+
+    def __init__(self, client, cache=None, chunk_tokens=3000, max_chunks=8):
+        self.client = client
+        self.cache = cache
+        self.chunk_tokens = chunk_tokens
+        self.max_chunks = max_chunks
+
+    def _generate(self, system_name, chunk):
+        key = None
+        if self.cache is not None:
+            key = LLMCache.make_key(self.client.model, PROMPT_TEMPLATE, system_name, chunk)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        response, stop_reason = self.client.generate(PROMPT_TEMPLATE.format(system_name=system_name, text=chunk))
+        response = response.strip()
+        # Обрезанный ответ остался бы в кэше навсегда: следующий прогон не стал бы генерировать заново
+        if key is not None and response and stop_reason in COMPLETE_STOP_REASONS:
+            self.cache.put(key, self.client.model, response)
+        return response
+
+    def get_ai_keywords(self, text, system_name):
+        if not text: return ""
+        chunks = chunk_text(text, self.chunk_tokens)
+        if not chunks:
+            return ""
+        if len(chunks) == 1:
+            return self._generate(system_name, chunks[0])
+        if len(chunks) > self.max_chunks:
+            logger.warning(
+                f"Enrichment: '{system_name}' - {len(chunks)} частей по {self.chunk_tokens} токенов, "
+                f"используются первые {self.max_chunks}"
+            )
+            chunks = chunks[:self.max_chunks]
+        return merge_keywords(self._generate(system_name, chunk) for chunk in chunks)
+
+
+class EnrichmentRunner:
+    """
+    Параллельное обогащение: не больше workers запросов к LLM одновременно.
+    items читаются лениво (тексты загружаются по мере освобождения слотов),
+    результаты отдаются в вызывающий поток - в БД потоки не пишут.
+    """
+
+    def __init__(self, extractor, workers=2):
+        self.extractor = extractor
+        self.workers = max(1, workers)
+
+    def run(self, items, on_result):
+        """
+        items - кортежи (sys_id, name, text, ...), лишние поля возвращаются в on_result как есть.
+        on_result(item, keywords, error) вызывается в вызывающем потоке по мере готовности.
+        """
+        started = time.perf_counter()
+        done = failed = 0
+        items = iter(items)
+        in_flight = {}
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="enrich")
+        try:
+            while True:
+                # Держим в очереди не больше двух задач на поток
+                while len(in_flight) < self.workers * 2:
+                    item = next(items, None)
+                    if item is None:
+                        break
+                    in_flight[pool.submit(self.extractor.get_ai_keywords, item[2], item[1])] = item
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    item = in_flight.pop(future)
+                    try:
+                        keywords, error = future.result(), None
+                    except Exception as e:
+                        keywords, error = None, e
+                        failed += 1
+                    done += 1
+                    on_result(item, keywords, error)
+
+                    if done % 10 == 0:
+                        elapsed = time.perf_counter() - started
+                        logger.info(f"Enrichment: {done} систем, {done / elapsed:.2f} сист/с, ошибок {failed}")
+        finally:
+            # При прерывании не ждем очередь: незапущенные задачи отменяются
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        return {"total": done, "failed": failed, "seconds": time.perf_counter() - started}
@@ -0,0 +1,146 @@
+"""
+Фасеты поиска на битовых картах: для каждого значения фасета - int, где бит i означает
+систему с id = i. Фильтры (OR внутри фасета, AND между фасетами) сводятся к побитовым
+операциям над готовыми картами до нечеткого сравнения, а счетчики по найденным -
+к popcount пересечения с картой найденных.
+"""
+from app.utils.text import normalize_key
+
+# Сколько значений owner возвращать в счетчиках (статусов немного - отдаются все)
+OWNER_FACET_TOP = 10
+# wiki/jira/repo - у системы заполнена ссылка (wiki_url, jira_url, repo_url);
+# wiki_content - текст вики-страницы уже скачан синхронизацией с Confluence
+LINKS = ("wiki", "jira", "repo", "wiki_content")
+
+
+def ids_to_bitmap(ids):
+    ids = list(ids)
+    if not ids:
+        return 0
+    bits = bytearray((max(ids) >> 3) + 1)
+    for sys_id in ids:
+        bits[sys_id >> 3] |= 1 << (sys_id & 7)
+    return int.from_bytes(bits, "little")
+
+
+def bitmap_to_ids(bitmap):
+    """id систем из битовой карты по возрастанию."""
+    bits = bin(bitmap)[:1:-1]
+    ids = []
+    position = bits.find("1")
+    while position >= 0:
+        ids.append(position)
+        position = bits.find("1", position + 1)
+    return ids
+
+
+def _links(doc):
+    return {
+        "wiki": bool(doc.get('wiki_url')),
+        "jira": bool(doc.get('jira_url')),
+        "repo": bool(doc.get('repo_url')),
+        "wiki_content": bool(doc.get('has_wiki_content', doc.wiki)),
+    }
+
+
+class SearchFilters:
+    """Фильтры запроса: status и owner - списки значений (любое из), has_* - True/False/None."""
+
+    def __init__(self, status=None, owner=None, has_wiki=None, has_jira=None, has_repo=None, has_wiki_content=None):
+        self.status = [normalize_key(value) for value in status or () if value]
+        self.owner = [normalize_key(value) for value in owner or () if value]
+        values = (has_wiki, has_jira, has_repo, has_wiki_content)
+        self.links = {name: value for name, value in zip(LINKS, values) if value is not None}
+
+    def __bool__(self):
+        return bool(self.status or self.owner or self.links)
+
+    def key(self):
+        """Для ETag."""
+        return (tuple(sorted(self.status)), tuple(sorted(self.owner)), tuple(sorted(self.links.items())))
+
+
+class FacetIndex:
+    """
+    Битовые карты: all (все системы), status и owner (нормализованное значение -> карта),
+    links (LINKS -> карта систем со ссылкой или скачанным текстом вики). labels - как значение выглядит в данных.
+    Не меняется после построения: updated() возвращает копию с новыми картами.
+    """
+
+    def __init__(self, all_ids=0, status=None, owner=None, links=None, labels=None):
+        self.all = all_ids
+        self.status = status or {}
+        self.owner = owner or {}
+        self.links = links or {name: 0 for name in LINKS}
+        self.labels = labels or {}
+
+    def updated(self, removed, added):
+        """
+        removed/added - пары (id, документ): биты удаленных сбрасываются, добавленных - ставятся.
+        id группируются по значению, и каждая карта меняется одной операцией с готовой маской.
+        """
+        labels = dict(self.labels)
+        cleared, set_ids = {}, {}
+        for pairs, target in ((removed, cleared), (added, set_ids)):
+            for sys_id, doc in pairs:
+                target.setdefault(('all', None), []).append(sys_id)
+                for field in ('status', 'owner_name'):
+                    key = normalize_key(doc.get(field))
+                    if key:
+                        target.setdefault((field, key), []).append(sys_id)
+                        if target is set_ids:
+                            labels.setdefault((field, key), str(doc.get(field)).strip())
+                for name, present in _links(doc).items():
+                    if present:
+                        target.setdefault(('links', name), []).append(sys_id)
+
+        maps = {'status': dict(self.status), 'owner_name': dict(self.owner), 'links': dict(self.links)}
+        all_ids = self.all
+        for (field, key), ids in cleared.items():
+            mask = ~ids_to_bitmap(ids)
+            if field == 'all':
+                all_ids &= mask
+            elif key in maps[field]:
+                maps[field][key] &= mask
+        for (field, key), ids in set_ids.items():
+            mask = ids_to_bitmap(ids)
+            if field == 'all':
+                all_ids |= mask
+            else:
+                maps[field][key] = maps[field].get(key, 0) | mask
+        for field in ('status', 'owner_name'):
+            maps[field] = {key: bitmap for key, bitmap in maps[field].items() if bitmap}
+        return FacetIndex(all_ids, maps['status'], maps['owner_name'], maps['links'], labels)
+
+    def allowed(self, filters):
+        """Карта систем, прошедших фильтры (None - фильтров нет)."""
+        if not filters:
+            return None
+        result = self.all
+        for values, wanted in ((self.status, filters.status), (self.owner, filters.owner)):
+            if wanted:
+                any_of = 0
+                for key in wanted:
+                    any_of |= values.get(key, 0)
+                result &= any_of
+        for name, present in filters.links.items():
+            result &= self.links[name] if present else ~self.links[name]
+        return result
+
+    def counts(self, hits_bitmap):
+        """Счетчики фасетов среди найденных."""
+        def values_counts(values, field, top=None):
+            counts = [
+                {"value": self.labels.get((field, key), key), "count": (hits_bitmap & bitmap).bit_count()}
+                for key, bitmap in values.items()
+            ]
+            counts = [entry for entry in counts if entry["count"]]
+            counts.sort(key=lambda entry: (-entry["count"], entry["value"]))
+            return counts[:top] if top else counts
+
+        return {
+            "total": hits_bitmap.bit_count(),
+            "status": values_counts(self.status, 'status'),
+            "owner": values_counts(self.owner, 'owner_name', OWNER_FACET_TOP),
+            "links": {name: (hits_bitmap & bitmap).bit_count() for name, bitmap in self.links.items()},
+        }
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+from app.config import (
+    CONFLUENCE_TOKEN, CONFLUENCE_URL, CONFLUENCE_USER, DB_PATH, ENRICH_CALL_BUDGET, ENRICH_MAX_KEYWORDS,
+    ENRICH_MAX_OUTPUT_TOKENS, ENRICH_RETRIES, ENRICH_TIMEOUT, IMPORT_DIR, JOBS_CONFLUENCE_SYNC_INTERVAL,
+    JOBS_ENRICH_INTERVAL, OLLAMA_MODEL, OLLAMA_URL,
+)
+
+# Задачи выполняются одним рабочим потоком, поэтому соединение базы знаний
+# создается в нем один раз и больше нигде не используется
+_kb = None
+
+
+def _knowledge_base():
+    global _kb
+    if _kb is None:
+        from knowledge_base import SystemKnowledgeBase
+        _kb = SystemKnowledgeBase(DB_PATH)
+    return _kb
+
+
+def confluence_sync(job):
+    if not CONFLUENCE_URL:
+        raise ValueError("CONFLUENCE_URL is not configured")
+    changed = _knowledge_base().sync_confluence_content(
+        CONFLUENCE_URL, CONFLUENCE_USER, CONFLUENCE_TOKEN, progress=job.report
+    )
+    return {"changed": len(changed or [])}
+
+
+def import_path(name, import_dir=IMPORT_DIR):
+    """
+    Путь к файлу выгрузки внутри import_dir. Задачу запускает любой вошедший пользователь,
+    поэтому произвольные пути сервера (../, абсолютные, симлинки наружу) не принимаются.
+    """
+    root = os.path.realpath(import_dir)
+    path = os.path.realpath(os.path.join(root, str(name or "")))
+    if os.path.commonpath([root, path]) != root or path == root:
+        raise ValueError(f"File must be inside the import directory: {name}")
+    if not os.path.isfile(path):
+        raise ValueError(f"File not found in the import directory: {name}")
+    return path
+
+
+def csv_import(job, systems_csv, contacts_csv):
+    """systems_csv, contacts_csv - имена файлов в IMPORT_DIR."""
+    stats = _knowledge_base().load_data_from_csv(
+        import_path(systems_csv), import_path(contacts_csv), progress=lambda rows: job.report(rows, message=f"{rows} строк")
+    )
+    stats["changed"] = len(stats.pop("changed_ids"))
+    return stats
+
+
+def enrichment(job, limit=None):
+    from enrich_with_ai import enrich
+    from app.services.enrichment import OllamaClient
+
+    client = OllamaClient(
+        OLLAMA_URL, OLLAMA_MODEL, timeout=ENRICH_TIMEOUT, retries=ENRICH_RETRIES,
+        max_output_tokens=ENRICH_MAX_OUTPUT_TOKENS, call_budget=ENRICH_CALL_BUDGET, max_keywords=ENRICH_MAX_KEYWORDS,
+    )
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        stats = enrich(conn, client, limit=limit, progress=job.report)
+    finally:
+        conn.close()
+    stats["stop_reasons"] = dict(stats["stop_reasons"])
+    return stats
+
+
+def search_refresh(job):
+    """Ничего не пишет: индекс обновляется в on_finish, как и после любой задачи."""
+    return None
+
+
+def register_handlers(manager):
+    manager.register("confluence_sync", confluence_sync)
+    manager.register("csv_import", csv_import)
+    manager.register("enrichment", enrichment)
+    manager.register("search_refresh", search_refresh)
+    manager.schedule("confluence_sync", JOBS_CONFLUENCE_SYNC_INTERVAL)
+    manager.schedule("enrichment", JOBS_ENRICH_INTERVAL)
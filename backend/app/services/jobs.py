@@ -0,0 +1,218 @@
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from app.config import logger
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = {SUCCEEDED, FAILED, CANCELLED}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """Фоновая задача: статус, прогресс (done из total) и флаг отмены."""
+
+    def __init__(self, job_id, kind, params, source):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.source = source
+        self.status = QUEUED
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.done = 0
+        self.total = None
+        self.message = None
+        self.error = None
+        self.result = None
+        self._cancel = threading.Event()
+        self._started = None
+
+    def report(self, done, total=None, message=None):
+        """
+        Прогресс из кода задачи. Заодно точка отмены: если задачу отменили,
+        бросает JobCancelled, и задача прерывается там, где ей безопасно.
+        """
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    @property
+    def eta_seconds(self):
+        if self.status != RUNNING or not self.total or not self.done:
+            return None
+        elapsed = time.monotonic() - self._started
+        return elapsed / self.done * max(0, self.total - self.done)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "source": self.source,
+            "params": self.params,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "done": self.done,
+            "total": self.total,
+            "progress": self.done / self.total if self.total else None,
+            "eta_seconds": self.eta_seconds,
+            "message": self.message,
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+class JobManager:
+    """
+    Очередь фоновых задач внутри API с одним рабочим потоком: все тяжелые записи
+    в systems_kb.db (синхронизация, импорт, обогащение) идут строго по одной и не
+    конкурируют друг с другом. После каждой задачи вызывается on_finish - им
+    API обновляет индекс поиска, чтобы он не отставал от данных.
+    """
+
+    def __init__(self, on_finish=None, history=100):
+        self.on_finish = on_finish
+        self.history = history
+        self._handlers = {}
+        self._schedules = []
+        self._jobs = OrderedDict()
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def register(self, kind, handler):
+        """handler(job, **params) -> результат (попадает в job.result)."""
+        self._handlers[kind] = handler
+
+    @property
+    def kinds(self):
+        return sorted(self._handlers)
+
+    def schedule(self, kind, interval, params=None):
+        """Периодический запуск раз в interval секунд (interval <= 0 - выключено)."""
+        if interval and interval > 0:
+            self._schedules.append({"kind": kind, "interval": interval, "params": params or {},
+                                    "next_run": time.monotonic() + interval})
+
+    def submit(self, kind, params=None, source="manual"):
+        """
+        Ставит задачу в очередь. Если такая же задача уже ждет в очереди,
+        возвращается она - повторный запрос не плодит дубликаты.
+        """
+        if kind not in self._handlers:
+            raise KeyError(kind)
+        params = params or {}
+        with self._lock:
+            for job in self._jobs.values():
+                if job.kind == kind and job.params == params and job.status == QUEUED:
+                    return job
+            job = Job(next(self._ids), kind, params, source)
+            self._jobs[job.id] = job
+            self._trim_history()
+        self._queue.put(job)
+        logger.info(f"Job {job.id} ({kind}) queued by {source}")
+        return job
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id):
+        """Задача в очереди отменяется сразу, выполняющаяся - на ближайшем job.report()."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        job._cancel.set()
+        if job.status == QUEUED:
+            job.status = CANCELLED
+            job.finished_at = datetime.now()
+        return job
+
+    def start(self):
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(target=self._work, name="jobs-worker", daemon=True),
+            threading.Thread(target=self._tick, name="jobs-scheduler", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopped.set()
+        for job in self._jobs.values():
+            if job.status == RUNNING:
+                job._cancel.set()
+        self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _tick(self):
+        while not self._stopped.wait(1.0):
+            now = time.monotonic()
+            for entry in self._schedules:
+                if now >= entry["next_run"]:
+                    entry["next_run"] = now + entry["interval"]
+                    self.submit(entry["kind"], entry["params"], source="schedule")
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None or self._stopped.is_set():
+                return
+            if job.status != QUEUED:
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        job.status = RUNNING
+        job.started_at = datetime.now()
+        job._started = time.monotonic()
+        logger.info(f"Job {job.id} ({job.kind}) started")
+        try:
+            job.result = self._handlers[job.kind](job, **job.params)
+            job.status = SUCCEEDED
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.kind}) failed")
+            job.status = FAILED
+            job.error = str(e)
+        job.finished_at = datetime.now()
+        logger.info(f"Job {job.id} ({job.kind}) {job.status} in {time.monotonic() - job._started:.1f} s")
+
+        # Даже отмененная задача могла успеть что-то записать - индекс обновляем всегда
+        if self.on_finish is not None:
+            try:
+                self.on_finish(job)
+            except Exception:
+                logger.exception(f"Job {job.id}: on_finish failed")
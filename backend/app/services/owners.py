@@ -0,0 +1,156 @@
+"""
+Поиск владельцев систем ("кто владеет X", "что у Y"): владельцы собираются из owner_name,
+owner_email и owner_telegram строк systems при построении индекса поиска.
+Email и Telegram - точное совпадение по хэш-таблицам, имена - по началу любого слова
+(без регистра, ё = е) через бинарный поиск по отсортированному списку слов.
+"""
+import re
+from bisect import bisect_left
+from app.utils.text import normalize_key
+
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+TELEGRAM_RE = re.compile(r'^(?:https?://)?(?:t\.me/|@)', re.IGNORECASE)
+
+
+def normalize_email(value):
+    return str(value).strip().lower() if value else ""
+
+
+def normalize_telegram(value):
+    """"@User", "user", "https://t.me/user" -> "user"."""
+    if not value:
+        return ""
+    return TELEGRAM_RE.sub("", str(value).strip()).strip("/").lower()
+
+
+def owner_key(doc):
+    """Один владелец - один email (иначе Telegram, иначе имя): у тезок разные ключи."""
+    email = normalize_email(doc.get('owner_email'))
+    if email:
+        return f"email:{email}"
+    telegram = normalize_telegram(doc.get('owner_telegram'))
+    if telegram:
+        return f"telegram:{telegram}"
+    name = normalize_key(doc.get('owner_name'))
+    return f"name:{name}" if name else None
+
+
+class OwnerIndex:
+    """
+    owners: ключ владельца -> {name, email, telegram, systems: {id: (название, код, статус)}};
+    by_email, by_telegram: нормализованное значение -> ключ владельца;
+    name_tokens: отсортированные пары (слово имени, ключ владельца) для поиска по префиксу.
+    Не меняется после построения: updated() возвращает копию.
+    """
+
+    def __init__(self, owners=None, by_email=None, by_telegram=None, name_tokens=None):
+        self.owners = owners or {}
+        self.by_email = by_email or {}
+        self.by_telegram = by_telegram or {}
+        self.name_tokens = name_tokens or []
+
+    def updated(self, removed, added):
+        """removed/added - пары (id, документ), как у остальных частей SearchIndex."""
+        owners = dict(self.owners)
+        touched = set()
+        lookup_changed = False
+
+        def editable(key):
+            if key not in touched:
+                owner = owners.get(key)
+                owners[key] = dict(owner, systems=dict(owner['systems'])) if owner else None
+                touched.add(key)
+            return owners[key]
+
+        for sys_id, doc in removed:
+            key = owner_key(doc)
+            if key and key in owners:
+                editable(key)['systems'].pop(sys_id, None)
+        for sys_id, doc in added:
+            key = owner_key(doc)
+            if not key:
+                continue
+            owner = editable(key)
+            contacts = {
+                "name": doc.get('owner_name'),
+                "email": doc.get('owner_email'),
+                "telegram": doc.get('owner_telegram'),
+            }
+            if owner is None:
+                owner = owners[key] = dict(contacts, systems={})
+                lookup_changed = True
+            elif any(owner[field] != value for field, value in contacts.items()):
+                # Контакты берутся из последней измененной строки владельца
+                owner.update(contacts)
+                lookup_changed = True
+            owner['systems'][sys_id] = (doc.get('product_name'), doc.get('product_code'), doc.get('status'))
+
+        for key in touched:
+            if owners[key] is None or not owners[key]['systems']:
+                owners.pop(key, None)
+                lookup_changed = True
+
+        if not lookup_changed:
+            # Владельцы и их контакты прежние - поисковые структуры тоже
+            return OwnerIndex(owners, self.by_email, self.by_telegram, self.name_tokens)
+
+        by_email, by_telegram, name_tokens = {}, {}, []
+        for key, owner in owners.items():
+            email = normalize_email(owner['email'])
+            if email:
+                by_email[email] = key
+            telegram = normalize_telegram(owner['telegram'])
+            if telegram:
+                by_telegram[telegram] = key
+            for token in set(normalize_key(owner['name']).split()):
+                name_tokens.append((token, key))
+        name_tokens.sort()
+        return OwnerIndex(owners, by_email, by_telegram, name_tokens)
+
+    def _by_prefix(self, prefix):
+        keys = set()
+        position = bisect_left(self.name_tokens, (prefix,))
+        while position < len(self.name_tokens) and self.name_tokens[position][0].startswith(prefix):
+            keys.add(self.name_tokens[position][1])
+            position += 1
+        return keys
+
+    def find(self, query, limit=10):
+        """
+        Email или Telegram (@handle, t.me/handle) - точное совпадение; иначе каждое слово
+        запроса должно быть началом какого-то слова имени ("иван пет" -> "Иванов Пётр").
+        """
+        query = (query or "").strip()
+        if not query:
+            return []
+        if EMAIL_RE.match(query):
+            key = self.by_email.get(normalize_email(query))
+            keys = [key] if key else []
+        elif TELEGRAM_RE.match(query):
+            key = self.by_telegram.get(normalize_telegram(query))
+            keys = [key] if key else []
+        else:
+            keys = None
+            for token in normalize_key(query).split():
+                matched = self._by_prefix(token)
+                keys = matched if keys is None else keys & matched
+                if not keys:
+                    break
+            # Handle без "@" тоже ищем среди Telegram
+            telegram_key = self.by_telegram.get(normalize_telegram(query))
+            keys = sorted(keys or (), key=lambda k: (normalize_key(self.owners[k]['name']), k))
+            if telegram_key and telegram_key not in keys:
+                keys.insert(0, telegram_key)
+        return [self._to_dict(key) for key in keys[:limit]]
+
+    def _to_dict(self, key):
+        owner = self.owners[key]
+        return {
+            "name": owner['name'],
+            "email": owner['email'],
+            "telegram": owner['telegram'],
+            "systems": [
+                {"id": sys_id, "product_name": name, "product_code": code, "status": status}
+                for sys_id, (name, code, status) in sorted(owner['systems'].items())
+            ],
+        }
@@ -1,61 +1,250 @@
-from rapidfuzz import fuzz
-from app.utils.text import preprocess_text
-from app.config import logger
+import itertools
+import multiprocessing
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from app.config import SEARCH_BUILD_WORKERS, logger
+from app.db.documents import WIKI
+from app.services import search_engine
+from app.services.search_engine import SearchIndex, prepare_documents
+from app.utils.http import file_version
+from app.utils.text import get_morph
+
+# Размер пачки систем при полном построении: тексты распаковываются пачкой и сразу отбрасываются
+BUILD_CHUNK_SIZE = 500
+# Меньше этого числа систем пул процессов дороже самой лемматизации (инкрементальные сборки - всегда в процессе)
+PARALLEL_BUILD_MIN_DOCS = 2000
+# Пачек в работе на воркер: чтение из БД идет, пока воркеры лемматизируют, но память не растет
+BUILD_CHUNKS_IN_FLIGHT = 2
+# Пул создается из потока сборщика, когда в процессе уже работают другие потоки (uvicorn, задачи):
+# fork скопировал бы занятые ими блокировки, поэтому воркеры запускаются через forkserver/spawn
+BUILD_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+SNIPPET_WIDTH = 240
+
+class IndexGeneration:
+    """
+    Поколение индекса: SearchIndex на момент сборки.
+    После публикации не меняется - запросы читают его без блокировок.
+    """
+
+    def __init__(self, generation_id, index, last_change_id, mode, build_seconds, version):
+        self.id = generation_id
+        self.index = index
+        # Последняя учтенная запись system_changes
+        self.last_change_id = last_change_id
+        self.mode = mode
+        self.build_seconds = build_seconds
+        self.built_at = datetime.now()
+        # Для ETag: id поколения уникален только в пределах процесса
+        self.version = version
+
+    def to_dict(self):
+        return {
+            "generation": self.id,
+            "mode": self.mode,
+            "built_at": self.built_at,
+            "build_seconds": round(self.build_seconds, 3),
+            "documents": len(self.index.docs),
+            "keyword_lemmas": len(self.index.postings),
+            "terms": len(self.index.terms),
+            "owners": len(self.index.owners.owners),
+            "trigrams": len(self.index.trigrams),
+            "last_change_id": self.last_change_id,
+        }
+
 
 class SearchService:
+    """
+    Поиск по поколениям индекса (двойная буферизация): новое поколение собирается рядом
+    с текущим и публикуется одним присваиванием self._generation. Запрос берет ссылку
+    на поколение один раз в начале и дорабатывает на нем, даже если за это время
+    опубликовано следующее - старое освобождается, когда на него никто не ссылается.
+    """
+
     def __init__(self, repository):
         self.repo = repository
+        self._generation = None
+        self._generation_ids = itertools.count(1)
+        self._epoch = f"{time.time():.6f}"
+        # Сборки идут строго по одной
+        self._build_lock = threading.Lock()
+        # Фоновый сборщик и запрос на повторную сборку, пришедший во время текущей
+        self._state_lock = threading.Lock()
+        self._builder = None
+        self._pending = None
+
+    def _prepare_rows(self, rows, pool=None, workers=1):
+        """
+        Документы индекса {id: документ}. С pool пачки лемматизируются в процессах пула
+        (у каждого свой MorphAnalyzer и кэш разборов), а результаты собираются в исходном порядке.
+        """
+        docs = {}
+        in_flight = deque()
+        for i in range(0, len(rows), BUILD_CHUNK_SIZE):
+            chunk = rows[i:i + BUILD_CHUNK_SIZE]
+            ids = [row['id'] for row in chunk]
+            wikis = self.repo.get_documents(ids, WIKI)
+            keywords = self.repo.get_keywords(ids)
+            items = [(row, wikis.get(row['id']), keywords.get(row['id'], ())) for row in chunk]
+            if pool is None:
+                docs.update(prepare_documents(items))
+                continue
+            in_flight.append(pool.submit(prepare_documents, items))
+            if len(in_flight) >= workers * BUILD_CHUNKS_IN_FLIGHT:
+                docs.update(in_flight.popleft().result())
+        while in_flight:
+            docs.update(in_flight.popleft().result())
+        return docs
+
+    def _prepare_all(self):
+        """Все системы для полной сборки: при SEARCH_BUILD_WORKERS > 1 - в пуле процессов."""
+        rows = self.repo.get_all_systems()
+        workers = min(SEARCH_BUILD_WORKERS, -(-len(rows) // BUILD_CHUNK_SIZE))
+        if workers <= 1 or len(rows) < PARALLEL_BUILD_MIN_DOCS:
+            return self._prepare_rows(rows)
+        logger.info(f"Preparing {len(rows)} documents in {workers} processes")
+        context = multiprocessing.get_context(BUILD_START_METHOD)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=get_morph) as pool:
+            return self._prepare_rows(rows, pool, workers)
+
+    def _build(self, full):
+        """Собирает и публикует новое поколение. Вызывается под _build_lock."""
+        current = self._generation
+        last_change_id = self.repo.get_last_change_id()
+        if not full and current is not None and last_change_id == current.last_change_id:
+            return current
+
+        started = time.perf_counter()
+        if full or current is None:
+            mode = "full"
+            index = SearchIndex.build(self._prepare_all())
+        else:
+            # Журнал system_changes: заново обрабатываются только затронутые системы
+            mode = "incremental"
+            changed_ids = self.repo.get_changed_system_ids(current.last_change_id, last_change_id)
+            index = current.index.updated(changed_ids, self._prepare_rows(self.repo.get_systems_by_ids(changed_ids)))
+
+        generation_id = next(self._generation_ids)
+        generation = IndexGeneration(
+            generation_id, index, last_change_id, mode,
+            time.perf_counter() - started, f"{self._epoch}.{generation_id}",
+        )
+        self._generation = generation
+        logger.info(
+            f"Search index generation {generation.id} ({mode}) published: {len(index.docs)} documents, "
+            f"{len(index.postings)} keyword lemmas, {generation.build_seconds:.2f} s"
+        )
+        return generation
+
+    def refresh(self, full=False):
+        """
+        Синхронно собирает новое поколение, если данные изменились (или full=True),
+        и возвращает актуальное. Запросы тем временем обслуживает предыдущее.
+        """
+        with self._build_lock:
+            return self._build(full)
+
+    def refresh_async(self, full=False):
+        """
+        Сборка в фоновом потоке. Если сборка уже идет, запрос запоминается и выполняется
+        после нее (несколько запросов схлопываются в одну сборку). True - поток запущен.
+        """
+        with self._state_lock:
+            self._pending = bool(self._pending) or full
+            if self._builder is not None:
+                return False
+            self._builder = threading.Thread(target=self._build_loop, name="search-index-builder", daemon=True)
+            self._builder.start()
+            return True
+
+    def _build_loop(self):
+        while True:
+            with self._state_lock:
+                if self._pending is None:
+                    self._builder = None
+                    return
+                full, self._pending = self._pending, None
+            try:
+                self.refresh(full)
+            except Exception:
+                logger.exception("Search index build failed")
+
+    def current(self):
+        """
+        Поколение для запроса. Если в журнале изменений появились новые записи,
+        запускается фоновая сборка, а запрос без ожидания обслуживает текущее поколение.
+        Только самое первое поколение строится синхронно.
+        """
+        generation = self._generation
+        if generation is None:
+            return self.refresh()
+        if self.repo.get_last_change_id() != generation.last_change_id:
+            self.refresh_async()
+        return generation
+
+    def status(self):
+        """Текущее поколение и состояние фоновой сборки (для /admin/index)."""
+        generation = self._generation
+        with self._state_lock:
+            building = self._builder is not None
+        return {
+            **(generation.to_dict() if generation else {"generation": None}),
+            "building": building,
+            "pending_changes": generation is not None and self.repo.get_last_change_id() != generation.last_change_id,
+        }
+
+    def data_version(self, with_topics=False, generation=None):
+        """Версия данных, от которой зависит выдача (используется для ETag): поколение индекса."""
+        version = (generation or self.current()).version
+        if with_topics:
+            version += "|" + file_version(self.repo.jira_db_path)
+        return version
+
+    def fuzzy_search(self, query, limit=5, generation=None, mode=None, profile=None, filters=None, facets=None):
+        """Поиск по поколению индекса стратегией mode (None - SEARCH_MODE), см. search_engine."""
+        generation = generation or self.current()
+        return search_engine.search(generation.index, query, limit=limit, mode=mode, profile=profile,
+                                    filters=filters, facets=facets)
+
+    def find_owners(self, query, limit=10, generation=None):
+        """Владельцы по email, Telegram или началу имени со списком их систем, см. owners."""
+        generation = generation or self.current()
+        return generation.index.owners.find(query, limit=limit)
+
+    def attach_topics_summary(self, results):
+        """Добавляет к каждому результату счетчики producer/consumer из jira_data.db."""
+        codes = [res.get('product_code') for res in results]
+        counts = self.repo.get_topic_counts(codes)
+        empty = {"producers": 0, "consumers": 0, "total": 0}
+        for res in results:
+            res['topics_summary'] = counts.get(res.get('product_code')) or dict(empty)
+        return results
+
+    @staticmethod
+    def _make_snippet(text, query, width=SNIPPET_WIDTH):
+        """Фрагмент текста вокруг первого вхождения слова запроса (по началу слова - грубо учитываем падежи)."""
+        lowered = text.lower()
+        position = -1
+        for word in re.findall(r'\w+', query.lower()):
+            stem = word[:max(4, len(word) - 2)]
+            position = lowered.find(stem)
+            if position >= 0:
+                break
+        start = max(0, position - width // 3) if position >= 0 else 0
+        snippet = text[start:start + width].strip()
+        if start > 0:
+            snippet = "…" + snippet
+        if start + width < len(text):
+            snippet += "…"
+        return snippet
 
-    def fuzzy_search(self, query, limit=5):
-        df = self.repo.get_all_systems_df()
-        
-        query_raw = preprocess_text(query, expand_synonyms=False)
-        query_synonyms = preprocess_text(query, expand_synonyms=True)
-        
-        logger.info(f"Searching: Raw='{query_raw}' | Synonyms='{query_synonyms}'")
-        
-        results = []
-        for _, row in df.iterrows():
-            clean_title = preprocess_text(row['product_name'], expand_synonyms=False)
-            clean_desc = preprocess_text(row['description'], expand_synonyms=False)
-            clean_wiki = preprocess_text(row['wiki_content'], expand_synonyms=False)
-            
-            clean_ai = ""
-            if row['ai_keywords']:
-                clean_ai = preprocess_text(row['ai_keywords'], expand_synonyms=True)
-
-            score_raw = max(
-                fuzz.token_set_ratio(query_raw, clean_title),
-                fuzz.token_set_ratio(query_raw, clean_desc)
-            )
-            
-            score_syn = 0
-            if query_raw != query_synonyms:
-                score_syn = max(
-                    fuzz.token_set_ratio(query_synonyms, clean_title),
-                    fuzz.token_set_ratio(query_synonyms, clean_desc)
-                )
-            
-            base_score = max(score_raw, score_syn)
-            
-            wiki_score = 0
-            if clean_wiki:
-                wiki_score = fuzz.token_set_ratio(query_synonyms, clean_wiki)
-            
-            score_ai = 0
-            if clean_ai:
-                score_ai = fuzz.token_set_ratio(query_synonyms, clean_ai)
-            
-            final_score = (base_score * 0.5) + (score_ai * 0.3) + (wiki_score * 0.2)
-            
-            status = str(row['status']).lower()
-            if 'эксплуатации' in status or 'prod' in status:
-                final_score += 5 
-            
-            if final_score > 45:
-                res = row.to_dict()
-                res['search_score'] = final_score
-                results.append(res)
-        
-        results.sort(key=lambda x: x['search_score'], reverse=True)
-        return results[:limit]
\ No newline at end of file
+    def attach_wiki_snippets(self, results, query):
+        """Подгружает вики только для найденных систем и добавляет к ним короткий фрагмент."""
+        wikis = self.repo.get_documents([res['id'] for res in results], WIKI)
+        for res in results:
+            wiki = wikis.get(res['id'])
+            res['wiki_snippet'] = self._make_snippet(wiki, query) if wiki else None
+        return results
@@ -0,0 +1,462 @@
+"""
+Движок поиска систем - единственное место, где живет ранжирование.
+
+Индекс (SearchIndex) строится из строк systems, текстов вики и нормализованных ключевых слов;
+по нему ищет одна из стратегий:
+    exhaustive - нечеткое сравнение запроса с каждой системой (эталон ранжирования);
+    indexed    - считаются только системы-кандидаты из инвертированного индекса слов
+                 (точные и похожие леммы запроса), быстро, но может не найти то,
+                 что похоже лишь "на глаз";
+    hybrid     - indexed, а если кандидатов не хватило на limit результатов -
+                 добираем полным перебором остальных.
+Запрос, похожий на код системы (SYS-001), сначала ищется по триграммам кода и названия
+(app/services/trigrams.py) - если нашлось, стратегия не запускается.
+Ранжирование у всех стратегий одно и то же (score_document), поэтому выдачу разных
+режимов можно сравнивать бок о бок.
+"""
+import heapq
+import sys
+from abc import ABC, abstractmethod
+import time
+from contextlib import contextmanager, nullcontext
+from rapidfuzz import fuzz, process
+from app.config import SEARCH_MODE, logger
+from app.services.facets import FacetIndex, bitmap_to_ids, ids_to_bitmap
+from app.services.owners import OwnerIndex
+from app.services import trigrams
+from app.utils.text import preprocess_text
+
+# Веса полей в итоговом балле и бонус за систему в эксплуатации
+WEIGHT_BASE = 0.5
+WEIGHT_KEYWORDS = 0.3
+WEIGHT_WIKI = 0.2
+PROD_BONUS = 5
+MIN_SCORE = 45
+
+# Слово запроса, которого нет среди лемм ключевых слов, сопоставляется с похожими (fuzz.ratio)
+KEYWORD_FUZZY_CUTOFF = 85
+KEYWORD_FUZZY_LIMIT = 3
+# То же для словаря полей при отборе кандидатов (indexed, hybrid)
+TERM_FUZZY_CUTOFF = 80
+TERM_FUZZY_LIMIT = 5
+
+
+# Значения, которые повторяются у тысяч систем: в памяти хранится по одной строке на значение
+INTERNED_FIELDS = frozenset(('status', 'owner_name', 'owner_email', 'owner_telegram'))
+
+# Раскладка строки (колонки, {колонка: позиция}) - одна на набор колонок, общая для всех документов
+_layouts = {}
+
+
+def _layout(columns):
+    layout = _layouts.get(columns)
+    if layout is None:
+        layout = _layouts.setdefault(columns, (columns, {name: i for i, name in enumerate(columns)}))
+    return layout
+
+
+class Document:
+    """
+    Документ индекса. Горячие поля (то, что читает каждый запрос) - атрибуты:
+    леммы названия, описания и вики, ключевые слова [(лемма, вес)], признак эксплуатации.
+    Холодная строка systems хранится кортежем значений с общей раскладкой колонок
+    и превращается в dict только для отданных результатов (to_row).
+    """
+
+    __slots__ = ('id', 'title', 'desc', 'wiki', 'kw', 'is_prod', '_layout', '_values')
+
+    def __init__(self, row, title, desc, wiki, kw, is_prod):
+        self.id = row['id']
+        self.title = title
+        self.desc = desc
+        self.wiki = wiki
+        self.kw = kw
+        self.is_prod = is_prod
+        self._layout = _layout(tuple(row))
+        self._values = tuple(
+            sys.intern(value) if name in INTERNED_FIELDS and isinstance(value, str) else value
+            for name, value in row.items()
+        )
+
+    def __getstate__(self):
+        # Раскладка восстанавливается из колонок: после pickle (воркеры сборки) снова общая
+        return (self.id, self.title, self.desc, self.wiki, self.kw, self.is_prod, self._layout[0], self._values)
+
+    def __setstate__(self, state):
+        self.id, self.title, self.desc, self.wiki, self.kw, self.is_prod, columns, values = state
+        self._layout = _layout(columns)
+        self._values = tuple(
+            sys.intern(value) if name in INTERNED_FIELDS and isinstance(value, str) else value
+            for name, value in zip(columns, values)
+        )
+
+    def get(self, column, default=None):
+        """Значение колонки строки systems (default, если такой колонки нет)."""
+        position = self._layout[1].get(column)
+        return default if position is None else self._values[position]
+
+    def to_row(self):
+        return dict(zip(self._layout[0], self._values))
+
+
+def prepare_document(row, wiki, keywords):
+    """
+    Лемматизация полей один раз при построении индекса, а не на каждый запрос.
+    Сам текст вики в индексе не хранится - только его леммы. keywords - [(лемма, вес)]
+    из system_keywords: для каждого слова лемм берется максимальный вес.
+    """
+    kw = {}
+    for lemma, weight in keywords:
+        for token in lemma.split():
+            kw[token] = max(kw.get(token, 0), weight)
+    status = str(row.get('status')).lower()
+    return Document(
+        row,
+        preprocess_text(row.get('product_name'), expand_synonyms=False),
+        preprocess_text(row.get('description'), expand_synonyms=False),
+        preprocess_text(wiki, expand_synonyms=False),
+        tuple(kw.items()),
+        'эксплуатации' in status or 'prod' in status,
+    )
+
+
+def prepare_documents(items):
+    """
+    [(id, документ)] для [(строка systems, текст вики, ключевые слова)]. Единица работы
+    воркера параллельной сборки: на входе и выходе только данные, без соединений с БД.
+    """
+    return [(row['id'], prepare_document(row, wiki, keywords)) for row, wiki, keywords in items]
+
+
+def _keyword_entries(doc):
+    return doc.kw
+
+
+def _term_entries(doc):
+    tokens = set(doc.title.split())
+    tokens.update(doc.desc.split())
+    tokens.update(doc.wiki.split())
+    return ((token, 1) for token in tokens)
+
+
+def _update_postings(postings, removed, added, entries):
+    """Копия инвертированного индекса с замененными документами (копируются только затронутые списки)."""
+    postings = dict(postings)
+    touched = set()
+    for sys_id, doc in removed:
+        for token, _ in entries(doc):
+            if token not in touched:
+                postings[token] = dict(postings[token])
+                touched.add(token)
+            del postings[token][sys_id]
+            if not postings[token]:
+                del postings[token]
+                touched.discard(token)
+    for sys_id, doc in added:
+        for token, weight in entries(doc):
+            if token not in touched:
+                postings[token] = dict(postings.get(token, {}))
+                touched.add(token)
+            postings[token][sys_id] = weight
+    return postings
+
+
+class SearchIndex:
+    """
+    docs: id системы -> подготовленный документ;
+    postings: лемма ключевого слова -> {id системы: вес};
+    terms: лемма из названия, описания и вики -> {id системы: 1};
+    facets: битовые карты статусов, владельцев и ссылок (app/services/facets.py);
+    owners: поиск владельцев по email, Telegram и имени (app/services/owners.py);
+    trigrams: поле + тройка символов кода/названия -> {id системы: 1} (app/services/trigrams.py).
+    После построения не меняется: updated() возвращает новый индекс.
+    """
+
+    def __init__(self, docs=None, postings=None, terms=None, facets=None, owners=None, trigrams=None):
+        self.docs = docs or {}
+        self.postings = postings or {}
+        self.terms = terms or {}
+        self.facets = facets or FacetIndex()
+        self.owners = owners or OwnerIndex()
+        self.trigrams = trigrams or {}
+
+    @classmethod
+    def build(cls, docs):
+        return cls().updated((), docs)
+
+    def updated(self, removed_ids, added_docs):
+        """Новый индекс: документы removed_ids убраны, added_docs ({id: документ}) добавлены."""
+        docs = dict(self.docs)
+        removed = [(sys_id, docs.pop(sys_id)) for sys_id in removed_ids if sys_id in docs]
+        docs.update(added_docs)
+        return SearchIndex(
+            docs,
+            _update_postings(self.postings, removed, added_docs.items(), _keyword_entries),
+            _update_postings(self.terms, removed, added_docs.items(), _term_entries),
+            self.facets.updated(removed, added_docs.items()),
+            self.owners.updated(removed, added_docs.items()),
+            _update_postings(self.trigrams, removed, added_docs.items(), trigrams.trigram_entries),
+        )
+
+
+def build_index(rows, wikis, keywords):
+    """Индекс по строкам systems, текстам вики {id: текст} и ключевым словам {id: [(лемма, вес)]}."""
+    return SearchIndex.build({
+        row['id']: prepare_document(row, wikis.get(row['id']), keywords.get(row['id'], ()))
+        for row in rows
+    })
+
+
+class ParsedQuery:
+    """Запрос в двух формах: леммы как есть ("кружки" -> "кружок") и с раскрытыми синонимами ("удо дополнительное")."""
+
+    def __init__(self, text):
+        self.text = text
+        self.raw = preprocess_text(text, expand_synonyms=False)
+        self.synonyms = preprocess_text(text, expand_synonyms=True)
+        self.tokens = list(dict.fromkeys(self.raw.split() + self.synonyms.split()))
+
+
+def keyword_scores(query, postings):
+    """
+    Балл по ключевым словам 0..100 для систем, у которых совпало хоть одно слово запроса:
+    доля слов запроса, найденных среди лемм (с весом ключевого слова). Слова, которых
+    нет в индексе, сопоставляются с похожими леммами словаря.
+    """
+    tokens = list(dict.fromkeys(query.synonyms.split()))
+    if not tokens or not postings:
+        return {}
+    strength = {}
+    for token in tokens:
+        matches = postings.get(token)
+        if matches is None:
+            matches = {}
+            for lemma, similarity, _ in process.extract(
+                token, postings.keys(), scorer=fuzz.ratio,
+                score_cutoff=KEYWORD_FUZZY_CUTOFF, limit=KEYWORD_FUZZY_LIMIT,
+            ):
+                for sys_id, weight in postings[lemma].items():
+                    matches[sys_id] = max(matches.get(sys_id, 0), weight * similarity / 100)
+        for sys_id, weight in matches.items():
+            strength[sys_id] = strength.get(sys_id, 0) + weight
+    return {sys_id: 100 * value / len(tokens) for sys_id, value in strength.items()}
+
+
+def score_document(doc, query, keyword_score, details=None):
+    """Итоговый балл системы. В details (если передан) складываются составляющие - для explain."""
+    score_raw = max(
+        fuzz.token_set_ratio(query.raw, doc.title),
+        fuzz.token_set_ratio(query.raw, doc.desc)
+    )
+
+    score_syn = 0
+    if query.raw != query.synonyms:
+        score_syn = max(
+            fuzz.token_set_ratio(query.synonyms, doc.title),
+            fuzz.token_set_ratio(query.synonyms, doc.desc)
+        )
+
+    base_score = max(score_raw, score_syn)
+
+    wiki_score = 0
+    if doc.wiki:
+        wiki_score = fuzz.token_set_ratio(query.synonyms, doc.wiki)
+
+    final_score = (base_score * WEIGHT_BASE) + (keyword_score * WEIGHT_KEYWORDS) + (wiki_score * WEIGHT_WIKI)
+
+    status_bonus = PROD_BONUS if doc.is_prod else 0
+    final_score += status_bonus
+
+    if details is not None:
+        details.update({
+            'score_raw': score_raw,
+            'score_syn': score_syn,
+            'base_score': base_score,
+            'wiki_score': wiki_score,
+            'score_ai': keyword_score,
+            'status_bonus': status_bonus,
+            'final_score': final_score,
+        })
+    return final_score
+
+
+class SearchProfile:
+    """Профиль одного поиска для explain: формы запроса, счетчики и время этапов в мс."""
+
+    def __init__(self):
+        self.query = None
+        self.strategy = None
+        self.counts = {}
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + (time.perf_counter() - started) * 1000
+
+    def to_dict(self):
+        return {
+            'mode': self.strategy,
+            'query': {
+                'text': self.query.text,
+                'raw': self.query.raw,
+                'synonyms': self.query.synonyms,
+                'tokens': self.query.tokens,
+            } if self.query else None,
+            'counts': self.counts,
+            'timings_ms': {name: round(ms, 3) for name, ms in self.timings.items()},
+        }
+
+
+def _stage(profile, name):
+    return profile.stage(name) if profile is not None else nullcontext()
+
+
+class SearchStrategy(ABC):
+    name = None
+
+    @abstractmethod
+    def candidates(self, index, query, kw_scores, allowed):
+        """Кого оценивать; allowed - множество id после фильтров (None - без фильтров)."""
+
+    @staticmethod
+    def score(index, sys_ids, query, kw_scores):
+        """[(балл, id системы)] для тех, кто прошел MIN_SCORE."""
+        hits = []
+        for sys_id in sys_ids:
+            final_score = score_document(index.docs[sys_id], query, kw_scores.get(sys_id, 0))
+            if final_score > MIN_SCORE:
+                hits.append((final_score, sys_id))
+        return hits
+
+    def search(self, index, query, limit, profile=None, allowed=None):
+        """(hits, баллы по ключевым словам, сколько систем оценено)."""
+        with _stage(profile, 'candidates'):
+            kw_scores = keyword_scores(query, index.postings)
+            candidates = self.candidates(index, query, kw_scores, allowed)
+        with _stage(profile, 'scoring'):
+            hits = self.score(index, candidates, query, kw_scores)
+        return hits, kw_scores, len(candidates)
+
+
+class ExhaustiveStrategy(SearchStrategy):
+    name = "exhaustive"
+
+    def candidates(self, index, query, kw_scores, allowed):
+        return index.docs.keys() if allowed is None else allowed
+
+
+class IndexedStrategy(SearchStrategy):
+    name = "indexed"
+
+    def candidates(self, index, query, kw_scores, allowed):
+        """Системы, где встречается слово запроса (или похожее на него), плюс совпавшие по ключевым словам."""
+        found = set(kw_scores)
+        for token in query.tokens:
+            matches = index.terms.get(token)
+            if matches is not None:
+                found.update(matches)
+                continue
+            for term, _, _ in process.extract(
+                token, index.terms.keys(), scorer=fuzz.ratio,
+                score_cutoff=TERM_FUZZY_CUTOFF, limit=TERM_FUZZY_LIMIT,
+            ):
+                found.update(index.terms[term])
+        return found if allowed is None else found & allowed
+
+
+class HybridStrategy(IndexedStrategy):
+    name = "hybrid"
+
+    def search(self, index, query, limit, profile=None, allowed=None):
+        with _stage(profile, 'candidates'):
+            kw_scores = keyword_scores(query, index.postings)
+            candidates = self.candidates(index, query, kw_scores, allowed)
+        with _stage(profile, 'scoring'):
+            hits = self.score(index, candidates, query, kw_scores)
+            scored = len(candidates)
+            if len(hits) < limit:
+                rest = [sys_id for sys_id in (index.docs if allowed is None else allowed) if sys_id not in candidates]
+                hits.extend(self.score(index, rest, query, kw_scores))
+                scored += len(rest)
+        return hits, kw_scores, scored
+
+
+STRATEGIES = {strategy.name: strategy for strategy in (ExhaustiveStrategy(), IndexedStrategy(), HybridStrategy())}
+
+
+def get_strategy(mode=None):
+    """Стратегия по имени (None - SEARCH_MODE из настроек). KeyError для неизвестного режима."""
+    return STRATEGIES[mode or SEARCH_MODE]
+
+
+def search(index, query, limit=5, mode=None, profile=None, filters=None, facets=None):
+    """
+    Найденные системы (строки systems + search_score), лучшие первыми.
+    filters (SearchFilters) отсекают системы по битовым картам до нечеткого сравнения.
+    Запрос, похожий на код, ищется по триграммам (search_score - похожесть 0..100),
+    и только если ничего не нашлось - стратегией mode.
+    В facets (если передан dict) складываются счетчики фасетов по всем найденным.
+    С profile к каждой добавляется explain (составляющие балла), а в profile -
+    формы запроса, число кандидатов/отсеянных и время этапов.
+    """
+    strategy = get_strategy(mode)
+    text = query
+
+    allowed = None
+    if filters:
+        with _stage(profile, 'filtering'):
+            allowed = set(bitmap_to_ids(index.facets.allowed(filters)))
+
+    hits = None
+    if trigrams.looks_like_code(text):
+        with _stage(profile, 'code_lookup'):
+            hits, scored = trigrams.lookup(index.trigrams, index.docs, text, allowed)
+        if hits:
+            logger.info(f"Searching (code): '{text}' -> {len(hits)} matches")
+            query, kw_scores, strategy_name = None, {}, "code"
+
+    if not hits:
+        with _stage(profile, 'normalization'):
+            query = ParsedQuery(text)
+        logger.info(f"Searching ({strategy.name}): Raw='{query.raw}' | Synonyms='{query.synonyms}'")
+        hits, kw_scores, scored = strategy.search(index, query, limit, profile, allowed)
+        strategy_name = strategy.name
+
+    if facets is not None:
+        with _stage(profile, 'facets'):
+            facets.update(index.facets.counts(ids_to_bitmap(sys_id for _, sys_id in hits)))
+
+    with _stage(profile, 'materialization'):
+        # Строки собираются только для top-k. При равных баллах - по id, чтобы выдача
+        # режимов совпадала и не зависела от порядка кандидатов
+        results = []
+        for final_score, sys_id in heapq.nsmallest(limit, hits, key=lambda hit: (-hit[0], hit[1])):
+            res = index.docs[sys_id].to_row()
+            res['search_score'] = final_score
+            results.append(res)
+
+    if profile is not None:
+        profile.query = query
+        profile.strategy = strategy_name
+        profile.counts = {
+            'documents': len(index.docs),
+            'filtered': len(index.docs) if allowed is None else len(allowed),
+            'candidates': scored,
+            'pruned': len(index.docs) - scored,
+            'below_threshold': scored - len(hits),
+            'hits': len(hits),
+            'returned': len(results),
+        }
+        # Составляющие пересчитываются только для отданных систем, основной проход их не собирает
+        for res in results:
+            if query is None:
+                res['explain'] = {'code_match_score': res['search_score'], 'final_score': res['search_score']}
+                continue
+            details = {}
+            score_document(index.docs[res['id']], query, kw_scores.get(res['id'], 0), details)
+            res['explain'] = details
+    return results
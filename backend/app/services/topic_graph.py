@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import deque
+from app.config import JIRA_DB_NAME, logger
+from app.utils.http import file_version
+
+PRODUCER = "PRODUCER"
+CONSUMER = "CONSUMER"
+
+
+def _build_csr(pairs, size):
+    """
+    Упаковывает список пар (src, dst) в компактный CSR:
+    соседи вершины i лежат в targets[offsets[i]:offsets[i + 1]].
+    """
+    counts = [0] * (size + 1)
+    for src, _ in pairs:
+        counts[src + 1] += 1
+    for i in range(size):
+        counts[i + 1] += counts[i]
+
+    offsets = array('i', counts)
+    targets = array('i', [0]) * len(pairs)
+    cursor = list(counts[:size])
+    for src, dst in pairs:
+        targets[cursor[src]] = dst
+        cursor[src] += 1
+    return offsets, targets
+
+
+class TopicGraph:
+    """
+    Двудольный граф система <-> топик Kafka из system_dependencies.
+    Системы и топики пронумерованы целыми числами, ребра по ролям хранятся в array('i').
+    """
+
+    def __init__(self, edges=()):
+        self.system_codes = []
+        self.topic_names = []
+        self._system_ids = {}
+        self._topic_ids = {}
+
+        produced, consumed = set(), set()
+        for system_code, topic_name, role in edges:
+            if not system_code or not topic_name:
+                continue
+            role = str(role).upper()
+            if role not in (PRODUCER, CONSUMER):
+                continue
+            edge = (self._intern(self._system_ids, self.system_codes, system_code),
+                    self._intern(self._topic_ids, self.topic_names, topic_name))
+            (produced if role == PRODUCER else consumed).add(edge)
+
+        n_sys, n_top = len(self.system_codes), len(self.topic_names)
+        produced, consumed = sorted(produced), sorted(consumed)
+        self._sys_produces = _build_csr(produced, n_sys)
+        self._sys_consumes = _build_csr(consumed, n_sys)
+        self._topic_producers = _build_csr([(t, s) for s, t in produced], n_top)
+        self._topic_consumers = _build_csr([(t, s) for s, t in consumed], n_top)
+        self.edge_count = len(produced) + len(consumed)
+
+    @staticmethod
+    def _intern(ids, names, key):
+        idx = ids.get(key)
+        if idx is None:
+            idx = ids[key] = len(names)
+            names.append(key)
+        return idx
+
+    @classmethod
+    def from_db(cls, db_path=JIRA_DB_NAME):
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute("SELECT system_code, topic_name, role FROM system_dependencies").fetchall()
+        finally:
+            conn.close()
+        return cls(rows)
+
+    @staticmethod
+    def _neighbours(csr, idx):
+        offsets, targets = csr
+        return targets[offsets[idx]:offsets[idx + 1]]
+
+    def has_system(self, system_code):
+        return system_code in self._system_ids
+
+    def topic_systems(self, topic_name):
+        """Обратный поиск: кто пишет в топик и кто его читает."""
+        idx = self._topic_ids.get(topic_name)
+        if idx is None:
+            return None
+        return {
+            "topic_name": topic_name,
+            "producers": [self.system_codes[s] for s in self._neighbours(self._topic_producers, idx)],
+            "consumers": [self.system_codes[s] for s in self._neighbours(self._topic_consumers, idx)],
+        }
+
+    def impact(self, system_code, direction="downstream", max_depth=3):
+        """
+        BFS по системам с ограничением глубины.
+        downstream - кто пострадает, если система упадет (читатели ее топиков);
+        upstream - от кого система зависит (писатели топиков, которые она читает).
+        """
+        start = self._system_ids.get(system_code)
+        if start is None:
+            return []
+
+        if direction == "downstream":
+            out_edges, in_edges = self._sys_produces, self._topic_consumers
+        else:
+            out_edges, in_edges = self._sys_consumes, self._topic_producers
+
+        visited = bytearray(len(self.system_codes))
+        visited[start] = 1
+        affected = []
+        queue = deque([(start, 0)])
+        while queue:
+            node, depth = queue.popleft()
+            if depth >= max_depth:
+                continue
+            for topic in self._neighbours(out_edges, node):
+                for other in self._neighbours(in_edges, topic):
+                    if visited[other]:
+                        continue
+                    visited[other] = 1
+                    affected.append({
+                        "system_code": self.system_codes[other],
+                        "depth": depth + 1,
+                        "via_topic": self.topic_names[topic],
+                    })
+                    queue.append((other, depth + 1))
+        return affected
+
+
+class TopicGraphProvider:
+    """
+    Держит актуальный граф и перестраивает его, когда меняется jira_data.db.
+    Версия - по stat() файла и его WAL: коммит в WAL-режиме до чекпоинта не трогает основной файл.
+    """
+
+    def __init__(self, db_path=JIRA_DB_NAME):
+        self.db_path = db_path
+        self._graph = TopicGraph()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if not os.path.exists(self.db_path):
+            return self._graph
+
+        version = file_version(self.db_path)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    started = time.perf_counter()
+                    try:
+                        self._graph = TopicGraph.from_db(self.db_path)
+                    except sqlite3.OperationalError as e:
+                        logger.error(f"Database error (Jira DB): {e}")
+                    else:
+                        logger.info(
+                            f"Topic graph loaded: {len(self._graph.system_codes)} systems, "
+                            f"{len(self._graph.topic_names)} topics, {self._graph.edge_count} edges "
+                            f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+                        )
+                    self._version = version
+        return self._graph
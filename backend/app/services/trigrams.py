@@ -0,0 +1,120 @@
+"""
+Триграммный индекс по product_code и product_name: поиск кода системы ("SYS-001", "sys001",
+"SYS-0O1") без полного нечеткого перебора. Строки разбиваются на тройки символов с отступами
+("  s", " sy", "sys", ...), в индексе - тройка -> {id системы: 1}. Тройки только отбирают
+кандидатов: нужна доля троек запроса не ниже порога, и кандидатов дают лишь самые редкие
+тройки запроса (у подходящей системы хотя бы одна из них обязательно есть). Порядок
+кандидатов - по сходству строк (rapidfuzz); коды, отличающиеся только похожими символами
+(O и 0, I/l и 1), считаются почти точным совпадением.
+"""
+import math
+import re
+from rapidfuzz import fuzz
+from app.utils.text import normalize_key
+
+# Какая доля троек запроса (0..1) должна быть у системы, чтобы она стала кандидатом
+TRIGRAM_MIN_OVERLAP = 0.5
+# Минимальное сходство строк (0..100), с которым кандидат попадает в выдачу
+TRIGRAM_MIN_SCORE = 60
+# Балл кода, совпавшего с запросом с точностью до похожих символов
+CONFUSABLE_SCORE = 99
+# Короче - это не код, а обрывок слова
+CODE_MIN_LENGTH = 3
+# Сколько кандидатов проверять: редкие тройки берутся, пока набор не превысит предел
+# (система с точным совпадением есть в самом редком списке и не теряется)
+TRIGRAM_MAX_CANDIDATES = 1000
+
+# Одно "слово" из букв/цифр с разделителями -_./ и хотя бы одной цифрой: SYS-001, ais.12, МЭШ-2
+CODE_RE = re.compile(r'^(?=\D*\d)[^\W_]+(?:[-_./][^\W_]+)*$')
+WORD_RE = re.compile(r'[^\W_]+')
+# Символы, которые путают при наборе кода (в т.ч. кириллица в латинской раскладке)
+CONFUSABLES = str.maketrans({"o": "0", "о": "0", "i": "1", "l": "1"})
+
+FIELD_CODE = "c"
+FIELD_NAME = "n"
+
+
+def looks_like_code(text):
+    text = (text or "").strip()
+    return len(text) <= 40 and bool(CODE_RE.match(text))
+
+
+def code_key(text):
+    """Код без регистра и разделителей: "SYS-001" -> "sys001"."""
+    return "".join(WORD_RE.findall(normalize_key(text)))
+
+
+def _grams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def code_trigrams(text):
+    key = code_key(text)
+    return _grams(key) if key else set()
+
+
+def name_trigrams(text):
+    grams = set()
+    for word in WORD_RE.findall(normalize_key(text)):
+        grams |= _grams(word)
+    return grams
+
+
+FIELDS = (
+    (FIELD_CODE, 'product_code', code_trigrams),
+    (FIELD_NAME, 'product_name', name_trigrams),
+)
+
+
+def trigram_entries(doc):
+    """Записи документа для SearchIndex.trigrams: ключ - поле + тройка."""
+    for field, column, trigrams in FIELDS:
+        for gram in trigrams(doc.get(column)):
+            yield field + gram, 1
+
+
+def _score(field, value, query):
+    """Сходство значения поля с запросом 0..100; 100 - только точное совпадение."""
+    if field == FIELD_CODE:
+        value, query = code_key(value), code_key(query)
+        if value == query:
+            return 100
+        if value.translate(CONFUSABLES) == query.translate(CONFUSABLES):
+            return CONFUSABLE_SCORE
+        return min(fuzz.ratio(value, query), CONFUSABLE_SCORE - 1)
+    value, query = " ".join(WORD_RE.findall(normalize_key(value))), " ".join(WORD_RE.findall(normalize_key(query)))
+    return 100 if value == query else min(fuzz.token_set_ratio(value, query), CONFUSABLE_SCORE - 1)
+
+
+def lookup(postings, docs, query, allowed=None, min_overlap=TRIGRAM_MIN_OVERLAP):
+    """
+    ([(сходство 0..100, id системы)], сколько кандидатов проверено). Сходство системы -
+    лучшее из кода и названия. allowed - id после фильтров (None - все).
+    """
+    if len(code_key(query)) < CODE_MIN_LENGTH:
+        return [], 0
+    best = {}
+    checked = 0
+    for field, column, trigrams in FIELDS:
+        grams = trigrams(query)
+        if not grams:
+            continue
+        lists = sorted((postings.get(field + gram, {}) for gram in grams), key=len)
+        needed = math.ceil(min_overlap * len(grams))
+        # Нужно needed общих троек, и хотя бы одна - среди len - needed + 1 самых редких
+        candidates = set()
+        for ids in lists[:len(lists) - needed + 1]:
+            if candidates and len(candidates) + len(ids) > TRIGRAM_MAX_CANDIDATES:
+                break
+            candidates.update(ids)
+        checked += len(candidates)
+        for sys_id in candidates:
+            if allowed is not None and sys_id not in allowed:
+                continue
+            if sum(1 for ids in lists if sys_id in ids) < needed:
+                continue
+            score = _score(field, docs[sys_id].get(column), query)
+            if score >= TRIGRAM_MIN_SCORE and score > best.get(sys_id, 0):
+                best[sys_id] = score
+    return [(round(score, 1), sys_id) for sys_id, score in best.items()], checked
@@ -0,0 +1,49 @@
+import threading
+import time
+from app.config import logger
+
+
+class WarmUp:
+    """
+    Прогрев после старта: словари морфологии, БД, индекс поиска, граф топиков и пробный запрос.
+    Идет в фоне - /health/live отвечает сразу, /health/ready только после прогрева.
+    Длительности фаз и импорта отдаются в /health/ready и пишутся в лог.
+    """
+
+    def __init__(self, phases, import_seconds=None):
+        # phases - [(имя, функция без аргументов)], выполняются по порядку
+        self.phases = phases
+        self.import_seconds = import_seconds
+        self.timings = {}
+        self.error = None
+        self.ready = threading.Event()
+        self._started = None
+        self._total = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        threading.Thread(target=self._run, name="warmup", daemon=True).start()
+
+    def _run(self):
+        for name, phase in self.phases:
+            started = time.perf_counter()
+            try:
+                phase()
+            except Exception as e:
+                logger.exception(f"Warm-up phase '{name}' failed")
+                self.error = f"{name}: {e}"
+                return
+            self.timings[name] = round(time.perf_counter() - started, 3)
+        self._total = round(time.perf_counter() - self._started, 3)
+        self.ready.set()
+        phases = ", ".join(f"{name} {seconds:.2f} s" for name, seconds in self.timings.items())
+        logger.info(f"Startup: imports {self.import_seconds or 0:.2f} s, warm-up {self._total:.2f} s ({phases})")
+
+    def status(self):
+        return {
+            "status": "ready" if self.ready.is_set() else ("failed" if self.error else "warming_up"),
+            "import_seconds": self.import_seconds,
+            "warmup_seconds": self._total,
+            "phases": dict(self.timings),
+            "error": self.error,
+        }
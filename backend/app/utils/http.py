@@ -0,0 +1,48 @@
+import hashlib
+import os
+from fastapi import Request, Response
+
+
+def file_version(path):
+    """
+    Версия данных SQLite-файла по stat() самого файла и его WAL.
+    Меняется при любом коммите, в том числе из knowledge_base.py и enrich_with_ai.py.
+    """
+    parts = []
+    for p in (path, path + "-wal"):
+        try:
+            st = os.stat(p)
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except FileNotFoundError:
+            parts.append("-")
+    return "/".join(parts)
+
+
+def make_etag(*parts):
+    """Сильный ETag из версии данных и параметров запроса."""
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Сравнение для If-None-Match - слабое (RFC 9110), поэтому префикс W/ игнорируем
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+
+def conditional_response(request: Request, response: Response, etag, cache_control, vary=None):
+    """
+    Проставляет ETag/Cache-Control и возвращает готовый 304, если у клиента актуальная копия.
+    Вызывается до расчета результата, чтобы не тратить CPU на скоринг.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if vary:
+        headers["Vary"] = vary
+    response.headers.update(headers)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return None
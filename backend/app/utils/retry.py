@@ -0,0 +1,65 @@
+import random
+import threading
+import time
+from requests.exceptions import ConnectionError, HTTPError, Timeout
+
+# Ответы, после которых запрос имеет смысл повторить
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Token bucket: в среднем не больше rate запросов в секунду, всплеск до burst."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _retry_after(response):
+    """Retry-After в секундах (формат HTTP-date не поддерживаем - вернем None)."""
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_retry(func, *args, retries=4, backoff=0.5, max_backoff=30.0, limiter=None, **kwargs):
+    """
+    Вызывает func с повторами на 429/5xx и сетевых ошибках.
+    Пауза - Retry-After от сервера либо экспоненциальный backoff с джиттером.
+    """
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return func(*args, **kwargs)
+        except HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status not in RETRY_STATUS_CODES or attempt == retries:
+                raise
+            delay = _retry_after(e.response)
+        except (ConnectionError, Timeout):
+            if attempt == retries:
+                raise
+            delay = None
+
+        if delay is None:
+            delay = backoff * (2 ** attempt) + random.uniform(0, backoff)
+        time.sleep(min(delay, max_backoff))
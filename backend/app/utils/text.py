@@ -1,9 +1,28 @@
 import re
-import pymorphy2
-import ftfy
-import pandas as pd
+import threading
+from functools import lru_cache
 
-morph = pymorphy2.MorphAnalyzer()
+# pymorphy2 (словари ~0.5 с), ftfy и pandas загружаются при первом использовании,
+# а не при импорте: CLI и воркеры, которым они не нужны, стартуют быстрее
+_morph = None
+_morph_lock = threading.Lock()
+
+
+def get_morph():
+    global _morph
+    if _morph is None:
+        with _morph_lock:
+            if _morph is None:
+                import pymorphy2
+                _morph = pymorphy2.MorphAnalyzer()
+    return _morph
+
+
+def __getattr__(name):
+    # Совместимость со старым `from app.utils.text import morph`
+    if name == "morph":
+        return get_morph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 STOP_WORDS = {
             'система', 'сервис', 'продукт', 'приложение', 'веб', 'для', 'на', 'в', 'и', 
@@ -24,11 +43,60 @@ SYNONYMS = {
             "ученик": "обучающийся учащийся",
         }
 
+# Ячейки, которые ftfy гарантированно не изменит: печатный ASCII (без & - HTML-сущности),
+# кириллица и типографские знаки, которые ftfy оставляет как есть.
+CLEAN_TEXT_RE = r'[\t\n\x20-\x25\x27-\x7eА-яЁё«»—–№…]*'
+# UTF-8 кириллица, прочитанная как cp1251: "Р" / "С" + символ из верхней половины cp1251
+CP1251_MOJIBAKE_RE = r'[РС][\u0080-¿Ё-Џё-џҐґ‐-›€№™]'
+
+# Меньше этого числа "грязных" ячеек пул процессов дороже самой починки
+PARALLEL_FIX_MIN_CELLS = 2000
+
+# Разборы pymorphy2 по словам: словарь корпуса на порядки меньше числа словоупотреблений.
+# Кэш свой в каждом процессе (в т.ч. в воркерах сборки индекса)
+WORD_CACHE_SIZE = 200_000
+
+def normalize_key(text):
+    """Ключ для точного сравнения значений: без регистра, ё = е, пробелы схлопнуты."""
+    if text is None:
+        return ""
+    return " ".join(str(text).lower().replace("ё", "е").split())
+
 def fix_encoding(text):
+    import ftfy
+    import pandas as pd
     if pd.isna(text):
         return ""
     return ftfy.fix_text(str(text))
 
+def fix_encoding_series(series, pool=None):
+    """
+    Векторизованный аналог series.apply(fix_encoding).
+    Чистые ячейки (ASCII, нормальная кириллица) отсеиваются регулярками pandas,
+    ftfy вызывается только для подозрительных - при наличии pool в нескольких процессах.
+    """
+    import ftfy
+    text = series.astype(object).where(series.notna(), "").astype(str)
+    needs_fix = ~text.str.fullmatch(CLEAN_TEXT_RE) | text.str.contains(CP1251_MOJIBAKE_RE)
+    if not needs_fix.any():
+        return text
+
+    dirty = text[needs_fix].tolist()
+    if pool is not None and len(dirty) >= PARALLEL_FIX_MIN_CELLS:
+        fixed = list(pool.map(ftfy.fix_text, dirty, chunksize=256))
+    else:
+        fixed = [ftfy.fix_text(value) for value in dirty]
+    text = text.copy()
+    text[needs_fix] = fixed
+    return text
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def _parse_word(word):
+    """(нормальная форма, синонимы всех вариантов разбора)."""
+    parses = get_morph().parse(word)
+    normal_forms = dict.fromkeys(p.normal_form for p in parses)
+    return parses[0].normal_form, tuple(SYNONYMS[nf] for nf in normal_forms if nf in SYNONYMS)
+
 def preprocess_text(text, expand_synonyms=True):
     if not text: return ""
     text = str(text).lower()
@@ -41,14 +109,7 @@ def preprocess_text(text, expand_synonyms=True):
     for word in words:
         if word in STOP_WORDS or len(word) < 2: continue
         
-        parses = morph.parse(word)
-        normal_form = parses[0].normal_form 
-        normal_forms = set(p.normal_form for p in parses)
-        
-        synonyms_found = []
-        for nf in normal_forms:
-            if nf in SYNONYMS:
-                synonyms_found.append(SYNONYMS[nf])
+        normal_form, synonyms_found = _parse_word(word)
         
         if expand_synonyms and synonyms_found:
             result_words.extend(synonyms_found)
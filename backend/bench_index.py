@@ -0,0 +1,153 @@
+"""
+Бенчмарк индекса поиска в памяти: сколько занимает одна система и сколько выделяет один запрос.
+
+Память меряется tracemalloc: документы (леммы + строка systems) и весь SearchIndex
+(с инвертированными индексами, фасетами, владельцами, триграммами) в байтах на систему;
+для запросов - пик выделенной памяти и время по каждой стратегии.
+
+По базе systems_kb.db (как у API):
+    python bench_index.py
+На синтетическом каталоге (без БД, одинаково на любой машине):
+    python bench_index.py --synthetic 20000 --modes exhaustive,indexed --repeat 3
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from load_test import QUERIES
+from app.services import search_engine
+
+STATUSES = ["В эксплуатации", "Создание", "Выведена", "Опытная эксплуатация"]
+NAMES = [
+    "Зачисление в детские сады", "Электронный дневник школы", "Питание в школах", "СКУД турникеты",
+    "Кружки и секции", "Олимпиады школьников", "Библиотека учебников", "Прием документов в колледж",
+]
+WORDS = "учет заявлений обучающихся родителей оплата расписание уроков журнал оценок портал отчетность".split()
+
+
+def synthetic_catalog(count, seed):
+    """(строки, вики, ключевые слова) в формате build_index: повторяющиеся статусы и владельцы, как в жизни."""
+    rng = random.Random(seed)
+    rows, wikis, keywords = [], {}, {}
+    for sys_id in range(1, count + 1):
+        owner = rng.randrange(max(1, count // 20))
+        rows.append({
+            'id': sys_id,
+            'product_name': f"{rng.choice(NAMES)} {sys_id}",
+            'product_code': f"SYS-{sys_id:05d}",
+            'status': rng.choice(STATUSES),
+            'owner_name': f"Владелец {owner}",
+            'owner_email': f"owner{owner}@mos.ru",
+            'owner_telegram': f"@owner{owner}",
+            'description': " ".join(rng.choices(WORDS, k=12)),
+            'wiki_url': f"https://wiki/{sys_id}",
+            'jira_url': f"https://jira/{sys_id}" if sys_id % 3 else None,
+            'repo_url': None,
+            'last_updated': "2024-01-01 00:00:00",
+            'has_wiki_content': sys_id % 2 == 0,
+        })
+        if sys_id % 2 == 0:
+            wikis[sys_id] = " ".join(rng.choices(WORDS, k=60))
+        if sys_id % 3 == 0:
+            keywords[sys_id] = [(word, 1.0) for word in rng.sample(WORDS, 3)]
+    return rows, wikis, keywords
+
+
+def database_catalog():
+    from app.db.repository import SystemRepository
+
+    repo = SystemRepository()
+    rows = repo.get_all_systems()
+    ids = [row['id'] for row in rows]
+    return rows, repo.get_documents(ids, "wiki"), repo.get_keywords(ids)
+
+
+def measure_memory(load_catalog):
+    """
+    (байт на систему в документах, байт на систему во всем индексе, секунд на сборку).
+    Считается то, что остается в памяти после сборки: каталог загружается под tracemalloc
+    и отпускается, поэтому строки systems учитываются ровно в том виде, в каком их держит индекс.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rows, wikis, keywords = load_catalog()
+    started = time.perf_counter()
+    docs = {
+        row['id']: search_engine.prepare_document(row, wikis.get(row['id']), keywords.get(row['id'], ()))
+        for row in rows
+    }
+    count = max(1, len(rows))
+    del rows, wikis, keywords
+    docs_bytes = tracemalloc.get_traced_memory()[0] - before
+    index = search_engine.SearchIndex.build(docs)
+    del docs
+    index_bytes = tracemalloc.get_traced_memory()[0] - before
+    seconds = time.perf_counter() - started
+    tracemalloc.stop()
+    return index, docs_bytes / count, index_bytes / count, seconds
+
+
+def measure_queries(index, mode, limit, repeat):
+    """Пик выделенной памяти и время на запрос (медианы по QUERIES)."""
+    for query in QUERIES:
+        search_engine.search(index, query, limit=limit, mode=mode)
+    peaks, seconds = [], []
+    tracemalloc.start()
+    for _ in range(repeat):
+        for query in QUERIES:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            search_engine.search(index, query, limit=limit, mode=mode)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    for _ in range(repeat):
+        for query in QUERIES:
+            started = time.perf_counter()
+            search_engine.search(index, query, limit=limit, mode=mode)
+            seconds.append(time.perf_counter() - started)
+    return {
+        "peak_alloc_kb_median": round(statistics.median(peaks) / 1024, 1),
+        "peak_alloc_kb_max": round(max(peaks) / 1024, 1),
+        "ms_median": round(statistics.median(seconds) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Память и выделения индекса поиска")
+    parser.add_argument("--synthetic", type=int, default=0, help="N синтетических систем вместо systems_kb.db")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--modes", default=",".join(search_engine.STRATEGIES))
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=1, help="повторов набора запросов")
+    parser.add_argument("--json", dest="json_path", default=None, help="сохранить результаты в файл")
+    args = parser.parse_args()
+
+    # Логи движка (по строке на запрос) искажают замер
+    search_engine.logger.disabled = True
+    if args.synthetic:
+        index, doc_bytes, index_bytes, seconds = measure_memory(lambda: synthetic_catalog(args.synthetic, args.seed))
+    else:
+        index, doc_bytes, index_bytes, seconds = measure_memory(database_catalog)
+    result = {
+        "systems": len(index.docs),
+        "build_seconds": round(seconds, 2),
+        "bytes_per_system": {"documents": round(doc_bytes), "index": round(index_bytes)},
+        "queries": {},
+    }
+    print(f"Систем: {result['systems']}, сборка {result['build_seconds']} с (под tracemalloc)")
+    print(f"Байт на систему: документы {doc_bytes:.0f}, весь индекс {index_bytes:.0f}")
+    for mode in args.modes.split(","):
+        stats = measure_queries(index, mode, args.limit, args.repeat)
+        result["queries"][mode] = stats
+        print(f"  {mode:<10} выделено за запрос: медиана {stats['peak_alloc_kb_median']} КБ, "
+              f"максимум {stats['peak_alloc_kb_max']} КБ; время {stats['ms_median']} мс")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 import sys
 from passlib.context import CryptContext
-from knowledge_base import SystemKnowledgeBase
 from app.dependencies import get_repository
 from app.security import create_user
 
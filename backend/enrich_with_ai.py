@@ -1,82 +1,146 @@
 import sqlite3
-import requests
-import json
-import time
-import re
-import os
+import argparse
+from collections import Counter
+from app.config import (
+    ENRICH_BATCH, ENRICH_CALL_BUDGET, ENRICH_CHUNK_TOKENS, ENRICH_MAX_ATTEMPTS, ENRICH_MAX_CHUNKS,
+    ENRICH_MAX_KEYWORDS, ENRICH_MAX_OUTPUT_TOKENS, ENRICH_RETRIES, ENRICH_TIMEOUT, ENRICH_WORKERS,
+    OLLAMA_MODEL, OLLAMA_URL,
+)
+from app.db.schema import CHANGE_AI_KEYWORDS, log_changes, migrate
+from app.db.documents import AI_KEYWORDS, WIKI, get_document, put_document
+from app.db.keywords import backfill_keywords, replace_keywords
+from app.services.enrichment import EnrichmentRunner, KeywordExtractor, LLMCache, OllamaClient, clean_html
 
 # Настройки
 DB_PATH = "./backend/systems_kb.db"
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://ollama:11434/api/generate") # Внутри Docker
-# Если запускаете локально, поменяйте на http://localhost:11434/api/generate
-MODEL = "gpt-oss:120b" 
-
-def clean_html(raw_html):
-    if not raw_html: return ""
-    cleanr = re.compile('<.*?>')
-    text = re.sub(cleanr, '', raw_html)
-    return text
-
-def get_ai_keywords(text, system_name):
-    if not text: return ""
-    
-    prompt = f"""
-    Проанализируй текст документации к системе "{system_name}".
-    Твоя задача: составить список ключевых слов, синонимов и функций для поискового индекса.
-    
-    1. Напиши синонимы названия системы (аббревиатуры, сленг).
-    2. Напиши основные функции (что система делает).
-    3. Напиши, кто пользователи (учителя, родители, бухгалтеры).
-    
-    Ответ дай просто списком слов и фраз через запятую на русском языке. Без лишних слов.
-    
-    Текст:
-    {text}
+# OLLAMA_URL по умолчанию - адрес внутри Docker.
+# Если запускаете локально: OLLAMA_URL=http://localhost:11434/api/generate
+
+
+def select_pending(conn, max_attempts=ENRICH_MAX_ATTEMPTS, limit=None):
+    """
+    Системы, которые нужно (до)обработать: документация изменилась с прошлого обогащения
+    (или его не было). Системы, упавшие max_attempts раз на той же документации, пропускаются.
     """
-    
+    query = '''
+        SELECT s.id, s.product_name, d.content_hash
+        FROM systems s
+        JOIN system_documents d ON d.system_id = s.id AND d.kind = ?
+        LEFT JOIN enrichment_failures f ON f.system_id = s.id
+        WHERE d.content_hash IS NOT s.ai_source_hash
+          AND NOT (f.source_hash IS d.content_hash AND f.attempts >= ?)
+        ORDER BY s.id
+    '''
+    params = [WIKI, max_attempts]
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(query, params).fetchall()
+
+
+def enrich(conn, client, workers=ENRICH_WORKERS, batch_size=ENRICH_BATCH, limit=None,
+           chunk_tokens=ENRICH_CHUNK_TOKENS, max_chunks=ENRICH_MAX_CHUNKS, progress=None):
+    """
+    Обогащает системы с измененной документацией. Возвращает счетчики прогона.
+    progress(done, total) вызывается после каждой системы; исключение из него
+    останавливает прогон, готовые результаты при этом сохраняются.
+    """
+    migrate(conn)
+    backfill_keywords(conn)
+    cursor = conn.cursor()
+    db_path = next(row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main")
+    cache = LLMCache(db_path)
+    extractor = KeywordExtractor(client, cache, chunk_tokens=chunk_tokens, max_chunks=max_chunks)
+
+    # Прогон продолжается с того места, где остановился прошлый: готовые системы
+    # отсеиваются по ai_source_hash, поэтому отдельный файл чекпоинта не нужен
+    systems = select_pending(conn, limit=limit)
+    print(f"К обработке {len(systems)} систем с документацией.")
+
+    def items():
+        # Тексты распаковываются по мере освобождения слотов, а не все сразу
+        for sys_id, name, wiki_hash in systems:
+            yield sys_id, name, clean_html(get_document(conn.cursor(), sys_id, WIKI)), wiki_hash
+
+    stats = {"updated": 0, "unchanged": 0, "failed": 0, "interrupted": False, "stop_reasons": Counter()}
+    pending = []
+
+    def flush():
+        for (sys_id, name, _, wiki_hash), keywords, error in pending:
+            if keywords:
+                if put_document(cursor, sys_id, AI_KEYWORDS, keywords):
+                    print(f"   ✅ {name}: {keywords[:100]}...")
+                    replace_keywords(cursor, sys_id, keywords)
+                    log_changes(cursor, [sys_id], CHANGE_AI_KEYWORDS)
+                    stats["updated"] += 1
+                else:
+                    stats["unchanged"] += 1
+                cursor.execute("UPDATE systems SET ai_source_hash = ? WHERE id = ?", (wiki_hash, sys_id))
+                cursor.execute("DELETE FROM enrichment_failures WHERE system_id = ?", (sys_id,))
+            else:
+                reason = str(error) if error else "empty response"
+                print(f"   ⚠️ {name}: не удалось получить ответ от AI ({reason})")
+                cursor.execute('''
+                    INSERT INTO enrichment_failures (system_id, source_hash, attempts, last_error, failed_at)
+                    VALUES (?, ?, 1, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(system_id) DO UPDATE SET
+                        attempts = CASE WHEN source_hash IS excluded.source_hash THEN attempts + 1 ELSE 1 END,
+                        source_hash = excluded.source_hash, last_error = excluded.last_error,
+                        failed_at = CURRENT_TIMESTAMP
+                ''', (sys_id, wiki_hash, reason[:500]))
+                stats["failed"] += 1
+        cache.drain(cursor)
+        stats["stop_reasons"].update(metric["stop_reason"] for metric in client.drain_metrics(cursor))
+        conn.commit()
+        pending.clear()
+
+    done = 0
+
+    def on_result(item, keywords, error):
+        nonlocal done
+        done += 1
+        pending.append((item, keywords, error))
+        if len(pending) >= batch_size:
+            flush()
+        if progress is not None:
+            progress(done, len(systems))
+
+    runner = EnrichmentRunner(extractor, workers=workers)
     try:
-        response = requests.post(OLLAMA_URL, json={
-            "model": MODEL,
-            "prompt": prompt,
-            "stream": False
-        })
-        
-        if response.status_code == 200:
-            return response.json().get("response", "")
-        else:
-            print(f"Error Ollama: {response.status_code}")
-            return ""
-    except Exception as e:
-        print(f"Connection error: {e}")
-        return ""
+        run_stats = runner.run(items(), on_result)
+        print(f"⏱️ {run_stats['total']} систем за {run_stats['seconds']:.1f} с")
+    except KeyboardInterrupt:
+        print("⏹️ Прервано - сохраняем готовые результаты, следующий запуск продолжит с этого места.")
+        stats["interrupted"] = True
+    finally:
+        flush()
+    stats["cache_hits"], stats["cache_misses"] = cache.hits, cache.misses
+    return stats
+
 
 def main():
+    parser = argparse.ArgumentParser(description="AI-обогащение базы знаний ключевыми словами")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--url", default=OLLAMA_URL)
+    parser.add_argument("--model", default=OLLAMA_MODEL)
+    parser.add_argument("--workers", type=int, default=ENRICH_WORKERS, help="одновременных запросов к Ollama")
+    parser.add_argument("--batch-size", type=int, default=ENRICH_BATCH, help="результатов на один коммит")
+    parser.add_argument("--limit", type=int, default=None, help="обработать не больше N систем")
+    args = parser.parse_args()
+
     print("🚀 Начинаем AI-обогащение базы знаний...")
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Берем системы, у которых есть Wiki, но нет AI-ключевиков (или обновляем все)
-    cursor.execute("SELECT id, product_name, wiki_content FROM systems WHERE wiki_content IS NOT NULL AND wiki_content != ''")
-    systems = cursor.fetchall()
-    
-    total = len(systems)
-    print(f"Найдено {total} систем с документацией.")
-    
-    for i, (sys_id, name, content) in enumerate(systems):
-        print(f"[{i+1}/{total}] Обработка: {name}...")
-        
-        clean_text = clean_html(content)
-        keywords = get_ai_keywords(clean_text, name)
-        
-        if keywords:
-            print(f"   ✅ Ключевые слова: {keywords[:100]}...")
-            cursor.execute("UPDATE systems SET ai_keywords = ? WHERE id = ?", (keywords, sys_id))
-            conn.commit()
-        else:
-            print("   ⚠️ Не удалось получить ответ от AI.")
-            
+    conn = sqlite3.connect(args.db)
+    client = OllamaClient(
+        args.url, args.model, timeout=ENRICH_TIMEOUT, retries=ENRICH_RETRIES,
+        max_output_tokens=ENRICH_MAX_OUTPUT_TOKENS, call_budget=ENRICH_CALL_BUDGET, max_keywords=ENRICH_MAX_KEYWORDS,
+    )
+    stats = enrich(conn, client, workers=args.workers, batch_size=args.batch_size, limit=args.limit)
     conn.close()
-    print("🏁 Готово! База обновлена.")
+    print(f"🏁 Готово! Обновлено: {stats['updated']}, без изменений: {stats['unchanged']}, ошибок: {stats['failed']}, "
+          f"ответов из кэша LLM: {stats['cache_hits']}")
+    reasons = stats["stop_reasons"]
+    print(f"📊 Вызовов LLM: {sum(reasons.values())}, остановлено досрочно: {reasons['early_stop']}, "
+          f"обрезано по бюджету: {reasons['max_tokens'] + reasons['timeout']}, ошибок: {reasons['error']}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
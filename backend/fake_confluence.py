@@ -0,0 +1,204 @@
+"""
+Локальный фейковый Confluence для проверки синхронизации без сети.
+
+Отдает ровно то, что использует knowledge_base.sync_confluence_content:
+  GET .../content/{id}            - страница (body.storage только при expand=body.storage)
+  GET .../content?spaceKey&title  - поиск страницы по заголовку
+  GET .../space/{key}?expand=homepage
+
+Умеет задержку на запрос и случайные 429/503 - чтобы мерить пропускную способность и ретраи:
+    python fake_confluence.py --pages 300 --latency 0.05 --fail-rate 0.1 --workers 16
+"""
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeConfluence:
+    def __init__(self, pages=None, spaces=None, latency=0.0, fail_rate=0.0, seed=None):
+        # pages: {page_id: {"title", "space", "body", "version"}}, spaces: {key: homepage_id}
+        self.pages = pages or {}
+        self.spaces = spaces or {}
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.requests = Counter()
+        self.bytes_sent = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @classmethod
+    def generate(cls, count, **kwargs):
+        pages = {
+            str(1000 + i): {
+                "title": f"Система {i}",
+                "space": f"SP{i % 10}",
+                "body": f"<p>Документация системы {i}: зачисление в детские сады, <b>питание</b>.</p>",
+                "version": 1,
+            }
+            for i in range(count)
+        }
+        spaces = {f"SP{i}": str(1000 + i) for i in range(min(count, 10))}
+        return cls(pages=pages, spaces=spaces, **kwargs)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._handle(self)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _page_json(self, page_id, expand):
+        page = self.pages[page_id]
+        data = {
+            "id": page_id,
+            "type": "page",
+            "title": page["title"],
+            "space": {"key": page["space"]},
+            "version": {"number": page["version"]},
+        }
+        if "body.storage" in expand:
+            data["body"] = {"storage": {"value": page["body"], "representation": "storage"}}
+        return data
+
+    def _route(self, path, params):
+        expand = params.get("expand", "")
+        match = re.search(r"/content/(\d+)$", path)
+        if match:
+            if match.group(1) not in self.pages:
+                return 404, {"message": "No content found"}
+            return 200, self._page_json(match.group(1), expand)
+
+        if re.search(r"/content/?$", path):
+            found = [
+                self._page_json(page_id, expand)
+                for page_id, page in self.pages.items()
+                if page["space"] == params.get("spaceKey") and page["title"] == params.get("title")
+            ]
+            return 200, {"results": found, "size": len(found)}
+
+        match = re.search(r"/space/([^/]+)$", path)
+        if match:
+            key = match.group(1)
+            if key not in self.spaces:
+                return 404, {"message": "No space found"}
+            return 200, {"key": key, "homepage": {"id": self.spaces[key]}}
+
+        return 404, {"message": "Unknown endpoint"}
+
+    def _handle(self, handler):
+        parsed = urllib.parse.urlparse(handler.path)
+        params = dict(urllib.parse.parse_qsl(parsed.query))
+        with self._lock:
+            self.requests[parsed.path] += 1
+            fail = self._random.random() < self.fail_rate
+            status_code = self._random.choice((429, 503)) if fail else None
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        headers = {}
+        if status_code:
+            body = {"message": "Rate limited" if status_code == 429 else "Service unavailable"}
+            if status_code == 429:
+                headers["Retry-After"] = "0"
+        else:
+            status_code, body = self._route(parsed.path, params)
+
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            self.bytes_sent += len(payload)
+        handler.send_response(status_code)
+        handler.send_header("Content-Type", "application/json;charset=UTF-8")
+        handler.send_header("Content-Length", str(len(payload)))
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+
+def _seed_db(db_path, fake):
+    from knowledge_base import SystemKnowledgeBase
+
+    kb = SystemKnowledgeBase(db_path)
+    rows = []
+    for i, (page_id, page) in enumerate(fake.pages.items()):
+        # Ссылки всех трех видов, которые разбирает get_page_content
+        if i % 3 == 0:
+            url = f"{fake.url}/pages/viewpage.action?pageId={page_id}"
+        elif i % 3 == 1:
+            url = f"{fake.url}/display/{page['space']}/{urllib.parse.quote(page['title'])}"
+        else:
+            url = f"{fake.url}/spaces/{page['space']}/overview"
+        rows.append((page["title"], "В эксплуатации", None, None, None, None, url, None, None))
+    kb.upsert_systems(rows)
+    return kb
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Прогон sync_confluence_content против фейкового Confluence")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--fail-rate", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate-limit", type=float, default=200.0)
+    args = parser.parse_args()
+
+    with FakeConfluence.generate(args.pages, latency=args.latency, fail_rate=args.fail_rate, seed=42) as fake:
+        with tempfile.TemporaryDirectory() as tmp:
+            kb = _seed_db(os.path.join(tmp, "systems_kb.db"), fake)
+
+            # Первый прогон качает все, второй (после правки одной страницы) - только метаданные
+            for run in ("полная", "инкрементальная"):
+                requests_before, bytes_before = sum(fake.requests.values()), fake.bytes_sent
+                started = time.perf_counter()
+                changed = kb.sync_confluence_content(
+                    fake.url, "user", "token", workers=args.workers, rate_limit=args.rate_limit
+                )
+                elapsed = time.perf_counter() - started
+                filled = kb.conn.execute("SELECT COUNT(*) FROM system_documents WHERE kind = 'wiki'").fetchone()[0]
+
+                print(f"[{run}] страниц: {args.pages}, workers: {args.workers}, время: {elapsed:.2f} с")
+                print(f"[{run}] изменено: {len(changed)}, с контентом: {filled}, "
+                      f"HTTP-запросов: {sum(fake.requests.values()) - requests_before}, "
+                      f"передано: {(fake.bytes_sent - bytes_before) / 1024:.1f} КБ")
+
+                page = next(iter(fake.pages.values()))
+                page["body"] += "<p>Правка</p>"
+                page["version"] += 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Локальный фейковый Ollama для проверки AI-обогащения без GPU и сети.
+
+Отдает POST /api/generate: в ответе - "ключевые слова", собранные из названия системы в промпте,
+а за ними, как любят большие модели, абзац пояснений. При "stream": true ответ идет NDJSON
+по токену (слову), с учетом options.num_predict.
+Умеет задержку до первого токена и между токенами, ограничение одновременных генераций
+(как OLLAMA_NUM_PARALLEL) и случайные 503 - чтобы мерить TTFT, пропускную способность,
+досрочную остановку, ретраи и продолжение после прерывания:
+    python fake_ollama.py --systems 100 --latency 0.2 --token-latency 0.005 --parallel 4 --workers 4
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllama:
+    def __init__(self, latency=0.0, token_latency=0.0, parallel=1, fail_rate=0.0, seed=None):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.fail_rate = fail_rate
+        self.requests = Counter()
+        self.tokens_sent = 0
+        self._slots = threading.Semaphore(parallel)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/generate"
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                fake._handle(self)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @staticmethod
+    def keywords_for(prompt):
+        match = re.search(r'к системе "([^"]+)"', prompt)
+        name = match.group(1) if match else "система"
+        return (
+            f"{name}, {name.lower()} онлайн, зачисление, родители, учителя\n\n"
+            "Пояснение: " + "эти ключевые слова описывают основные функции и пользователей системы. " * 20
+        )
+
+    def _send(self, handler, status_code, body):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        handler.send_response(status_code)
+        handler.send_header("Content-Type", "application/json; charset=utf-8")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def _handle(self, handler):
+        if handler.path != "/api/generate":
+            return self._send(handler, 404, {"error": "not found"})
+        length = int(handler.headers.get("Content-Length") or 0)
+        request = json.loads(handler.rfile.read(length) or b"{}")
+        with self._lock:
+            self.requests[request.get("model")] += 1
+            fail = self._random.random() < self.fail_rate
+        if fail:
+            return self._send(handler, 503, {"error": "server busy"})
+
+        text = self.keywords_for(request.get("prompt", ""))
+        tokens = re.findall(r"\S+\s*", text)
+        num_predict = (request.get("options") or {}).get("num_predict")
+        done_reason = "stop"
+        if num_predict and len(tokens) > num_predict:
+            tokens, done_reason = tokens[:num_predict], "length"
+
+        # Генерации сверх parallel ждут своей очереди, как в настоящем Ollama
+        with self._slots:
+            if self.latency:
+                time.sleep(self.latency)
+            if not request.get("stream", True):
+                time.sleep(self.token_latency * len(tokens))
+                return self._send(handler, 200, {
+                    "model": request.get("model"), "response": "".join(tokens),
+                    "done": True, "done_reason": done_reason, "eval_count": len(tokens),
+                })
+            self._stream(handler, request.get("model"), tokens, done_reason)
+
+    def _stream(self, handler, model, tokens, done_reason):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def write(obj):
+            line = json.dumps(obj, ensure_ascii=False).encode("utf-8") + b"\n"
+            handler.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            handler.wfile.flush()
+
+        started = time.perf_counter()
+        try:
+            for token in tokens:
+                if self.token_latency:
+                    time.sleep(self.token_latency)
+                write({"model": model, "response": token, "done": False})
+                with self._lock:
+                    self.tokens_sent += 1
+            write({
+                "model": model, "response": "", "done": True, "done_reason": done_reason,
+                "prompt_eval_count": 100, "eval_count": len(tokens),
+                "eval_duration": int((time.perf_counter() - started) * 1e9),
+            })
+            handler.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Клиент оборвал генерацию (досрочная остановка) - как и Ollama, просто прекращаем
+            pass
+
+
+def _seed_db(db_path, count):
+    from knowledge_base import SystemKnowledgeBase
+    from app.db.documents import WIKI, put_document
+
+    kb = SystemKnowledgeBase(db_path)
+    kb.upsert_systems([
+        (f"Система {i}", "В эксплуатации", None, None, None, None, None, None, None) for i in range(count)
+    ])
+    cursor = kb.conn.cursor()
+    for (sys_id,) in cursor.execute("SELECT id FROM systems").fetchall():
+        text = f"<p>Документация системы {sys_id}: зачисление в детские сады.</p>"
+        if sys_id % 10 == 0:
+            # Длинные страницы - несколько частей по бюджету токенов
+            text *= 300
+        put_document(cursor, sys_id, WIKI, text)
+    kb.conn.commit()
+    kb.conn.close()
+
+
+def main():
+    from enrich_with_ai import enrich
+    from app.db.documents import WIKI, get_document, put_document
+    from app.services.enrichment import OllamaClient
+
+    parser = argparse.ArgumentParser(description="Прогон enrich_with_ai против фейкового Ollama")
+    parser.add_argument("--systems", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--token-latency", type=float, default=0.002)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--fail-rate", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with FakeOllama(latency=args.latency, token_latency=args.token_latency, parallel=args.parallel,
+                    fail_rate=args.fail_rate, seed=42) as fake:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "systems_kb.db")
+            _seed_db(db_path, args.systems)
+            client = OllamaClient(fake.url, "fake", timeout=10, retries=2, backoff=0.05)
+
+            # Первый прогон прерывается на половине (limit), второй продолжает, третий - пустой.
+            # Четвертый - после сброса ai_source_hash у всех и правки конца одной длинной страницы:
+            # из кэша LLM берутся все ответы, кроме измененной части
+            runs = (("прерванный", args.systems // 2), ("продолжение", None), ("повторный", None), ("после правки", None))
+            for run, limit in runs:
+                conn = sqlite3.connect(db_path)
+                if run == "после правки":
+                    put_document(conn.cursor(), 10, WIKI, get_document(conn.cursor(), 10, WIKI) + " Новый раздел.")
+                    conn.execute("UPDATE systems SET ai_source_hash = NULL")
+                    conn.commit()
+                requests_before, tokens_before = sum(fake.requests.values()), fake.tokens_sent
+                started = time.perf_counter()
+                stats = enrich(conn, client, workers=args.workers, batch_size=10, limit=limit, chunk_tokens=1000)
+                elapsed = time.perf_counter() - started
+                enriched = conn.execute("SELECT COUNT(*) FROM systems WHERE ai_source_hash IS NOT NULL").fetchone()[0]
+                conn.close()
+                print(f"[{run}] время: {elapsed:.2f} с, обновлено: {stats['updated']}, ошибок: {stats['failed']}, "
+                      f"обогащено всего: {enriched}/{args.systems}, "
+                      f"запросов к LLM: {sum(fake.requests.values()) - requests_before}, "
+                      f"из кэша: {stats['cache_hits']}, токенов: {fake.tokens_sent - tokens_before}, "
+                      f"остановок: {dict(stats['stop_reasons'])}")
+
+            conn = sqlite3.connect(db_path)
+            calls, ttft, rate = conn.execute(
+                "SELECT COUNT(*), AVG(ttft_ms), AVG(tokens_per_s) FROM llm_call_metrics WHERE stop_reason != 'error'"
+            ).fetchone()
+            conn.close()
+            print(f"llm_call_metrics: {calls} вызовов, TTFT {ttft:.0f} мс, {rate:.0f} ток/с")
+
+
+if __name__ == "__main__":
+    main()
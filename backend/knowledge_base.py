@@ -1,54 +1,56 @@
 import pandas as pd
 import sqlite3
 import ftfy
-import urllib.parse
-import re
+import requests
+from requests.adapters import HTTPAdapter
 from atlassian import Confluence
-from rapidfuzz import fuzz
 import logging
-import pymorphy2
+import time
+from concurrent.futures import ProcessPoolExecutor
+from app.utils.text import fix_encoding_series, preprocess_text
+from app.config import (
+    CONFLUENCE_RATE_LIMIT, CONFLUENCE_SYNC_BATCH, CONFLUENCE_SYNC_WORKERS, WIKI_URL_CACHE_TTL_DAYS,
+)
+from app.services.confluence_sync import ConfluenceSyncer, get_page_content
+from app.db.schema import (
+    CHANGE_SYSTEM, CHANGE_WIKI, content_hash, log_changes, migrate,
+)
+from app.db.documents import WIKI, get_document, get_document_hashes, get_documents, put_document
+from app.db.batching import chunked
+from app.db.keywords import get_keywords
+from app.services import search_engine
 
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Колонка в таблице systems -> колонка в объединенном CSV (systems + contacts)
+CSV_COLUMNS = {
+    'product_name': 'Продукт',
+    'status': 'Статус',
+    'owner_name': 'Владелец',
+    'owner_email': 'Email',
+    'owner_telegram': 'Telegram',
+    'description': 'Назначение',
+    'wiki_url': 'Wiki',
+    'jira_url': 'Jira',
+    'repo_url': 'Repo',
+}
+SYSTEM_COLUMNS = tuple(CSV_COLUMNS)
+
 class SystemKnowledgeBase:
     def __init__(self, db_path="systems_kb.db"):
         self.db_path = db_path
         self.conn = sqlite3.connect(self.db_path)
         self._init_db()
 
-        # --- НАСТРОЙКИ ДЛЯ УМНОГО ПОИСКА ---
-        self.morph = pymorphy2.MorphAnalyzer()
-
-        
-        # 1. Стоп-слова (шум, который нужно игнорировать)
-        self.stop_words = {
-            'система', 'сервис', 'продукт', 'приложение', 'веб', 'для', 'на', 'в', 'и', 
-            'или', 'по', 'с', 'от', 'как', 'это', 'предназначен', 'автоматизации', 
-            'обеспечения', 'реализации', 'функций', 'процессов', 'аис', 'гис', 'егис'
-        }
-
-        # 2. Синонимы (что ищут -> как это может быть записано официально)
-        self.synonyms = {
-            "сад": "доу дошкольное",
-            "садик": "доу дошкольное",
-            "школа": "оу сош общее образование",
-            "колледж": "спо профтех",
-            "вуз": "впо высшее",
-            "кружок": "удо дополнительное",
-            "секция": "удо дополнительное",
-            "еда": "питание",
-            "проход": "скуд турникет",
-            "ученик": "обучающийся учащийся",
-        }
-        
     def _init_db(self):
         cursor = self.conn.cursor()
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS systems (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 product_name TEXT,
+                product_code TEXT,
                 status TEXT,
                 owner_name TEXT,
                 owner_email TEXT,
@@ -58,17 +60,21 @@ class SystemKnowledgeBase:
                 jira_url TEXT,
                 repo_url TEXT,
                 wiki_content TEXT,
-                ai_keywords TEXT  -- <--- НОВАЯ КОЛОНКА
+                ai_keywords TEXT,  -- <--- НОВАЯ КОЛОНКА
+                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
         
-        try:
-            cursor.execute("ALTER TABLE systems ADD COLUMN ai_keywords TEXT")
-        except sqlite3.OperationalError:
-            pass
-            
+        for column in ("ai_keywords TEXT", "product_code TEXT", "last_updated TIMESTAMP"):
+            try:
+                cursor.execute(f"ALTER TABLE systems ADD COLUMN {column}")
+            except sqlite3.OperationalError:
+                pass
+
+        # В т.ч. уникальный индекс по product_name для ON CONFLICT в _upsert_rows
+        migrate(self.conn)
         self.conn.commit()
-        
+
     def get_user(self, username):
         cursor = self.conn.cursor()
         cursor.execute("SELECT username, hashed_password FROM users WHERE username = ?", (username,))
@@ -89,249 +95,283 @@ class SystemKnowledgeBase:
         return ftfy.fix_text(str(text))
 
     def preprocess_text(self, text, expand_synonyms=True):
-        """
-        Теперь метод умеет работать в двух режимах:
-        1. expand_synonyms=True: Возвращает строку ТОЛЬКО из синонимов (если они есть).
-        2. expand_synonyms=False: Возвращает просто очищенный текст (лемматизированный).
-        """
-        if not text: return ""
-        
-        text = str(text).lower()
-        text = re.sub(r'<[^>]+>', ' ', text)
-        text = re.sub(r'[^\w\s]', ' ', text)
-        
-        words = text.split()
-        result_words = []
-        
-        for word in words:
-            if word in self.stop_words or len(word) < 2: continue
-            
-            # Лемматизация
-            parses = self.morph.parse(word)
-            normal_forms = set(p.normal_form for p in parses)
-            
-            # Поиск синонимов
-            synonyms_found = []
-            for nf in normal_forms:
-                if nf in self.synonyms:
-                    synonyms_found.append(self.synonyms[nf])
-            
-            if expand_synonyms:
-                # Если нужны синонимы - возвращаем ИХ
-                if synonyms_found:
-                    result_words.extend(synonyms_found)
-                else:
-                    # Если синонимов нет, оставляем исходное слово (нормализованное)
-                    result_words.append(parses[0].normal_form)
-            else:
-                # Если синонимы НЕ нужны - возвращаем просто слово
-                result_words.append(word)
-                
-        return " ".join(list(dict.fromkeys(result_words)))
-    
-    def load_data_from_csv(self, systems_csv_path, contacts_csv_path):
-        """Загружает, чистит, убирает дубли и объединяет данные."""
-        logging.info("Загрузка данных из CSV...")
-        
-        df_systems = pd.read_csv(systems_csv_path)
-        df_contacts = pd.read_csv(contacts_csv_path)
+        """Общая нормализация текста (стоп-слова, леммы, синонимы) из app.utils.text."""
+        return preprocess_text(text, expand_synonyms=expand_synonyms)
 
-        # Исправляем кодировку
-        df_systems.columns = [self.fix_encoding(col) for col in df_systems.columns]
+    def _read_contacts(self, contacts_csv_path, pool=None):
+        """Справочник контактов небольшой - читаем целиком и держим в памяти для join."""
+        df_contacts = pd.read_csv(contacts_csv_path, dtype=str)
         df_contacts.columns = [self.fix_encoding(col) for col in df_contacts.columns]
-
-        for col in df_systems.columns:
-            df_systems[col] = df_systems[col].apply(self.fix_encoding)
         for col in df_contacts.columns:
-            df_contacts[col] = df_contacts[col].apply(self.fix_encoding)
+            df_contacts[col] = fix_encoding_series(df_contacts[col], pool)
 
-        # Нормализация имен
-        df_systems['Владелец'] = df_systems['Владелец'].str.strip()
         df_contacts['Name'] = df_contacts['Name'].str.strip()
 
         # --- УДАЛЕНИЕ ДУБЛЕЙ (Ваш код) ---
         initial_contacts_count = len(df_contacts)
         df_contacts = df_contacts.drop_duplicates(subset=['Name'], keep='first')
         logging.info(f"Контакты: было {initial_contacts_count}, стало {len(df_contacts)}")
+        return df_contacts
 
-        initial_systems_count = len(df_systems)
-        df_systems = df_systems.drop_duplicates(subset=['Продукт'], keep='first')
-        logging.info(f"Системы: было {initial_systems_count}, стало {len(df_systems)}")
-
-        # Объединение
-        merged_df = pd.merge(
-            df_systems, 
-            df_contacts, 
-            left_on='Владелец', 
-            right_on='Name', 
-            how='left'
+    def load_data_from_csv(self, systems_csv_path, contacts_csv_path, chunksize=5000, encoding_workers=0,
+                           progress=None):
+        """
+        Загружает, чистит, убирает дубли и объединяет данные.
+        systems_csv читается потоково по chunksize строк, поэтому память не растет с размером выгрузки.
+        encoding_workers > 0 - починка кодировки (ftfy) в пуле из стольких процессов.
+        progress(rows_done) вызывается после каждого чанка; исключение из него откатывает весь импорт.
+        """
+        logging.info("Загрузка данных из CSV...")
+        started = time.perf_counter()
+        stats = {"inserted": 0, "updated": 0, "unchanged": 0, "changed_ids": []}
+        seen_products = set()
+        total_rows = 0
+
+        pool = ProcessPoolExecutor(max_workers=encoding_workers) if encoding_workers > 0 else None
+        try:
+            df_contacts = self._read_contacts(contacts_csv_path, pool)
+            cursor = self.conn.cursor()
+
+            with self.conn:
+                for df_systems in pd.read_csv(systems_csv_path, dtype=str, chunksize=chunksize):
+                    # Исправляем кодировку
+                    df_systems.columns = [self.fix_encoding(col) for col in df_systems.columns]
+                    for col in df_systems.columns:
+                        df_systems[col] = fix_encoding_series(df_systems[col], pool)
+
+                    # Нормализация имен
+                    df_systems['Владелец'] = df_systems['Владелец'].str.strip()
+
+                    # Дубли по продукту убираем с учетом уже прочитанных чанков (keep='first')
+                    total_rows += len(df_systems)
+                    df_systems = df_systems.drop_duplicates(subset=['Продукт'], keep='first')
+                    df_systems = df_systems[~df_systems['Продукт'].isin(seen_products)]
+                    seen_products.update(df_systems['Продукт'])
+
+                    # Объединение
+                    merged_df = pd.merge(
+                        df_systems, 
+                        df_contacts, 
+                        left_on='Владелец', 
+                        right_on='Name', 
+                        how='left'
+                    )
+
+                    # Сохранение в БД set-based upsert (wiki_content и ai_keywords не затираются)
+                    self._upsert_rows(cursor, self._rows_from_df(merged_df), stats)
+
+                    elapsed = time.perf_counter() - started
+                    logging.info(
+                        f"Обработано строк: {total_rows} ({total_rows / elapsed:.0f} строк/с), "
+                        f"уникальных систем: {len(seen_products)}"
+                    )
+                    if progress is not None:
+                        progress(total_rows)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        logging.info(f"Системы: было {total_rows}, стало {len(seen_products)}")
+        logging.info(
+            f"Данные успешно обновлены в БД за {time.perf_counter() - started:.1f} с: "
+            f"добавлено {stats['inserted']}, обновлено {stats['updated']}, без изменений {stats['unchanged']}."
         )
+        return stats
 
-        logging.info(f"Итоговое количество записей: {len(merged_df)}")
+    @staticmethod
+    def _rows_from_df(df):
+        """Строки DataFrame -> кортежи в порядке SYSTEM_COLUMNS (NaN -> None)."""
+        frame = df.reindex(columns=list(CSV_COLUMNS.values()))
+        frame = frame.astype(object).where(frame.notna(), None)
+        return list(frame.itertuples(index=False, name=None))
 
-        # Сохранение в БД с проверкой существования (чтобы не затереть wiki_content)
-        cursor = self.conn.cursor()
-        
-        for _, row in merged_df.iterrows():
-            product_name = row.get('Продукт')
-            
-            cursor.execute("SELECT id FROM systems WHERE product_name = ?", (product_name,))
-            existing = cursor.fetchone()
-            
-            if existing:
-                sys_id = existing[0]
-                cursor.execute('''
-                    UPDATE systems SET 
-                        status=?, owner_name=?, owner_email=?, owner_telegram=?,
-                        description=?, wiki_url=?, jira_url=?, repo_url=?, last_updated=CURRENT_TIMESTAMP
-                    WHERE id=?
-                ''', (
-                    row.get('Статус'), row.get('Владелец'), row.get('Email'), row.get('Telegram'),
-                    row.get('Назначение'), row.get('Wiki'), row.get('Jira'), row.get('Repo'), sys_id
-                ))
+    def _fetch_existing(self, cursor, product_names):
+        """
+        Текущее состояние систем по product_name (точечные выборки по уникальному индексу).
+        Возвращает {product_name: (id, content_hash)}; для старых строк без хэша он считается по колонкам.
+        """
+        existing = {}
+        for chunk in chunked(product_names):
+            cursor.execute(
+                f"SELECT id, content_hash, {', '.join(SYSTEM_COLUMNS)} FROM systems "
+                f"WHERE product_name IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for sys_id, stored_hash, *columns in cursor.fetchall():
+                existing[columns[0]] = (sys_id, stored_hash or content_hash(*columns), stored_hash is None)
+        return existing
+
+    def _upsert_rows(self, cursor, rows, stats):
+        """
+        Upsert пачки строк без коммита. Строки с неизменным content_hash не трогаем
+        (last_updated не сдвигается), остальные пишем одним executemany
+        с INSERT ... ON CONFLICT DO UPDATE и фиксируем в system_changes.
+        """
+        existing = self._fetch_existing(cursor, [row[0] for row in rows])
+
+        changed, changed_ids, inserted_names, backfill = [], [], [], []
+        for row in rows:
+            row_hash = content_hash(*row)
+            current = existing.get(row[0])
+            if current is None:
+                stats["inserted"] += 1
+                inserted_names.append(row[0])
+            elif current[1] == row_hash:
+                stats["unchanged"] += 1
+                if current[2]:
+                    backfill.append((row_hash, current[0]))
+                continue
             else:
-                cursor.execute('''
-                    INSERT INTO systems (
-                        product_name, status, owner_name, owner_email, owner_telegram,
-                        description, wiki_url, jira_url, repo_url
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    product_name, row.get('Статус'), row.get('Владелец'), row.get('Email'), row.get('Telegram'),
-                    row.get('Назначение'), row.get('Wiki'), row.get('Jira'), row.get('Repo')
-                ))
-        
-        self.conn.commit()
-        logging.info("Данные успешно обновлены в БД.")
+                stats["updated"] += 1
+                changed_ids.append(current[0])
+            changed.append(row + (row_hash,))
+
+        update_set = ", ".join(f"{col}=excluded.{col}" for col in SYSTEM_COLUMNS[1:] + ("content_hash",))
+        cursor.executemany(f'''
+            INSERT INTO systems ({', '.join(SYSTEM_COLUMNS)}, content_hash, last_updated)
+            VALUES ({', '.join('?' * (len(SYSTEM_COLUMNS) + 1))}, CURRENT_TIMESTAMP)
+            ON CONFLICT(product_name) DO UPDATE SET {update_set}, last_updated=CURRENT_TIMESTAMP
+        ''', changed)
+        # Строки, загруженные до появления content_hash: проставляем хэш без сдвига last_updated
+        cursor.executemany("UPDATE systems SET content_hash = ? WHERE id = ?", backfill)
+
+        if inserted_names:
+            changed_ids.extend(sys_id for sys_id, _, _ in self._fetch_existing(cursor, inserted_names).values())
+        log_changes(cursor, changed_ids, CHANGE_SYSTEM)
+        stats["changed_ids"].extend(changed_ids)
+
+    def upsert_systems(self, rows):
+        """
+        Bulk upsert систем по product_name в одной транзакции.
+        rows - кортежи в порядке SYSTEM_COLUMNS. Возвращает счетчики inserted/updated/unchanged
+        и changed_ids - id систем, записанных в system_changes.
+        """
+        stats = {"inserted": 0, "updated": 0, "unchanged": 0, "changed_ids": []}
+        with self.conn:
+            self._upsert_rows(self.conn.cursor(), rows, stats)
+        return stats
 
     def get_page_content(self, confluence, url):
         """Ваш метод для получения контента по разным типам ссылок."""
-        decoded_url = urllib.parse.unquote(url)
-    
-        def get_homepage_by_space_key(key):
-            try:
-                space_info = confluence.get_space(key, expand='homepage')
-                if space_info and 'homepage' in space_info:
-                    return confluence.get_page_by_id(space_info['homepage']['id'], expand='body.storage')
-            except Exception:
-                pass
-            return None
+        return get_page_content(confluence, url)
 
-        # Логика определения типа ссылки
-        match_id = re.search(r'pageId=(\d+)', url)
-        if match_id:
-            return confluence.get_page_by_id(match_id.group(1), expand='body.storage')
-
-        match_display_page = re.search(r'/display/([^/]+)/([^/?#]+)', decoded_url)
-        if match_display_page:
-            return confluence.get_page_by_title(match_display_page.group(1), match_display_page.group(2).replace('+', ' '), expand='body.storage')
-
-        match_overview = re.search(r'/spaces/([^/]+)/overview', decoded_url)
-        if match_overview:
-            return get_homepage_by_space_key(match_overview.group(1))
-
-        match_space_home = re.search(r'/display/([^/?#]+)/?$', decoded_url)
-        if match_space_home:
-            return get_homepage_by_space_key(match_space_home.group(1))
+    def sync_confluence_content(self, confluence_url, username, api_token,
+                                workers=CONFLUENCE_SYNC_WORKERS, rate_limit=CONFLUENCE_RATE_LIMIT,
+                                batch_size=CONFLUENCE_SYNC_BATCH, progress=None,
+                                url_cache_ttl_days=WIKI_URL_CACHE_TTL_DAYS):
+        """
+        Скачивает страницы Confluence в workers потоков (не больше rate_limit запросов/с на хост,
+        повторы на 429/5xx). Тело страницы качается только при смене версии в Confluence.
+        Запись в БД - пачками по batch_size из текущего потока.
+        Ссылки из wiki_url_cache старше url_cache_ttl_days дней разрешаются заново.
+        progress(done, total) вызывается после каждой страницы; если он бросит исключение,
+        синхронизация остановится, а уже полученные страницы сохранятся.
+        """
+        logging.info("Начало синхронизации с Confluence...")
 
-        return None
+        def make_client():
+            # Свой Session на поток: keep-alive соединения переиспользуются между запросами
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            return Confluence(url=confluence_url, username=username, token=api_token, cloud=False, session=session)
 
-    def sync_confluence_content(self, confluence_url, username, api_token):
-        logging.info("Начало синхронизации с Confluence...")
-        
         try:
-            confluence = Confluence(url=confluence_url, username=username, token=api_token, cloud=False)
+            make_client()
         except Exception as e:
             logging.error(f"Ошибка подключения к Confluence: {e}")
             return
 
         cursor = self.conn.cursor()
-        cursor.execute("SELECT id, wiki_url FROM systems WHERE wiki_url LIKE '%http%'")
+        cursor.execute('''
+            SELECT id, wiki_url, wiki_page_id, wiki_version
+            FROM systems WHERE wiki_url LIKE '%http%'
+        ''')
         rows = cursor.fetchall()
+        wiki_hashes = get_document_hashes(cursor, [row[0] for row in rows], WIKI)
+        stored = {sys_id: (wiki_hashes.get(sys_id), page_id, version) for sys_id, _, page_id, version in rows}
+        cursor.execute(
+            "SELECT url, page_id FROM wiki_url_cache WHERE resolved_at > datetime('now', ?)",
+            (f"-{url_cache_ttl_days * 86400:.0f} seconds",),
+        )
+        url_cache = dict(cursor.fetchall())
+
+        changed_ids = []
+        pending = []
+
+        def flush():
+            for sys_id, url, result in pending:
+                if url_cache.get(url) != result["page_id"]:
+                    url_cache[url] = result["page_id"]
+                    cursor.execute(
+                        "INSERT OR REPLACE INTO wiki_url_cache (url, page_id, resolved_at) VALUES (?, ?, CURRENT_TIMESTAMP)",
+                        (url, result["page_id"]),
+                    )
+                wiki_hash, page_id, version = stored[sys_id]
+                if (page_id, version) != (result["page_id"], result["version"]):
+                    cursor.execute(
+                        "UPDATE systems SET wiki_page_id = ?, wiki_version = ? WHERE id = ?",
+                        (result["page_id"], result["version"], sys_id),
+                    )
+                if result["text"] is not None and self._store_wiki_content(cursor, sys_id, result["text"], wiki_hash):
+                    changed_ids.append(sys_id)
+            self.conn.commit()
+            pending.clear()
+
+        def on_result(sys_id, url, result, error):
+            if error is not None:
+                logging.warning(f"Не удалось скачать контент для {url}: {error}")
+                return
+            if result is not None:
+                pending.append((sys_id, url, result))
+                if len(pending) >= batch_size:
+                    flush()
+
+        syncer = ConfluenceSyncer(make_client, confluence_url, workers=workers, rate_limit=rate_limit)
+        try:
+            stats = syncer.run(
+                [(sys_id, url, url_cache.get(url), page_id, version)
+                 for sys_id, url, page_id, version in rows],
+                on_result,
+                progress,
+            )
+        finally:
+            flush()
 
-        for sys_id, url in rows:
-            try:
-                page_data = self.get_page_content(confluence, url)
-                if page_data and 'body' in page_data:
-                    raw_html = page_data['body']['storage']['value']
-                    # Очищаем HTML перед сохранением, чтобы не забивать поиск тегами
-                    clean_text = re.sub(r'<[^>]+>', ' ', raw_html)
-                    clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-                    
-                    cursor.execute("UPDATE systems SET wiki_content = ? WHERE id = ?", (clean_text, sys_id))
-                    logging.info(f"Обновлен контент для ID {sys_id}")
-            except Exception as e:
-                logging.warning(f"Не удалось скачать контент для {url}: {e}")
+        logging.info(
+            f"Синхронизация завершена за {stats['seconds']:.1f} с: страниц {stats['total']}, "
+            f"скачано тел {stats['bodies']}, ошибок {stats['failed']}, изменено {len(changed_ids)}"
+        )
+        return changed_ids
 
-        self.conn.commit()
-        logging.info("Синхронизация завершена.")
+    @staticmethod
+    def _store_wiki_content(cursor, sys_id, clean_text, stored_hash):
+        """Пишет текст страницы, только если он изменился. Возвращает True при записи."""
+        if not put_document(cursor, sys_id, WIKI, clean_text, stored_hash):
+            return False
+        log_changes(cursor, [sys_id], CHANGE_WIKI)
+        return True
     
     def get_system_wiki(self, sys_id):
-        """Возвращает текст Wiki для конкретной системы."""
+        """Возвращает (текст Wiki, название) для конкретной системы."""
         cursor = self.conn.cursor()
-        cursor.execute("SELECT wiki_content, product_name FROM systems WHERE id = ?", (sys_id,))
-        return cursor.fetchone()
+        cursor.execute("SELECT product_name FROM systems WHERE id = ?", (sys_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return get_document(cursor, sys_id, WIKI), row[0]
 
-    def fuzzy_search(self, query, limit=5):
-        df = pd.read_sql("SELECT * FROM systems", self.conn)
-        
-        # 1. Формируем ДВА варианта запроса
-        # Вариант А: То, что ввел юзер (очищенное) -> "кружки"
-        query_raw = self.preprocess_text(query, expand_synonyms=False)
-        
-        # Вариант Б: Синонимы -> "удо дополнительное"
-        query_synonyms = self.preprocess_text(query, expand_synonyms=True)
-        
-        logging.info(f"Raw: '{query_raw}' | Synonyms: '{query_synonyms}'")
-        
-        results = []
-        
-        for _, row in df.iterrows():
-            # Предобработка полей базы (без расширения синонимов, просто чистый текст)
-            clean_title = self.preprocess_text(row['product_name'], expand_synonyms=False)
-            clean_desc = self.preprocess_text(row['description'], expand_synonyms=False)
-            clean_wiki = self.preprocess_text(row['wiki_content'], expand_synonyms=False)
-            
-            # Сравниваем с RAW запросом ("кружки")
-            score_raw = max(
-                fuzz.token_set_ratio(query_raw, clean_title),
-                fuzz.token_set_ratio(query_raw, clean_desc)
-            )
-            
-            # Сравниваем с SYNONYMS запросом ("удо")
-            # Если синонимы отличаются от raw, считаем и их
-            score_syn = 0
-            if query_raw != query_synonyms:
-                score_syn = max(
-                    fuzz.token_set_ratio(query_synonyms, clean_title),
-                    fuzz.token_set_ratio(query_synonyms, clean_desc)
-                )
-            
-            # Берем МАКСИМАЛЬНЫЙ балл из двух стратегий
-            # То есть: если совпало по слову "кружки" - отлично.
-            # Если не совпало, но совпало по "УДО" - тоже отлично.
-            base_score = max(score_raw, score_syn)
-            
-            # Wiki учитываем с меньшим весом
-            wiki_score = 0
-            if clean_wiki:
-                wiki_score = fuzz.token_set_ratio(query_synonyms, clean_wiki) # Wiki лучше искать по синонимам
-            
-            # Итоговый балл
-            final_score = (base_score * 1.5) + (wiki_score * 0.5)
-            final_score = final_score / 2
-            
-            # Бонусы (статус и т.д.)
-            status = str(row['status']).lower()
-            if 'эксплуатации' in status or 'prod' in status:
-                final_score += 10
-            
-            if final_score > 45:
-                res = row.to_dict()
-                res['search_score'] = final_score
-                results.append(res)
-        
-        results.sort(key=lambda x: x['search_score'], reverse=True)
-        return results[:limit]
+    def fuzzy_search(self, query, limit=5, mode=None):
+        """
+        Поиск общим движком (app/services/search_engine.py). Индекс строится на каждый вызов -
+        для CLI и скриптов; API держит его в памяти (SearchService).
+        """
+        cursor = self.conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        rows = [dict(row) for row in cursor.execute("SELECT * FROM systems").fetchall()]
+        ids = [row['id'] for row in rows]
+        index = search_engine.build_index(rows, get_documents(cursor, ids, WIKI), get_keywords(cursor, ids))
+        return search_engine.search(index, query, limit=limit, mode=mode)
 
 # --- ПРИМЕР ИСПОЛЬЗОВАНИЯ ---
 
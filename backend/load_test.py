@@ -0,0 +1,321 @@
+"""
+Нагрузочный тест API без Traefik: сколько держит сам backend.
+
+Создает тестовых пользователей тем же путем, что create_user.py (имена и пароль случайные
+на каждый прогон), получает токены через /token и гоняет смесь /search, /systems/{code}/topics и логинов на нескольких уровнях конкурентности
+(закрытая модель: N виртуальных пользователей шлют запросы друг за другом без пауз).
+По каждому уровню - пропускная способность, перцентили задержки и доля ошибок; в конце -
+точка насыщения, после которой рост конкурентности уже не дает прироста rps.
+Созданные пользователи удаляются в конце прогона, в том числе при ошибке или Ctrl+C.
+
+Без --url поднимает локальный uvicorn search_service:app на свободном порту:
+    python load_test.py --concurrency 1,2,4,8,16,32 --duration 10 --mix search=70,topics=20,login=10
+Против уже запущенного сервиса (пользователи должны существовать):
+    python load_test.py --url http://localhost:8000 --skip-user-setup --user-prefix perf_ --password ...
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+# Запросы, похожие на реальные: разговорные названия, опечатки, аббревиатуры
+QUERIES = [
+    "запись в детский сад",
+    "электронный дневник",
+    "питание в школах",
+    "турникеты скуд",
+    "кружки и секции",
+    "зачисление в первый класс",
+    "расписание уроков",
+    "оценки ученика",
+    "электроный журнал",
+    "доу очередь",
+    "олимпиады школьников",
+    "библиотека учебников",
+    "оплата питания родителями",
+    "проход в школу по карте",
+    "колледж прием документов",
+    "дополнительное образование",
+    "мэш",
+    "егэ результаты",
+]
+FALLBACK_CODES = ["SYS-001", "SYS-002", "SYS-003"]
+
+DEFAULT_MIX = "search=70,topics=20,login=10"
+# Уровень считается насыщенным, если rps вырос меньше чем на 10% к лучшему предыдущему
+SATURATION_GAIN = 0.10
+# или ошибок больше 1%
+SATURATION_ERROR_RATE = 0.01
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in ("search", "topics", "login"):
+            raise argparse.ArgumentTypeError(f"неизвестный вид запроса: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def setup_users(usernames, password):
+    """
+    Тестовые пользователи через app.security.create_user (как create_user.py).
+    Возвращает (коды систем для /topics, созданные имена) - удалять только созданных.
+    """
+    from app.db.repository import SystemRepository
+    from app.security import create_user, pwd_context
+
+    repo = SystemRepository()
+    hashed_pw = pwd_context.hash(password)
+    created = [name for name in usernames if create_user(repo, name, hashed_pw)]
+    codes = [row[0] for row in repo.conn.execute(
+        "SELECT product_code FROM systems WHERE product_code IS NOT NULL LIMIT 500"
+    ).fetchall()]
+    repo.conn.close()
+    if len(created) != len(usernames):
+        cleanup_users(created)
+        raise RuntimeError("тестовые пользователи с такими именами уже существуют - задайте другой --user-prefix")
+    print(f"Создано пользователей: {len(created)}, кодов систем для /topics: {len(codes)}")
+    return codes, created
+
+
+def cleanup_users(usernames):
+    from app.db.repository import SystemRepository
+    from app.security import delete_users
+
+    repo = SystemRepository()
+    deleted = delete_users(repo, usernames)
+    repo.conn.close()
+    print(f"Удалено тестовых пользователей: {deleted}")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, ready_timeout):
+    """
+    uvicorn search_service:app в отдельном процессе; ждем /health/ready (конец прогрева).
+    Рабочий каталог - текущий, как у setup_users: сервис открывает ту же systems_kb.db.
+    """
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "search_service:app",
+         "--app-dir", os.path.dirname(os.path.abspath(__file__)),
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + ready_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn завершился с кодом {process.returncode}")
+        try:
+            if httpx.get(f"{url}/health/ready", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"сервис не стал готов за {ready_timeout} с")
+
+
+async def login(client, username, password):
+    return await client.post("/token", data={"username": username, "password": password})
+
+
+async def get_tokens(client, usernames, password):
+    responses = await asyncio.gather(*(login(client, name, password) for name in usernames))
+    tokens = {}
+    for name, response in zip(usernames, responses):
+        if response.status_code != 200:
+            raise RuntimeError(f"/token для {name}: {response.status_code} {response.text[:200]}")
+        tokens[name] = response.json()["access_token"]
+    return tokens
+
+
+class LevelStats:
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.latencies = defaultdict(list)
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.seconds = 0.0
+
+    def add(self, kind, latency, status):
+        self.latencies[kind].append(latency)
+        self.statuses[status] += 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors[kind] += 1
+
+    def summary(self):
+        everything = sorted(value for values in self.latencies.values() for value in values)
+        total = len(everything)
+        errors = sum(self.errors.values())
+
+        def latency_ms(values):
+            if not values:
+                return {}
+            result = {f"p{p}": round(percentile(values, p) * 1000, 1) for p in (50, 90, 95, 99)}
+            result["max"] = round(values[-1] * 1000, 1)
+            return result
+
+        return {
+            "concurrency": self.concurrency,
+            "requests": total,
+            "seconds": round(self.seconds, 2),
+            "rps": round(total / self.seconds, 1) if self.seconds else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "latency_ms": latency_ms(everything),
+            "by_kind": {
+                kind: {"requests": len(values), "errors": self.errors[kind], "latency_ms": latency_ms(sorted(values))}
+                for kind, values in self.latencies.items()
+            },
+            "statuses": {str(status): count for status, count in self.statuses.items()},
+        }
+
+
+async def virtual_user(client, name, tokens, password, codes, mix, deadline, stats, rng):
+    kinds, weights = zip(*mix.items())
+    while time.monotonic() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        headers = {"Authorization": f"Bearer {tokens[name]}"}
+        started = time.perf_counter()
+        try:
+            if kind == "search":
+                response = await client.get("/search", params={"q": rng.choice(QUERIES), "limit": 5}, headers=headers)
+            elif kind == "topics":
+                response = await client.get(f"/systems/{rng.choice(codes)}/topics", headers=headers)
+            else:
+                response = await login(client, name, password)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        stats.add(kind, time.perf_counter() - started, status)
+
+
+async def run_level(url, concurrency, duration, tokens, password, codes, mix, timeout, seed):
+    stats = LevelStats(concurrency)
+    names = list(tokens)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        started = time.monotonic()
+        deadline = started + duration
+        await asyncio.gather(*(
+            virtual_user(client, names[i % len(names)], tokens, password, codes, mix, deadline, stats,
+                         random.Random(seed + i))
+            for i in range(concurrency)
+        ))
+        stats.seconds = time.monotonic() - started
+    return stats.summary()
+
+
+def find_saturation(levels):
+    """Первый уровень, где rps почти не вырос (или посыпались ошибки): предыдущий - точка насыщения."""
+    best = None
+    for level in levels:
+        if level["error_rate"] > SATURATION_ERROR_RATE:
+            return best or level
+        if best is not None and level["rps"] < best["rps"] * (1 + SATURATION_GAIN):
+            return best
+        if best is None or level["rps"] > best["rps"]:
+            best = level
+    return None
+
+
+def print_level(level):
+    latency = level["latency_ms"]
+    print(f"  c={level['concurrency']:>3}  {level['rps']:>7.1f} rps  "
+          f"p50 {latency.get('p50', 0):>7.1f}  p95 {latency.get('p95', 0):>7.1f}  p99 {latency.get('p99', 0):>7.1f}  "
+          f"max {latency.get('max', 0):>7.1f} мс  ошибок {level['error_rate']:.2%}  ({level['requests']} запросов)")
+    for kind, stats in sorted(level["by_kind"].items()):
+        print(f"         {kind:<7} {stats['requests']:>6}  p95 {stats['latency_ms'].get('p95', 0):>7.1f} мс  "
+              f"ошибок {stats['errors']}")
+
+
+async def run(args, url, usernames, codes):
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout) as client:
+        tokens = await get_tokens(client, usernames, args.password)
+
+    levels = []
+    for concurrency in args.concurrency:
+        print(f"Уровень {concurrency} ({args.duration:.0f} с)...")
+        level = await run_level(url, concurrency, args.duration, tokens, args.password, codes or FALLBACK_CODES,
+                                args.mix, args.timeout, args.seed)
+        print_level(level)
+        levels.append(level)
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API поиска систем")
+    parser.add_argument("--url", default=None, help="адрес сервиса; без него поднимается локальный uvicorn")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32",
+                        type=lambda text: [int(part) for part in text.split(",")])
+    parser.add_argument("--duration", type=float, default=10.0, help="секунд на каждый уровень")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"по умолчанию {DEFAULT_MIX}")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--user-prefix", default=None, help="по умолчанию loadtest_<случайный суффикс>_")
+    parser.add_argument("--password", default=None, help="по умолчанию - случайный на прогон")
+    parser.add_argument("--skip-user-setup", action="store_true",
+                        help="пользователи уже созданы (create_user.py); нужны --user-prefix и --password")
+    parser.add_argument("--timeout", type=float, default=30.0, help="таймаут одного запроса")
+    parser.add_argument("--ready-timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", default=None, help="сохранить результаты в файл")
+    args = parser.parse_args()
+    if args.skip_user_setup and (args.user_prefix is None or args.password is None):
+        parser.error("с --skip-user-setup нужны --user-prefix и --password существующих пользователей")
+    prefix = args.user_prefix or f"loadtest_{secrets.token_hex(4)}_"
+    # Пароль нигде не печатается и не сохраняется: учетки живут только на время прогона
+    args.password = args.password or secrets.token_urlsafe(24)
+    usernames = [f"{prefix}{i}" for i in range(args.users)]
+
+    codes, created = ([], []) if args.skip_user_setup else setup_users(usernames, args.password)
+    server = None
+    try:
+        url = args.url
+        if url is None:
+            server, url = start_server(free_port(), args.ready_timeout)
+            print(f"Локальный сервис: {url}")
+        levels = asyncio.run(run(args, url, usernames, codes))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+        if created:
+            cleanup_users(created)
+
+    saturation = find_saturation(levels)
+    if saturation is None:
+        print("Насыщение не достигнуто - увеличьте --concurrency.")
+    else:
+        print(f"Точка насыщения: c={saturation['concurrency']}, {saturation['rps']} rps, "
+              f"p95 {saturation['latency_ms'].get('p95')} мс")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"mix": args.mix, "levels": levels, "saturation": saturation}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
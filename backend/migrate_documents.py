@@ -0,0 +1,35 @@
+"""
+Одноразовый перенос wiki_content / ai_keywords из таблицы systems в сжатую system_documents.
+
+Сам перенос делает migrate() при любом открытии БД; скрипт дополнительно
+делает VACUUM, чтобы освободить место, которое занимали тексты в systems:
+    python migrate_documents.py [путь к systems_kb.db]
+"""
+import os
+import sqlite3
+import sys
+from app.db.schema import migrate
+
+
+def main():
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "systems_kb.db"
+    if not os.path.exists(db_path):
+        print(f"Файл {db_path} не найден")
+        return
+
+    size_before = os.path.getsize(db_path)
+    conn = sqlite3.connect(db_path)
+    migrate(conn)
+
+    docs, raw_size, stored_size = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(LENGTH(body)), 0) FROM system_documents"
+    ).fetchone()
+    print(f"Документов в system_documents: {docs}, текст {raw_size / 1024:.0f} КБ -> сжато {stored_size / 1024:.0f} КБ")
+
+    conn.execute("VACUUM")
+    conn.close()
+    print(f"Размер БД: {size_before / 1024:.0f} КБ -> {os.path.getsize(db_path) / 1024:.0f} КБ")
+
+
+if __name__ == "__main__":
+    main()
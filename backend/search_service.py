@@ -1,16 +1,48 @@
+import time
+_import_started = time.perf_counter()
+
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routers import auth, search, systems
+from app.routers import admin, auth, health, jobs, search, systems
+from app.dependencies import get_job_manager, get_repository, get_search_service, get_topic_graph
+from app.services.warmup import WarmUp
+from app.utils.text import get_morph
+
+IMPORT_SECONDS = round(time.perf_counter() - _import_started, 3)
+
+# Пробный запрос прогревает кэши rapidfuzz/pymorphy2 и проверяет, что индекс отвечает
+WARMUP_QUERY = "запись в детский сад"
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.warmup = WarmUp([
+        ("dictionaries", get_morph),
+        ("database", get_repository),
+        ("search_index", lambda: get_search_service().refresh()),
+        ("topic_graph", get_topic_graph),
+        ("sample_query", lambda: get_search_service().fuzzy_search(WARMUP_QUERY, limit=1)),
+    ], import_seconds=IMPORT_SECONDS)
+    app.state.warmup.start()
+    # Фоновые задачи (синхронизация, импорт, обогащение) выполняются внутри сервиса
+    get_job_manager().start()
+    yield
+    get_job_manager().stop()
+    # В контейнер смонтирован только файл БД: переносим WAL в основной файл до остановки
+    get_repository().conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
 
-app = FastAPI(title="Unified Systems & Topics Service")
+app = FastAPI(title="Unified Systems & Topics Service", lifespan=lifespan)
 
 app.include_router(auth.router)
+app.include_router(health.router)
 app.include_router(search.router)
 app.include_router(systems.router)
+app.include_router(jobs.router)
+app.include_router(admin.router)
 
 @app.get("/")
 def read_root():
     return {"message": "Service is running"}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -6,9 +6,10 @@ import ftfy
 import urllib.parse
 import re
 from atlassian import Confluence
-from rapidfuzz import fuzz
 import logging
-import pymorphy2
+from app.db.keywords import normalize_keywords
+from app.services import search_engine
+from app.utils.text import preprocess_text
 
 # Импорты для FastAPI
 from fastapi import  FastAPI, Query, HTTPException, Depends, status
@@ -71,30 +72,6 @@ class SystemKnowledgeBase:
         self.db_path = db_path
         self.conn = sqlite3.connect(self.db_path, check_same_thread=False) # check_same_thread=False нужен для FastAPI
         self._init_db()
-
-        # --- НАСТРОЙКИ ДЛЯ УМНОГО ПОИСКА ---
-        self.morph = pymorphy2.MorphAnalyzer()
-        
-        # 1. Стоп-слова
-        self.stop_words = {
-            'система', 'сервис', 'продукт', 'приложение', 'веб', 'для', 'на', 'в', 'и', 
-            'или', 'по', 'с', 'от', 'как', 'это', 'предназначен', 'автоматизации', 
-            'обеспечения', 'реализации', 'функций', 'процессов', 'аис', 'гис', 'егис'
-        }
-
-        # 2. Синонимы
-        self.synonyms = {
-            "сад": "доу дошкольное",
-            "садик": "доу дошкольное",
-            "школа": "оу сош общее образование",
-            "колледж": "спо профтех",
-            "вуз": "впо высшее",
-            "кружок": "удо дополнительное",
-            "секция": "удо дополнительное",
-            "еда": "питание",
-            "проход": "скуд турникет",
-            "ученик": "обучающийся учащийся",
-        }
         
     def _init_db(self):
         cursor = self.conn.cursor()
@@ -155,39 +132,9 @@ class SystemKnowledgeBase:
         return ftfy.fix_text(str(text))
 
     def preprocess_text(self, text, expand_synonyms=True):
-        if not text: return ""
-        
-        text = str(text).lower()
-        text = re.sub(r'<[^>]+>', ' ', text)
-        text = re.sub(r'[^\w\s]', ' ', text)
-        
-        words = text.split()
-        result_words = []
-        
-        for word in words:
-            if word in self.stop_words or len(word) < 2: continue
-            
-            # Лемматизация
-            parses = self.morph.parse(word)
-            normal_form = parses[0].normal_form 
-            normal_forms = set(p.normal_form for p in parses)
-            
-            # Поиск синонимов
-            synonyms_found = []
-            for nf in normal_forms:
-                if nf in self.synonyms:
-                    synonyms_found.append(self.synonyms[nf])
-            
-            if expand_synonyms:
-                if synonyms_found:
-                    result_words.extend(synonyms_found)
-                else:
-                    result_words.append(normal_form)
-            else:
-                result_words.append(normal_form)
-                
-        return " ".join(list(dict.fromkeys(result_words)))
-    
+        """Общая нормализация текста из app.utils.text."""
+        return preprocess_text(text, expand_synonyms=expand_synonyms)
+
     def load_data_from_csv(self, systems_csv_path, contacts_csv_path):
         logging.info("Загрузка данных из CSV...")
         
@@ -312,60 +259,17 @@ class SystemKnowledgeBase:
         cursor.execute("SELECT wiki_content, product_name FROM systems WHERE id = ?", (sys_id,))
         return cursor.fetchone()
 
-    def fuzzy_search(self, query, limit=5):
+    def fuzzy_search(self, query, limit=5, mode=None):
+        """Поиск общим движком app/services/search_engine.py (тексты вики и ai_keywords здесь хранятся в systems)."""
         df = pd.read_sql("SELECT * FROM systems", self.conn)
-        
-        query_raw = self.preprocess_text(query, expand_synonyms=False)
-        query_synonyms = self.preprocess_text(query, expand_synonyms=True)
-        
-        logging.info(f"Raw: '{query_raw}' | Synonyms: '{query_synonyms}'")
-        
-        results = []
-        
-        for _, row in df.iterrows():
-            clean_title = self.preprocess_text(row['product_name'], expand_synonyms=False)
-            clean_desc = self.preprocess_text(row['description'], expand_synonyms=False)
-            clean_wiki = self.preprocess_text(row['wiki_content'], expand_synonyms=False)
-            
-            clean_ai = ""
-            if row['ai_keywords']:
-                clean_ai = self.preprocess_text(row['ai_keywords'], expand_synonyms=True)
-
-            score_raw = max(
-                fuzz.token_set_ratio(query_raw, clean_title),
-                fuzz.token_set_ratio(query_raw, clean_desc)
-            )
-            
-            score_syn = 0
-            if query_raw != query_synonyms:
-                score_syn = max(
-                    fuzz.token_set_ratio(query_synonyms, clean_title),
-                    fuzz.token_set_ratio(query_synonyms, clean_desc)
-                )
-            
-            base_score = max(score_raw, score_syn)
-            
-            wiki_score = 0
-            if clean_wiki:
-                wiki_score = fuzz.token_set_ratio(query_synonyms, clean_wiki)
-            
-            score_ai = 0
-            if clean_ai:
-                score_ai = fuzz.token_set_ratio(query_synonyms, clean_ai)
-            
-            final_score = (base_score * 0.5) + (score_ai * 0.3) + (wiki_score * 0.2)
-            
-            status = str(row['status']).lower()
-            if 'эксплуатации' in status or 'prod' in status:
-                final_score += 5 
-            
-            if final_score > 45:
-                res = row.to_dict()
-                res['search_score'] = final_score
-                results.append(res)
-        
-        results.sort(key=lambda x: x['search_score'], reverse=True)
-        return results[:limit]
+        rows = df.astype(object).where(df.notna(), None).to_dict('records')
+        wikis = {row['id']: row['wiki_content'] for row in rows}
+        keywords = {
+            row['id']: [(lemma, weight) for _, lemma, weight in normalize_keywords(row['ai_keywords'])]
+            for row in rows if row['ai_keywords']
+        }
+        index = search_engine.build_index(rows, wikis, keywords)
+        return search_engine.search(index, query, limit=limit, mode=mode)
 
 app = FastAPI(title="Unified Systems & Topics Service")
 
@@ -383,12 +287,14 @@ def read_root():
     return {"message": "Service is running. Available endpoints: /search, /systems/{code}/topics"}
 
 @app.get("/search")
-def search_systems(q: str, limit: int = 5, current_user: tuple = Depends(get_current_user)):
+def search_systems(q: str, limit: int = 5, mode: Optional[str] = None, current_user: tuple = Depends(get_current_user)):
     logger.info(f"User {current_user[0]} searching for: {q}")
     """
     Умный поиск по системам (fuzzy search).
     """
-    results = kb.fuzzy_search(q, limit=limit)
+    if mode is not None and mode not in search_engine.STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Unknown search mode. Available: {', '.join(search_engine.STRATEGIES)}")
+    results = kb.fuzzy_search(q, limit=limit, mode=mode)
     return results
 
 @app.post("/token", response_model=Token)
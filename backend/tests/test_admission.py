@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.dependencies import _acquire
+from app.services.admission import DEADLINE, QUEUE_FULL, TIMEOUT, USER_LIMIT, AdmissionClass
+
+
+def admission(concurrency=1, queue_size=10, deadline=10.0, per_user=5):
+    return AdmissionClass("test", concurrency, queue_size, deadline, per_user)
+
+
+async def settle():
+    """Дает ожидающим задачам дойти до следующего await."""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def assert_idle(cls):
+    assert (cls.in_flight, cls.queued, len(cls._waiting)) == (0, 0, 0)
+
+
+async def assert_rejected(cls, user, reason):
+    """Отказ доходит до клиента как 503 с Retry-After."""
+    with pytest.raises(HTTPException) as error:
+        await _acquire(cls, user)
+    assert error.value.status_code == 503
+    assert reason in error.value.detail
+    assert int(error.value.headers["Retry-After"]) >= 1
+    assert cls.rejected[reason] == 1
+
+
+def test_round_robin_between_users():
+    async def scenario():
+        cls = admission()
+        order = []
+
+        async def request(name, user):
+            started = await cls.acquire(user)
+            order.append(name)
+            await asyncio.sleep(0)
+            cls.release(started)
+
+        holder = await cls.acquire("holder")
+        # Пользователь a пришел с пачкой запросов раньше b
+        tasks = []
+        for name, user in (("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b"), ("b2", "b")):
+            tasks.append(asyncio.create_task(request(name, user)))
+            await settle()
+        assert cls.queued == 5
+
+        cls.release(holder)
+        await asyncio.gather(*tasks)
+        assert order == ["a1", "b1", "a2", "b2", "a3"]
+        assert cls.admitted_after_wait == 5
+        assert_idle(cls)
+
+    asyncio.run(scenario())
+
+
+def test_user_limit_and_queue_full():
+    async def scenario():
+        cls = admission(queue_size=2, per_user=1)
+        holder = await cls.acquire("holder")
+        waiting = [asyncio.create_task(cls.acquire("a"))]
+        await settle()
+
+        await assert_rejected(cls, "a", USER_LIMIT)
+        waiting.append(asyncio.create_task(cls.acquire("b")))
+        await settle()
+        await assert_rejected(cls, "c", QUEUE_FULL)
+        assert cls.queued == 2
+
+        cls.release(holder)
+        for task in waiting:
+            cls.release(await task)
+        assert_idle(cls)
+
+    asyncio.run(scenario())
+
+
+def test_timeout_in_queue():
+    async def scenario():
+        cls = admission(deadline=0.05)
+        holder = await cls.acquire("holder")
+        await assert_rejected(cls, "a", TIMEOUT)
+        assert (cls.in_flight, cls.queued) == (1, 0)
+        cls.release(holder)
+        assert_idle(cls)
+
+    asyncio.run(scenario())
+
+
+def test_deadline_rejected_upfront():
+    async def scenario():
+        cls = admission(deadline=1.5)
+        # Обработка в среднем 1 с: следующий в очереди начнет через 1 с и не успеет за 1.5 с
+        cls.service_seconds = 1.0
+        holder = await cls.acquire("holder")
+        await assert_rejected(cls, "a", DEADLINE)
+        cls.release(holder)
+        assert_idle(cls)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_after_slot_granted_hands_it_over():
+    async def scenario():
+        cls = admission()
+        holder = await cls.acquire("holder")
+        first = asyncio.create_task(cls.acquire("a"))
+        await settle()
+        second = asyncio.create_task(cls.acquire("b"))
+        await settle()
+
+        # Слот передан первому, но клиент ушел раньше, чем задача продолжилась
+        cls.release(holder)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        cls.release(await asyncio.wait_for(second, 1))
+        assert_idle(cls)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_while_queued():
+    async def scenario():
+        cls = admission()
+        holder = await cls.acquire("holder")
+        waiter = asyncio.create_task(cls.acquire("a"))
+        await settle()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert (cls.in_flight, cls.queued) == (1, 0)
+        cls.release(holder)
+        assert_idle(cls)
+
+    asyncio.run(scenario())
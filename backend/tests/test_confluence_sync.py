@@ -0,0 +1,29 @@
+from fake_confluence import FakeConfluence, _seed_db
+
+
+def overview_page_id(kb):
+    return kb.conn.execute("SELECT wiki_page_id FROM systems WHERE wiki_url LIKE '%/overview'").fetchone()[0]
+
+
+def test_wiki_url_cache_expires(tmp_path):
+    # Третья система ссылается на обзор пространства SP2 - ее страница зависит от домашней страницы
+    with FakeConfluence.generate(3) as fake:
+        kb = _seed_db(str(tmp_path / "kb.db"), fake)
+        kb.sync_confluence_content(fake.url, "user", "token", workers=2)
+        assert overview_page_id(kb) == "1002"
+
+        fake.spaces["SP2"] = "1000"
+        kb.sync_confluence_content(fake.url, "user", "token", workers=2)
+        assert overview_page_id(kb) == "1002"
+
+        kb.conn.execute("UPDATE wiki_url_cache SET resolved_at = datetime('now', '-30 days')")
+        kb.conn.commit()
+        kb.sync_confluence_content(fake.url, "user", "token", workers=2)
+        assert overview_page_id(kb) == "1000"
+        assert kb.conn.execute(
+            "SELECT COUNT(*) FROM wiki_url_cache WHERE resolved_at <= datetime('now', '-1 day')"
+        ).fetchone()[0] == 0
+
+        fake.spaces["SP2"] = "1001"
+        kb.sync_confluence_content(fake.url, "user", "token", workers=2, url_cache_ttl_days=0)
+        assert overview_page_id(kb) == "1001"
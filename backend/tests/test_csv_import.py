@@ -0,0 +1,105 @@
+import os
+import sqlite3
+
+import pytest
+
+from app.db.documents import WIKI, put_document
+from app.db.keywords import replace_keywords
+from app.db.repository import SystemRepository
+from app.db.schema import migrate
+from knowledge_base import SystemKnowledgeBase
+
+SYSTEMS_CSV = (
+    "Продукт,Статус,Владелец,Назначение,Wiki,Jira,Repo\n"
+    "Электронный дневник,В эксплуатации,Иванов Петр,Оценки и домашние задания,,,\n"
+    "Питание в школах,Создание,Петрова Анна,Оплата питания,,,\n"
+)
+CONTACTS_CSV = (
+    "Name,Email,Telegram\n"
+    "Иванов Петр,ivanov@mos.ru,@ivanov\n"
+    "Петрова Анна,petrova@mos.ru,@petrova\n"
+)
+
+
+@pytest.fixture
+def csv_files(tmp_path):
+    systems = tmp_path / "systems.csv"
+    contacts = tmp_path / "contacts.csv"
+    systems.write_text(SYSTEMS_CSV, encoding="utf-8")
+    contacts.write_text(CONTACTS_CSV, encoding="utf-8")
+    return str(systems), str(contacts)
+
+
+def product_name_index_is_unique(conn):
+    indexes = {row[1]: row[2] for row in conn.execute("PRAGMA index_list(systems)")}
+    return indexes.get("idx_systems_product_name") == 1
+
+
+def test_import_into_db_created_by_api(tmp_path, csv_files):
+    db_path = str(tmp_path / "systems_kb.db")
+    # Базу первым открывает API: таблицы и индексы создает migrate()
+    SystemRepository(db_path, str(tmp_path / "jira_data.db")).conn.close()
+
+    kb = SystemKnowledgeBase(db_path)
+    assert product_name_index_is_unique(kb.conn)
+    stats = kb.load_data_from_csv(*csv_files)
+    assert stats["inserted"] == 2
+
+    stats = kb.load_data_from_csv(*csv_files)
+    assert (stats["inserted"], stats["unchanged"]) == (0, 2)
+    row = kb.conn.execute(
+        "SELECT owner_email FROM systems WHERE product_name = 'Электронный дневник'"
+    ).fetchone()
+    assert row == ("ivanov@mos.ru",)
+
+
+def test_migrate_replaces_non_unique_product_name_index(tmp_path, csv_files):
+    db_path = str(tmp_path / "systems_kb.db")
+    SystemRepository(db_path, str(tmp_path / "jira_data.db")).conn.close()
+    conn = sqlite3.connect(db_path)
+    conn.execute("DROP INDEX idx_systems_product_name")
+    conn.execute("CREATE INDEX idx_systems_product_name ON systems (product_name)")
+    conn.executemany(
+        "INSERT INTO systems (id, product_name, wiki_url) VALUES (?, ?, ?)",
+        [(1, "Питание в школах", "https://wiki/shared"), (2, "Питание в школах", "https://wiki/shared"),
+         (3, "Питание в школах", "https://wiki/3")],
+    )
+    cursor = conn.cursor()
+    for sys_id in (1, 2, 3):
+        put_document(cursor, sys_id, WIKI, f"Оплата питания {sys_id}")
+        replace_keywords(cursor, sys_id, "питание, оплата")
+    conn.executemany(
+        "INSERT INTO wiki_url_cache (url, page_id) VALUES (?, ?)",
+        [("https://wiki/shared", "100"), ("https://wiki/3", "103")],
+    )
+    conn.commit()
+
+    migrate(conn)
+    assert product_name_index_is_unique(conn)
+    assert conn.execute("SELECT id FROM systems").fetchall() == [(1,)]
+    # У удаленных дублей не остается документов, ключевых слов и ссылок, на которые никто не ссылается
+    for table in ("system_documents", "system_keywords"):
+        assert conn.execute(f"SELECT DISTINCT system_id FROM {table}").fetchall() == [(1,)]
+    assert conn.execute("SELECT url FROM wiki_url_cache").fetchall() == [("https://wiki/shared",)]
+    assert conn.execute(
+        "SELECT system_id FROM system_changes WHERE field = 'deleted' ORDER BY system_id"
+    ).fetchall() == [(2,), (3,)]
+    conn.close()
+
+    stats = SystemKnowledgeBase(db_path).load_data_from_csv(*csv_files)
+    assert (stats["inserted"], stats["updated"]) == (1, 1)
+
+
+def test_import_path_stays_inside_import_dir(tmp_path):
+    from app.services.job_handlers import import_path
+
+    import_dir = tmp_path / "imports"
+    import_dir.mkdir()
+    (import_dir / "systems.csv").write_text(SYSTEMS_CSV, encoding="utf-8")
+    (tmp_path / "secret.csv").write_text("x", encoding="utf-8")
+    os.symlink(tmp_path / "secret.csv", import_dir / "link.csv")
+
+    assert import_path("systems.csv", str(import_dir)) == os.path.realpath(import_dir / "systems.csv")
+    for name in ("../secret.csv", str(tmp_path / "secret.csv"), "link.csv", "", ".", "missing.csv"):
+        with pytest.raises(ValueError):
+            import_path(name, str(import_dir))
@@ -0,0 +1,42 @@
+import pytest
+
+from app.db.repository import SystemRepository
+from app.services.enrichment import KeywordExtractor, LLMCache, OllamaClient
+from fake_ollama import FakeOllama
+
+TEXT = "Учет заявлений и оплата питания в школах"
+
+
+@pytest.fixture
+def fake():
+    fake = FakeOllama().start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    db_path = str(tmp_path / "kb.db")
+    SystemRepository(db_path).conn.close()
+    return LLMCache(db_path)
+
+
+def test_complete_response_is_cached(fake, cache):
+    client = OllamaClient(fake.url, "test", retries=0)
+    extractor = KeywordExtractor(client, cache)
+
+    keywords = extractor.get_ai_keywords(TEXT, "Питание в школах")
+    assert keywords
+    assert extractor.get_ai_keywords(TEXT, "Питание в школах") == keywords
+    assert sum(fake.requests.values()) == 1
+
+
+def test_truncated_response_is_not_cached(fake, cache):
+    # Бюджет в 2 токена: ответ обрывается по max_tokens
+    client = OllamaClient(fake.url, "test", retries=0, max_output_tokens=2)
+    extractor = KeywordExtractor(client, cache)
+
+    assert extractor.get_ai_keywords(TEXT, "Питание в школах")
+    extractor.get_ai_keywords(TEXT, "Питание в школах")
+    assert sum(fake.requests.values()) == 2
+    assert cache.misses == 2
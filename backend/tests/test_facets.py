@@ -0,0 +1,64 @@
+from app.services.facets import FacetIndex, SearchFilters, bitmap_to_ids, ids_to_bitmap
+
+
+class Doc(dict):
+    """Строка systems в том виде, в каком ее читает FacetIndex: get() и текст вики."""
+    wiki = None
+
+
+def system(sys_id, status="В эксплуатации", owner="Иванов", **links):
+    return sys_id, Doc(id=sys_id, status=status, owner_name=owner, **links)
+
+
+def ids(bitmap):
+    return bitmap_to_ids(bitmap)
+
+
+def test_bitmap_round_trip():
+    for values in ([], [0], [0, 1, 7, 8], [3, 64, 1000, 100000]):
+        assert bitmap_to_ids(ids_to_bitmap(values)) == values
+    assert ids_to_bitmap([5, 5, 0]) == 0b100001
+
+
+def test_filters_or_within_and_across_facets():
+    facets = FacetIndex().updated((), [
+        system(1, "В эксплуатации", "Иванов", wiki_url="http://wiki/1"),
+        system(2, "Создание", "Иванов"),
+        system(3, "Выведена", "Петров", wiki_url="http://wiki/3", jira_url="http://jira/3"),
+        system(4, "Создание", "Петров", has_wiki_content=True),
+    ])
+    assert facets.allowed(SearchFilters()) is None
+    assert ids(facets.allowed(SearchFilters(status=["создание", "Выведена"]))) == [2, 3, 4]
+    assert ids(facets.allowed(SearchFilters(status=["Создание", "Выведена"], owner=["петров"]))) == [3, 4]
+    # Ссылка на вики и скачанный текст - разные фасеты
+    assert ids(facets.allowed(SearchFilters(has_wiki=True))) == [1, 3]
+    assert ids(facets.allowed(SearchFilters(has_wiki_content=True))) == [4]
+    assert ids(facets.allowed(SearchFilters(has_wiki=True, has_jira=False))) == [1]
+
+
+def test_counts_after_incremental_update():
+    facets = FacetIndex().updated((), [
+        system(1, "Создание", "Иванов"),
+        system(2, "Создание", "Иванов"),
+        system(3, "Выведена", "Петров"),
+    ])
+    old = facets
+    removed = [system(2, "Создание", "Иванов")]
+    facets = facets.updated(removed, [system(2, "В эксплуатации", "Петров", repo_url="http://git/2")])
+
+    counts = facets.counts(facets.all)
+    assert counts["total"] == 3
+    assert {entry["value"]: entry["count"] for entry in counts["status"]} == {
+        "Создание": 1, "Выведена": 1, "В эксплуатации": 1,
+    }
+    assert {entry["value"]: entry["count"] for entry in counts["owner"]} == {"Петров": 2, "Иванов": 1}
+    assert counts["links"]["repo"] == 1
+
+    # Удаление системы: значение без систем пропадает из счетчиков
+    facets = facets.updated([system(1, "Создание", "Иванов")], ())
+    counts = facets.counts(facets.all)
+    assert [entry["value"] for entry in counts["status"]] == ["В эксплуатации", "Выведена"]
+    assert [entry["value"] for entry in counts["owner"]] == ["Петров"]
+
+    # Копия при обновлении: прежнее поколение индекса не меняется
+    assert {entry["value"]: entry["count"] for entry in old.counts(old.all)["status"]} == {"Создание": 2, "Выведена": 1}
@@ -0,0 +1,36 @@
+from app.services.owners import OwnerIndex
+
+
+def system(sys_id, name, email, telegram=None):
+    return sys_id, {
+        "product_name": f"Система {sys_id}", "product_code": f"SYS-{sys_id}", "status": "В эксплуатации",
+        "owner_name": name, "owner_email": email, "owner_telegram": telegram,
+    }
+
+
+def system_ids(owners):
+    return [[entry["id"] for entry in owner["systems"]] for owner in owners]
+
+
+def test_email_change_moves_system_between_owners():
+    index = OwnerIndex().updated((), [
+        system(1, "Иванов Петр", "ivanov@mos.ru", "@ivanov"),
+        system(2, "Иванов Петр", "ivanov@mos.ru", "@ivanov"),
+        system(3, "Петрова Анна", "petrova@mos.ru"),
+    ])
+    assert system_ids(index.find("ivanov@mos.ru")) == [[1, 2]]
+
+    # Система 2 перешла к Петровой
+    index = index.updated([system(2, "Иванов Петр", "ivanov@mos.ru", "@ivanov")],
+                          [system(2, "Петрова Анна", "petrova@mos.ru")])
+    assert system_ids(index.find("ivanov@mos.ru")) == [[1]]
+    assert system_ids(index.find("petrova@mos.ru")) == [[2, 3]]
+
+    # У владельца сменился email: под старым его больше нет, последняя система ушла - владелец удален
+    index = index.updated([system(1, "Иванов Петр", "ivanov@mos.ru", "@ivanov")],
+                          [system(1, "Иванов Петр", "p.ivanov@mos.ru", "@ivanov")])
+    assert index.find("ivanov@mos.ru") == []
+    assert system_ids(index.find("p.ivanov@mos.ru")) == [[1]]
+    assert system_ids(index.find("@ivanov")) == [[1]]
+    assert system_ids(index.find("иван")) == [[1]]
+    assert "email:ivanov@mos.ru" not in index.owners
@@ -0,0 +1,54 @@
+import pytest
+
+from app.db.documents import WIKI, put_document
+from app.db.keywords import replace_keywords
+from app.db.repository import SystemRepository
+from app.services import search
+from app.services.search import PARALLEL_BUILD_MIN_DOCS, SearchService
+
+NAMES = ["Электронный дневник", "Питание в школах", "Зачисление в детские сады", "Кружки и секции"]
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = SystemRepository(str(tmp_path / "kb.db"), str(tmp_path / "jira.db"))
+    cursor = repo.conn.cursor()
+    count = PARALLEL_BUILD_MIN_DOCS + 500
+    cursor.executemany(
+        "INSERT INTO systems (id, product_name, product_code, status, owner_name, description, wiki_url) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (i, f"{NAMES[i % len(NAMES)]} {i}", f"SYS-{i:05d}", "В эксплуатации", f"Владелец {i % 50}",
+             "Учет заявлений обучающихся и оплата питания", f"https://wiki/{i}" if i % 2 else None)
+            for i in range(1, count + 1)
+        ],
+    )
+    for sys_id in range(1, count + 1, 3):
+        put_document(cursor, sys_id, WIKI, f"Журнал оценок, расписание уроков школы {sys_id}")
+        replace_keywords(cursor, sys_id, "электронный журнал, оценки, родители")
+    repo.conn.commit()
+    yield repo
+    repo.conn.close()
+
+
+def test_pooled_build_matches_serial(repo, monkeypatch):
+    pools = []
+
+    class RecordingPool(search.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(kwargs["mp_context"].get_start_method())
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(search, "ProcessPoolExecutor", RecordingPool)
+    service = SearchService(repo)
+
+    monkeypatch.setattr(search, "SEARCH_BUILD_WORKERS", 1)
+    serial = service._prepare_all()
+    monkeypatch.setattr(search, "SEARCH_BUILD_WORKERS", 2)
+    pooled = service._prepare_all()
+
+    assert pools == [search.BUILD_START_METHOD] and pools[0] != "fork"
+    assert len(serial) > PARALLEL_BUILD_MIN_DOCS
+    assert list(pooled) == list(serial)
+    for sys_id, doc in serial.items():
+        assert pooled[sys_id].__getstate__() == doc.__getstate__()
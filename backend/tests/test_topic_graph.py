@@ -0,0 +1,25 @@
+import sqlite3
+
+from app.services.topic_graph import TopicGraphProvider
+
+
+def test_provider_sees_commits_still_in_wal(tmp_path):
+    db_path = str(tmp_path / "jira_data.db")
+    writer = sqlite3.connect(db_path)
+    writer.execute("PRAGMA journal_mode=WAL")
+    # Без автоматического чекпоинта коммиты остаются в -wal, основной файл не меняется
+    writer.execute("PRAGMA wal_autocheckpoint=0")
+    writer.execute("CREATE TABLE system_dependencies (system_code TEXT, topic_name TEXT, role TEXT)")
+    writer.execute("INSERT INTO system_dependencies VALUES ('SYS-1', 'orders', 'PRODUCER')")
+    writer.commit()
+
+    provider = TopicGraphProvider(db_path)
+    assert provider.get().has_system("SYS-1")
+    assert not provider.get().has_system("SYS-2")
+
+    writer.execute("INSERT INTO system_dependencies VALUES ('SYS-2', 'orders', 'CONSUMER')")
+    writer.commit()
+    graph = provider.get()
+    assert graph.has_system("SYS-2")
+    assert graph.topic_systems("orders") == {"topic_name": "orders", "producers": ["SYS-1"], "consumers": ["SYS-2"]}
+    writer.close()
@@ -0,0 +1,51 @@
+from app.services import trigrams
+from app.services.search_engine import Document, _update_postings
+
+
+def make_index(codes):
+    docs = {
+        sys_id: Document({'id': sys_id, 'product_name': f"Система {sys_id}", 'product_code': code},
+                         "", "", "", (), False)
+        for sys_id, code in enumerate(codes, start=1)
+    }
+    return _update_postings({}, (), docs.items(), trigrams.trigram_entries), docs
+
+
+def best_codes(query, codes, limit=3):
+    postings, docs = make_index(codes)
+    hits, _ = trigrams.lookup(postings, docs, query)
+    hits.sort(key=lambda hit: (-hit[0], hit[1]))
+    return [(docs[sys_id].get('product_code'), score) for score, sys_id in hits[:limit]]
+
+
+CODES = [f"SYS-{i:03d}" for i in range(200)] + [f"SYS-{i}" for i in range(1000, 1100)]
+
+
+def test_exact_code_regardless_of_case_and_separators():
+    assert best_codes("sys001", CODES)[0] == ("SYS-001", 100)
+    assert best_codes("SYS-001", CODES)[0] == ("SYS-001", 100)
+
+
+def test_confusable_typo_finds_code():
+    # Пример из документации модуля: буква O вместо нуля
+    assert best_codes("SYS-0O1", CODES)[0] == ("SYS-001", trigrams.CONFUSABLE_SCORE)
+
+
+def test_one_character_typo_is_tolerated():
+    found = dict(best_codes("SYS-10O5", CODES, limit=10))
+    assert found["SYS-1005"] == trigrams.CONFUSABLE_SCORE
+    assert "SYS-1005" in dict(best_codes("SYS-1095X", CODES + ["SYS-1095"], limit=10))
+
+
+def test_same_trigram_set_does_not_tie_with_exact_match():
+    # У SYS-1999 и SYS-19999 одинаковый набор троек
+    top = best_codes("SYS-19999", ["SYS-1999", "SYS-19999"])
+    assert top[0] == ("SYS-19999", 100)
+    assert top[1][1] < 100
+
+
+def test_looks_like_code():
+    assert trigrams.looks_like_code("SYS-001")
+    assert trigrams.looks_like_code("ais.12")
+    assert not trigrams.looks_like_code("детский сад")
+    assert not trigrams.looks_like_code("SYS")